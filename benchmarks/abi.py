@@ -0,0 +1,57 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2017 reverendus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Compares encoding calldata of 10k contract calls with and without the cached `FunctionEncoder`.
+
+Run with `python -m benchmarks.abi`.
+"""
+
+import timeit
+
+from web3 import EthereumTesterProvider, Web3
+
+from pymaker import Address, Calldata, Invocation, Transact
+from pymaker.token import ERC20Token
+
+
+def main(number: int = 10000):
+    web3 = Web3(EthereumTesterProvider())
+    token = Address('0x0000011111000001111100000111110000011111')
+    recipient = Address('0x0000011111000001111100000111110000022222')
+
+    def uncached():
+        # this is how `Transact.invocation()` used to encode calldata
+        for value in range(number):
+            calldata = web3.eth.contract(abi=ERC20Token.abi).encodeABI('transfer', [recipient.address, value])
+            Invocation(token, Calldata(calldata))
+
+    def cached():
+        for value in range(number):
+            Transact(None, web3, ERC20Token.abi, token, None, 'transfer', [recipient.address, value]).invocation()
+
+    assert Transact(None, web3, ERC20Token.abi, token, None, 'transfer', [recipient.address, 1]).invocation().calldata \
+        == Calldata(web3.eth.contract(abi=ERC20Token.abi).encodeABI('transfer', [recipient.address, 1]))
+
+    uncached_time = min(timeit.repeat(uncached, number=1, repeat=3))
+    cached_time = min(timeit.repeat(cached, number=1, repeat=3))
+    print(f"Encoding {number} invocations: web3.py {uncached_time:.3f}s, FunctionEncoder {cached_time:.3f}s"
+          f" ({uncached_time / cached_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
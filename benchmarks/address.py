@@ -0,0 +1,120 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2017 reverendus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Compares the interned, bytes-backed `Address` against the string-backed implementation it replaced,
+and measures parsing of address-heavy 0x and EtherDelta orders.
+
+Run with `python -m benchmarks.address`.
+"""
+
+import timeit
+
+import eth_utils
+
+from pymaker import Address
+from pymaker.numeric import Wad
+from pymaker.zrx import Order as ZrxOrder
+from pymaker.etherdelta import Order as EtherDeltaOrder
+
+
+class StringAddress:
+    """`Address` as it used to be, normalizing on every construction and comparing strings."""
+
+    def __init__(self, address):
+        if isinstance(address, StringAddress):
+            self.address = address.address
+        else:
+            self.address = eth_utils.to_normalized_address(address)
+
+    def as_bytes(self) -> bytes:
+        return bytes.fromhex(self.address.replace('0x', ''))
+
+    def __hash__(self):
+        return self.address.__hash__()
+
+    def __eq__(self, other):
+        return self.address == other.address
+
+
+def measure(statement, number: int) -> float:
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number * 10**9
+
+
+def zrx_order_json(index: int) -> dict:
+    return {'exchangeContractAddress': '0x12459c951127e0c374ff9105dda097662a027093',
+            'maker': '0x%040x' % (index % 50),
+            'taker': '0x0000000000000000000000000000000000000000',
+            'makerTokenAddress': '0x323b5d4c32345ced77393b3530b1eed0f346429d',
+            'takerTokenAddress': '0xef7fff64389b814a946f3e92105513705ca6b990',
+            'feeRecipient': '0x6666666666666666666666666666666666666666',
+            'makerTokenAmount': str(10**16 + index),
+            'takerTokenAmount': str(2 * 10**16),
+            'makerFee': '0',
+            'takerFee': '0',
+            'expirationUnixTimestampSec': '42',
+            'salt': str(index)}
+
+
+def ether_delta_order_json(index: int) -> dict:
+    return {'user': '0x%040x' % (index % 50),
+            'tokenGive': '0x323b5d4c32345ced77393b3530b1eed0f346429d',
+            'amountGive': str(10**16 + index),
+            'tokenGet': '0x0000000000000000000000000000000000000000',
+            'amountGet': str(2 * 10**16),
+            'expires': '42',
+            'nonce': str(index),
+            'v': '27',
+            'r': '0x' + '11' * 32,
+            's': '0x' + '22' * 32}
+
+
+def main(number: int = 100000, orders: int = 10000):
+    text = '0x323b5d4c32345ced77393b3530b1eed0f346429d'
+    other_text = '0xef7fff64389b814a946f3e92105513705ca6b990'
+    address, other_address = Address(text), Address(other_text)
+    string_address, other_string_address = StringAddress(text), StringAddress(other_text)
+    balances = {Address('0x%040x' % index): Wad(index) for index in range(100)}
+    string_balances = {StringAddress('0x%040x' % index): Wad(index) for index in range(100)}
+
+    cases = [
+        ("Address(str)", lambda: Address(text).address, lambda: StringAddress(text).address),
+        ("as_bytes()", lambda: address.as_bytes(), lambda: string_address.as_bytes()),
+        ("==", lambda: address == other_address, lambda: string_address == other_string_address),
+        ("dict lookup", lambda: balances[Address('0x%040x' % 42)],
+                        lambda: string_balances[StringAddress('0x%040x' % 42)]),
+    ]
+
+    print(f"{'operation':<14}{'interned ns':>14}{'string ns':>14}{'speedup':>10}")
+    for name, interned_op, string_op in cases:
+        assert interned_op() == string_op()
+        interned_ns = measure(interned_op, number)
+        string_ns = measure(string_op, number)
+        print(f"{name:<14}{interned_ns:>14.0f}{string_ns:>14.0f}{string_ns / interned_ns:>9.1f}x")
+
+    zrx_orders = [zrx_order_json(index) for index in range(orders)]
+    ether_delta_orders = [ether_delta_order_json(index) for index in range(orders)]
+
+    zrx_time = min(timeit.repeat(lambda: [ZrxOrder.from_json(None, data) for data in zrx_orders],
+                                 number=1, repeat=3))
+    ether_delta_time = min(timeit.repeat(lambda: [EtherDeltaOrder.from_json(None, data) for data in ether_delta_orders],
+                                         number=1, repeat=3))
+    print(f"Parsing {orders} 0x orders: {zrx_time:.3f}s, {orders} EtherDelta orders: {ether_delta_time:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2017 reverendus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Measures how long it takes to import `pymaker` modules.
+
+Each import is timed in a fresh interpreter, so nothing is cached between the runs.
+Run with `python -m benchmarks.imports`.
+"""
+
+import subprocess
+import sys
+
+MODULES = ['pymaker', 'pymaker.oasis', 'pymaker.deployment']
+
+
+def import_time(module: str) -> float:
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    return float(subprocess.check_output([sys.executable, '-c', code]))
+
+
+def main(repeat: int = 5):
+    for module in MODULES:
+        print(f"import {module:<20} {min(import_time(module) for _ in range(repeat)) * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2017 reverendus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Compares `Wad`/`Ray` arithmetic against the `decimal.Decimal` based implementation it replaced.
+
+Run with `python -m benchmarks.numeric`.
+"""
+
+import timeit
+from decimal import Decimal, ROUND_DOWN
+
+from pymaker.numeric import Wad, Ray
+
+
+def decimal_wad_mul(x: int, y: int) -> Wad:
+    return Wad(int((Decimal(x) * Decimal(y) / (Decimal(10) ** Decimal(18))).quantize(1, rounding=ROUND_DOWN)))
+
+
+def decimal_wad_div(x: int, y: int) -> Wad:
+    return Wad(int((Decimal(x) * (Decimal(10) ** Decimal(18)) / Decimal(y)).quantize(1, rounding=ROUND_DOWN)))
+
+
+def decimal_ray_mul(x: int, y: int) -> Ray:
+    return Ray(int((Decimal(x) * Decimal(y) / (Decimal(10) ** Decimal(27))).quantize(1, rounding=ROUND_DOWN)))
+
+
+def decimal_wad_from_ray(x: int) -> Wad:
+    return Wad(int((Decimal(x) / (Decimal(10) ** Decimal(9))).quantize(1, rounding=ROUND_DOWN)))
+
+
+def measure(statement, number: int) -> float:
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number * 10**9
+
+
+def main(number: int = 100000):
+    a, b = Wad.from_number(1234.5678), Wad.from_number(0.0321)
+    r, s = Ray(1000000001547125957863212448), Ray(315000000000000000000000000)
+
+    cases = [
+        ("Wad * Wad", lambda: a * b, lambda: decimal_wad_mul(a.value, b.value)),
+        ("Wad / Wad", lambda: a / b, lambda: decimal_wad_div(a.value, b.value)),
+        ("Ray * Ray", lambda: r * s, lambda: decimal_ray_mul(r.value, s.value)),
+        ("Wad(Ray)", lambda: Wad(r), lambda: decimal_wad_from_ray(r.value)),
+    ]
+
+    print(f"{'operation':<12}{'integer ns':>14}{'decimal ns':>14}{'speedup':>10}")
+    for name, integer_op, decimal_op in cases:
+        assert integer_op() == decimal_op()
+        integer_ns = measure(integer_op, number)
+        decimal_ns = measure(decimal_op, number)
+        print(f"{name:<12}{integer_ns:>14.0f}{decimal_ns:>14.0f}{decimal_ns / integer_ns:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2017 reverendus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Compares submitting 1000 orders to a local stub 0x relayer, one connection per request (as `ZrxRelayerApi`
+used to do it), through a pooled session, and concurrently with `ZrxRelayerApi.submit_orders`.
+
+Each request to the stub relayer gets delayed by 2ms, to resemble a remote relayer at least a little.
+
+Run with `python -m benchmarks.relayer`.
+"""
+
+import time
+
+import requests
+from web3 import EthereumTesterProvider, Web3
+
+from pymaker import Address
+from pymaker.deployment import deploy_contract
+from pymaker.numeric import Wad
+from pymaker.zrx import ZrxExchange, ZrxRelayerApi
+from tests.helpers import StubRelayer
+
+
+def main(number: int = 1000, delay: float = 0.002, max_workers: int = 8):
+    web3 = Web3(EthereumTesterProvider())
+    web3.eth.defaultAccount = web3.eth.accounts[0]
+    exchange = ZrxExchange.deploy(web3, deploy_contract(web3, 'ZRXToken'), deploy_contract(web3, 'TokenTransferProxy'))
+    orders = [exchange.sign_order(exchange.create_order(pay_token=Address('0x0202020202020202020202020202020202020202'),
+                                                        pay_amount=Wad.from_number(100),
+                                                        buy_token=Address('0x0101010101010101010101010101010101010101'),
+                                                        buy_amount=Wad.from_number(2.5),
+                                                        expiration=1763920792))
+              for _ in range(number)]
+
+    relayer = StubRelayer(delay=delay)
+    relayer_api = ZrxRelayerApi(exchange=exchange, api_server=relayer.url, max_workers=max_workers)
+
+    def unpooled():
+        for order in orders:
+            assert requests.post(f"{relayer.url}/v0/order", json=order.to_json()).status_code == 201
+
+    def pooled():
+        for order in orders:
+            assert relayer_api.submit_order(order)
+
+    def concurrent():
+        assert all(relayer_api.submit_orders(orders))
+
+    try:
+        for name, submit in [("new connection per order", unpooled),
+                             ("pooled session", pooled),
+                             (f"submit_orders, {max_workers} workers", concurrent)]:
+            start = time.time()
+            submit()
+            elapsed = time.time() - start
+            print(f"{name:<28}{elapsed:>8.3f}s{number / elapsed:>10.0f} orders/s")
+    finally:
+        relayer.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -18,19 +18,26 @@
 import asyncio
 import json
 import logging
+import os
 import sys
+import threading
 import time
-from functools import total_ordering
+import weakref
+from functools import total_ordering, wraps
 from typing import Optional
 
 import eth_utils
-import pkg_resources
+from eth_abi import decode_abi, encode_abi
+from eth_abi.exceptions import EncodingError
 from web3 import Web3
-from web3.utils.events import get_event_data
+from web3.utils.abi import get_abi_input_types, get_abi_output_types, map_abi_data, \
+    check_if_arguments_can_be_encoded, BASE_RETURN_NORMALIZERS
 
 from pymaker.gas import DefaultGasPrice, GasPrice
+from pymaker.nonce import NonceManager
 from pymaker.numeric import Wad
-from pymaker.util import synchronize
+from pymaker.snapshot import Snapshot
+from pymaker.util import synchronize, batch_requests
 
 filter_threads = []
 
@@ -48,6 +55,10 @@ def all_filter_threads_alive() -> bool:
 
 
 def filter_thread_alive(filter_thread) -> bool:
+    # `EventEngine` knows whether it is working
+    if hasattr(filter_thread, 'alive'):
+        return filter_thread.alive
+
     # it's a wicked way of detecting whether a web3.py filter is still working
     # but unfortunately I wasn't able to find any other one
     return hasattr(filter_thread, '_args') and hasattr(filter_thread, '_kwargs') or not filter_thread.running
@@ -67,6 +78,10 @@ class Address:
 
     Addresses get normalized automatically, so instances of this class can be safely compared to each other.
 
+    Addresses are stored as 20 raw bytes, which equality, hashing and ordering operate on. Instances are
+    immutable and interned, so creating an `Address` from a representation seen before returns the existing
+    instance without normalizing it again.
+
     Args:
         address: Can be any address representation allowed by web3.py
             or another instance of the Address class.
@@ -74,15 +89,59 @@ class Address:
     Attributes:
         address: Normalized hexadecimal representation of the Ethereum address.
     """
-    def __init__(self, address):
+
+    __slots__ = ('address', '_bytes', '__weakref__')
+
+    # interned instances by their normalized bytes and by the text representations they were created from,
+    # entries disappear together with the last reference to an address held outside of these tables
+    _by_bytes = weakref.WeakValueDictionary()
+    _by_text = weakref.WeakValueDictionary()
+
+    def __new__(cls, address):
         if isinstance(address, Address):
-            self.address = address.address
-        else:
-            self.address = eth_utils.to_normalized_address(address)
+            return address
+
+        if isinstance(address, str):
+            instance = cls._by_text.get(address)
+            if instance is None:
+                instance = cls._intern(eth_utils.to_normalized_address(address))
+                cls._by_text[address] = instance
+
+            return instance
+
+        return cls._intern(eth_utils.to_normalized_address(address))
+
+    @classmethod
+    def _intern(cls, normalized_address: str) -> 'Address':
+        address_bytes = bytes.fromhex(normalized_address[2:])
+        instance = cls._by_bytes.get(address_bytes)
+        if instance is None:
+            instance = object.__new__(cls)
+            object.__setattr__(instance, 'address', normalized_address)
+            object.__setattr__(instance, '_bytes', address_bytes)
+            instance = cls._by_bytes.setdefault(address_bytes, instance)
+
+        return instance
 
     def as_bytes(self) -> bytes:
         """Return the address as a 20-byte bytes array."""
-        return bytes.fromhex(self.address.replace('0x', ''))
+        return self._bytes
+
+    def __setattr__(self, name, value):
+        # instances are shared by everyone holding the same address, so they must never change
+        raise AttributeError("'Address' object is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("'Address' object is immutable")
+
+    def __reduce__(self):
+        return Address, (self.address,)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __str__(self):
         return f"{self.address}"
@@ -91,20 +150,431 @@ class Address:
         return f"Address('{self.address}')"
 
     def __hash__(self):
-        return self.address.__hash__()
+        return self._bytes.__hash__()
 
     def __eq__(self, other):
         assert(isinstance(other, Address))
-        return self.address == other.address
+        return self is other or self._bytes == other._bytes
 
     def __lt__(self, other):
         assert(isinstance(other, Address))
-        return self.address < other.address
+        return self._bytes < other._bytes
+
+
+class FunctionEncoder:
+    """Encodes calls of one contract function, with all the ABI lookups done only once.
+
+    `web3.py` looks up the function in the contract ABI, checks the argument types and calculates
+    the function selector every time it encodes a call. `FunctionEncoder` does it once per function
+    and caches the result, so encoders are shared between all contract instances with the same ABI.
+    Encoders only hold data derived from the ABI and encode calls with `eth_abi` directly, so they
+    do not depend on any `Web3` instance. Use :py:meth:`for_function` to get them.
+
+    Attributes:
+        function_abi: ABI of the function.
+        selector: Hex-encoded 4-byte selector of the function.
+        input_types: List of types of the function arguments.
+        output_types: List of types returned by the function.
+    """
+
+    _abi_keys = {}
+    _encoders = {}
+    _encoders_lock = threading.Lock()
+
+    def __init__(self, function_abi: dict):
+        assert(isinstance(function_abi, dict))
+
+        self.function_abi = function_abi
+        self.selector = eth_utils.function_abi_to_4byte_selector(function_abi)
+        self.input_types = get_abi_input_types(function_abi)
+        self.output_types = get_abi_output_types(function_abi)
+
+    @classmethod
+    def for_function(cls, web3: Web3, abi: list, function_name: str, args: list) -> 'FunctionEncoder':
+        """Returns the encoder for a call of a contract function.
+
+        Args:
+            web3: An instance of `Web` from `web3.py`.
+            abi: Contract ABI.
+            function_name: Name of the function.
+            args: Arguments of the call. Only used if the function is overloaded, to choose
+                the right overload the same way `web3.py` does.
+
+        Returns:
+            The `FunctionEncoder` for this function.
+        """
+        assert(isinstance(web3, Web3))
+        assert(isinstance(abi, list))
+        assert(isinstance(function_name, str))
+        assert(isinstance(args, list))
+
+        with cls._encoders_lock:
+            # encoders are keyed by the contents of the ABI, serializing it only once per ABI object
+            # (the ABI is referenced from the entry, so its `id()` can not get reused)
+            if id(abi) not in cls._abi_keys:
+                cls._abi_keys[id(abi)] = (abi, json.dumps(abi, sort_keys=True))
+
+            key = (cls._abi_keys[id(abi)][1], function_name, len(args))
+            if key not in cls._encoders:
+                cls._encoders[key] = [FunctionEncoder(function_abi) for function_abi in abi
+                                      if function_abi.get('type', 'function') == 'function'
+                                      and function_abi.get('name') == function_name
+                                      and len(function_abi.get('inputs', [])) == len(args)]
+
+            encoders = cls._encoders[key]
+
+        if len(encoders) == 1:
+            return encoders[0]
+
+        for encoder in encoders:
+            if check_if_arguments_can_be_encoded(encoder.function_abi, args, {}):
+                return encoder
+
+        raise ValueError(f"No function '{function_name}' accepting {args} found in the ABI")
+
+    @eth_utils.coerce_return_to_text
+    def encode(self, args: list) -> str:
+        """Encodes a call of the function.
+
+        Args:
+            args: Arguments of the call.
+
+        Returns:
+            Hex-encoded calldata, the same as `contract.encodeABI()` would return.
+        """
+        if not check_if_arguments_can_be_encoded(self.function_abi, args, {}):
+            raise TypeError(f"One or more arguments could not be encoded to the necessary ABI type."
+                            f" Expected types are: {', '.join(self.input_types)}")
+
+        try:
+            encoded_arguments = encode_abi(self.input_types, eth_utils.force_obj_to_bytes(args))
+        except EncodingError as e:
+            raise TypeError(f"One or more arguments could not be encoded to the necessary ABI type: {e}")
+
+        selector = eth_utils.remove_0x_prefix(self.selector)
+        arguments = eth_utils.remove_0x_prefix(eth_utils.encode_hex(encoded_arguments))
+        return eth_utils.add_0x_prefix(eth_utils.force_bytes(selector) + eth_utils.force_bytes(arguments))
+
+
+def _decode_uint(word: str):
+    return int(word, 16)
+
+
+def _decode_int(word: str):
+    value = int(word, 16)
+    return value - 2**256 if value >= 2**255 else value
+
+
+def _decode_bool(word: str):
+    return int(word, 16) != 0
+
+
+def _decode_address(word: str):
+    return eth_utils.to_checksum_address('0x' + word[24:])
+
+
+def _static_word_decoder(abi_type: str):
+    # decoders of single 32-byte words (as 64 hex digits) for the most common static types,
+    # returning values in the same form `web3.py` returns them
+    if '[' in abi_type:
+        return None
+    elif abi_type.startswith('uint'):
+        return _decode_uint
+    elif abi_type.startswith('int'):
+        return _decode_int
+    elif abi_type == 'bool':
+        return _decode_bool
+    elif abi_type == 'address':
+        return _decode_address
+    elif abi_type.startswith('bytes') and abi_type[5:].isdigit():
+        length = int(abi_type[5:])
+        return lambda word: bytes.fromhex(word[:2*length])
+    else:
+        return None
+
+
+class EventDecoder:
+    """Decodes logs of one contract event, with all the ABI lookups done only once.
+
+    Decoding a log with `web3.py` (`get_event_data`) involves looking up and normalizing input types
+    of the event every time. `EventDecoder` does it once per event, and decodes indexed arguments and
+    arguments of the most common static types directly from the hex-encoded words of the log. Only
+    data containing dynamic types gets decoded by `eth_abi`. Decoded events have the same form
+    `get_event_data` returns.
+
+    Use :py:meth:`for_event` to get the decoder of an event from a given contract ABI, or
+    :py:meth:`for_log` to find a decoder for any log of an event known to `pymaker`.
+
+    Attributes:
+        event_abi: ABI of the event.
+        name: Name of the event.
+        topic: Hex-encoded first topic of logs of the event, `None` for anonymous events.
+        topic_count: Number of topics logs of the event have.
+    """
+
+    _decoders = {}
+    _decoders_lock = threading.Lock()
+    _registry = None
+
+    def __init__(self, event_abi: dict):
+        assert(isinstance(event_abi, dict))
+
+        self.event_abi = event_abi
+        self.name = event_abi['name']
+        self.anonymous = event_abi.get('anonymous', False)
+        self.topic = None if self.anonymous else eth_utils.event_abi_to_log_topic(event_abi).lower()
+
+        indexed_inputs = [abi_input for abi_input in event_abi['inputs'] if abi_input.get('indexed', False)]
+        data_inputs = [abi_input for abi_input in event_abi['inputs'] if not abi_input.get('indexed', False)]
+        self.topic_count = len(indexed_inputs) + (0 if self.anonymous else 1)
+
+        # indexed dynamic values are stored as their hashes, `web3.py` returns them as `bytes32` as well
+        self._topic_names = [abi_input['name'] for abi_input in indexed_inputs]
+        self._topic_decoders = [_static_word_decoder(abi_input['type']) or _static_word_decoder('bytes32')
+                                for abi_input in indexed_inputs]
+
+        self._data_names = [abi_input['name'] for abi_input in data_inputs]
+        self._data_types = [abi_input['type'] for abi_input in data_inputs]
+        self._data_decoders = [_static_word_decoder(data_type) for data_type in self._data_types]
+        self._data_static = all(decoder is not None for decoder in self._data_decoders)
+
+    @classmethod
+    def for_event(cls, abi: list, event_name: str) -> 'EventDecoder':
+        """Returns the decoder of a contract event.
+
+        Args:
+            abi: Contract ABI.
+            event_name: Name of the event.
+
+        Returns:
+            The `EventDecoder` for this event.
+        """
+        assert(isinstance(abi, list))
+        assert(isinstance(event_name, str))
+
+        # the ABI is referenced from the cache entry, so its `id()` can not get reused
+        key = (id(abi), event_name)
+        with cls._decoders_lock:
+            if key not in cls._decoders:
+                event_abi = [element for element in abi
+                             if element.get('type') == 'event' and element.get('name') == event_name][0]
+                cls._decoders[key] = (abi, EventDecoder(event_abi))
+
+            return cls._decoders[key][1]
+
+    @classmethod
+    def for_log(cls, log: dict) -> Optional['EventDecoder']:
+        """Returns a decoder for a log of any (non-anonymous) event defined in the ABIs bundled with `pymaker`.
+
+        Decoders are looked up by the first topic of the log and the number of its topics. If the same
+        event is defined in many ABIs, argument names from `ERC20Token` take precedence, then the first
+        ABI in alphabetical order wins.
+
+        Args:
+            log: Raw log, as found in transaction receipts.
+
+        Returns:
+            The `EventDecoder` for the log, or `None` if the log does not belong to any event known to `pymaker`.
+        """
+        if len(log['topics']) == 0:
+            return None
+
+        if cls._registry is None:
+            cls._registry = cls._build_registry()
+
+        return cls._registry.get((log['topics'][0].lower(), len(log['topics'])))
+
+    @classmethod
+    def _build_registry(cls) -> dict:
+        abi_directory = os.path.join(os.path.dirname(__file__), 'abi')
+        abi_files = ['ERC20Token.abi'] + sorted(file for file in os.listdir(abi_directory) if file.endswith('.abi'))
+
+        registry = {}
+        for abi_file in abi_files:
+            abi = ContractArtifact.load('pymaker', f'abi/{abi_file}', json.loads)
+            for element in abi:
+                if element.get('type') == 'event' and not element.get('anonymous', False):
+                    decoder = cls.for_event(abi, element['name'])
+                    registry.setdefault((decoder.topic, decoder.topic_count), decoder)
+
+        return registry
+
+    def decode(self, log: dict) -> dict:
+        """Decodes a log of the event.
+
+        Args:
+            log: Raw log, as found in transaction receipts or returned by `eth_getLogs`.
+
+        Returns:
+            Decoded event, in the same form `get_event_data` from `web3.py` returns it.
+        """
+        topics = log['topics'] if self.anonymous else log['topics'][1:]
+        args = {name: decoder(topic[2:]) for name, decoder, topic in zip(self._topic_names, self._topic_decoders, topics)}
+
+        data = log['data'][2:] if log['data'].startswith('0x') else log['data']
+        if self._data_static:
+            for index, (name, decoder) in enumerate(zip(self._data_names, self._data_decoders)):
+                args[name] = decoder(data[64*index:64*(index+1)])
+        else:
+            values = decode_abi(self._data_types, bytes.fromhex(data))
+            args.update(zip(self._data_names, map_abi_data(BASE_RETURN_NORMALIZERS, self._data_types, values)))
+
+        return {'args': args,
+                'event': self.name,
+                'logIndex': log['logIndex'],
+                'transactionIndex': log['transactionIndex'],
+                'transactionHash': log['transactionHash'],
+                'address': log['address'],
+                'blockHash': log['blockHash'],
+                'blockNumber': log['blockNumber']}
+
+    def __repr__(self):
+        return f"EventDecoder('{self.name}')"
+
+
+class ReadCache:
+    """Caches results of constant contract getters, so they do not result in an `eth_call` every time.
+
+    There are two kinds of cached getters. Getters returning values which never change once the contract
+    is deployed (addresses of tokens etc.) are decorated with :py:func:`cached` and get cached forever.
+    Getters returning values which can change between blocks (prices, rates etc.) are decorated with
+    :py:func:`cached_per_block` and get cached only until a new block arrives.
+
+    Per-block getters check the number of the latest block (`eth_blockNumber`) on each invocation and only
+    return a cached value if it has been retrieved in that very block, so they always reflect transactions
+    mined so far, including the ones sent by the keeper itself. The cache can also be told about
+    a new block explicitly by calling :py:meth:`new_block`.
+
+    One cache is shared by all contracts using the same `Web3` instance, see :py:meth:`for_web3`.
+
+    Attributes:
+        hits: Number of getter invocations answered from the cache.
+        misses: Number of getter invocations which had to call the contract.
+    """
+
+    _caches = weakref.WeakKeyDictionary()
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._immutable = {}
+        self._per_block = {}
+        self._block_number = None
+
+    @classmethod
+    def for_web3(cls, web3: Web3) -> 'ReadCache':
+        """Returns the cache shared by all contracts using `web3`, creating it if necessary."""
+        if web3 not in cls._caches:
+            cls._caches[web3] = ReadCache()
+
+        return cls._caches[web3]
+
+    @property
+    def block_number(self) -> Optional[int]:
+        """Number of the block per-block getters are currently cached for, `None` if not known yet."""
+        return self._block_number
+
+    def new_block(self, block_number: int):
+        """Notifies the cache about a new block, which invalidates all values cached per block.
+
+        Args:
+            block_number: Number of the new block.
+        """
+        assert(isinstance(block_number, int))
+
+        with self._lock:
+            if block_number != self._block_number:
+                self._per_block = {}
+                self._block_number = block_number
+
+    def clear(self):
+        """Removes all values from the cache."""
+        with self._lock:
+            self._immutable = {}
+            self._per_block = {}
+            self._block_number = None
+
+    def get(self, key: tuple, per_block: bool, function, block_number: Optional[int] = None):
+        """Returns the value cached under `key`, calling `function` and caching its result if there isn't one.
+
+        Args:
+            key: Hashable key identifying the contract, the getter and its arguments.
+            per_block: `True` if the value should only be cached until a new block arrives,
+                `False` if it should be cached forever.
+            function: Function returning the value, called on cache miss.
+            block_number: Number of the latest block, used for per-block values. If it differs from
+                the block the cache has seen last, all values cached per block get invalidated.
+                If not specified, the block passed to the last `new_block()` call will be used.
+
+        Returns:
+            The cached value, or the value returned by `function`.
+        """
+        assert(isinstance(key, tuple))
+        assert(isinstance(per_block, bool))
+        assert(callable(function))
+        assert(isinstance(block_number, int) or (block_number is None))
+
+        with self._lock:
+            if per_block and block_number is not None and block_number != self._block_number:
+                self._per_block = {}
+                self._block_number = block_number
+
+            if per_block and self._block_number is None:
+                return function()
+
+            entries = self._per_block if per_block else self._immutable
+            if key in entries:
+                self.hits += 1
+                return entries[key]
+
+            self.misses += 1
+
+        # if a new block arrives in the meantime, the value ends up in the discarded dictionary
+        value = function()
+        with self._lock:
+            entries[key] = value
+
+        return value
+
+
+def _cached_getter(method, per_block: bool):
+    @wraps(method)
+    def getter(self, *args):
+        # within a snapshot values may come from a block other than the current one, the snapshot caches them anyway
+        if per_block and Snapshot.active(self.web3) is not None:
+            return method(self, *args)
+
+        key = (self.address, method.__name__) + args
+        block_number = self.web3.eth.blockNumber if per_block else None
+        return ReadCache.for_web3(self.web3).get(key, per_block, lambda: method(self, *args), block_number)
+
+    return getter
+
+
+def cached(method):
+    """Decorates a getter of a `Contract` returning a value which never changes, so it gets cached forever.
+
+    See :py:class:`pymaker.ReadCache` for more details.
+    """
+    return _cached_getter(method, False)
+
+
+def cached_per_block(method):
+    """Decorates a getter of a `Contract` returning a value which can change between blocks,
+    so it gets cached only within one block.
+
+    See :py:class:`pymaker.ReadCache` for more details.
+    """
+    return _cached_getter(method, True)
 
 
 class Contract:
     logger = logging.getLogger('contract')
 
+    DEFAULT_BATCH_SIZE = 100
+
     @staticmethod
     def _deploy(web3: Web3, abi: list, bytecode: bytes, args: list) -> Address:
         assert(isinstance(web3, Web3))
@@ -128,22 +598,108 @@ class Contract:
 
         return web3.eth.contract(abi=abi)(address=address.address)
 
-    def _on_event(self, contract, event, cls, handler):
-        register_filter_thread(contract.on(event, None, self._event_callback(cls, handler, False)))
+    def _call_many(self, calls: list, batch_size: int = DEFAULT_BATCH_SIZE) -> list:
+        """Executes multiple constant contract methods, using as few round trips to the node as possible.
+
+        Calls get sent to the node in JSON-RPC batches of at most `batch_size` calls each
+        (see :py:func:`pymaker.util.batch_requests`). Return values are decoded the same way
+        `contract.call()` decodes them.
+
+        Args:
+            calls: List of `(function_name, args)` tuples.
+            batch_size: Maximum number of calls to send to the node in one JSON-RPC batch.
+
+        Returns:
+            List of return values, in the same order as `calls`.
+        """
+        assert(isinstance(calls, list))
+        assert(isinstance(batch_size, int))
+        assert(batch_size > 0)
+
+        def request(function_name: str, args: list):
+            calldata = FunctionEncoder.for_function(self.web3, self.abi, function_name, args).encode(args)
+            transaction = {'to': self.address.address, 'data': calldata}
+            if eth_utils.is_address(self.web3.eth.defaultAccount):
+                transaction['from'] = self.web3.eth.defaultAccount
+
+            # as batched requests do not go through the request formatters, block numbers need to be hex-encoded
+            snapshot = Snapshot.active(self.web3)
+            block_identifier = snapshot.block_number if snapshot is not None else self.web3.eth.defaultBlock
+            if isinstance(block_identifier, int):
+                block_identifier = hex(block_identifier)
+
+            return 'eth_call', [transaction, block_identifier]
+
+        def output(function_name: str, args: list, result: str):
+            output_types = FunctionEncoder.for_function(self.web3, self.abi, function_name, args).output_types
+            output_data = map_abi_data(BASE_RETURN_NORMALIZERS, output_types,
+                                       decode_abi(output_types, eth_utils.decode_hex(result)))
+
+            return output_data[0] if len(output_data) == 1 else output_data
+
+        results = []
+        for batch_start in range(0, len(calls), batch_size):
+            batch = calls[batch_start:batch_start + batch_size]
+            batch_results = batch_requests(self.web3, [request(function_name, args) for function_name, args in batch])
+            results.extend(output(function_name, args, result)
+                           for (function_name, args), result in zip(batch, batch_results))
+
+        return results
+
+    def _on_event(self, contract, event, cls, handler, confirmations: int = 0, removed_handler=None):
+        from pymaker.events import EventEngine
+
+        decoder = EventDecoder.for_event(contract.abi, event)
+
+        def decoding_callback(callback):
+            return lambda log: callback(decoder.decode(log))
+
+        EventEngine.for_web3(self.web3).subscribe(
+            address=self.address,
+            topic=decoder.topic,
+            handler=decoding_callback(self._event_callback(cls, handler, False)),
+            confirmations=confirmations,
+            removed_handler=decoding_callback(self._event_callback(cls, removed_handler, False))
+            if removed_handler is not None else None)
 
     def _past_events(self, contract, event, cls, number_of_past_blocks) -> list:
-        events = []
+        from pymaker.events import LogCache, get_logs
 
-        def handler(obj):
-            events.append(obj)
+        decoder = EventDecoder.for_event(contract.abi, event)
+        topic = decoder.topic
 
         block_number = contract.web3.eth.blockNumber
-        filter_params = {'fromBlock': max(block_number-number_of_past_blocks, 0), 'toBlock': block_number}
-        thread = contract.pastEvents(event, filter_params, self._event_callback(cls, handler, True))
-        register_filter_thread(thread)
-        thread.join()
+        from_block = max(block_number-number_of_past_blocks, 0)
+
+        log_cache = LogCache.for_web3(self.web3)
+        if log_cache is not None:
+            logs = log_cache.get_logs(self.address, topic, from_block, block_number)
+        else:
+            logs = get_logs(self.web3, self.address, topic, from_block, block_number)
+
+        events = []
+        callback = self._event_callback(cls, events.append, True)
+        for log in logs:
+            callback(decoder.decode(log))
+
         return events
 
+    def _get_logs(self, from_block: int, to_block: int) -> list:
+        """Retrieves raw logs emitted by this contract in blocks `from_block`..`to_block` (inclusive).
+
+        Unlike `_past_events()`, no event decoding takes place, so logs of all events (including
+        anonymous ones) get returned, in the order they have been emitted.
+        """
+        assert(isinstance(from_block, int))
+        assert(isinstance(to_block, int))
+
+        log_filter = self.web3.eth.filter({'fromBlock': from_block, 'toBlock': to_block,
+                                           'address': self.address.address})
+        try:
+            return self.web3.eth.getFilterLogs(log_filter.filter_id)
+        finally:
+            self.web3.eth.uninstallFilter(log_filter.filter_id)
+
     def _event_callback(self, cls, handler, past):
         def callback(log):
             if past:
@@ -156,12 +712,63 @@ class Contract:
         return callback
 
     @staticmethod
-    def _load_abi(package, resource) -> list:
-        return json.loads(pkg_resources.resource_string(package, resource))
+    def _load_abi(package, resource) -> 'ContractArtifact':
+        return ContractArtifact(package, resource, json.loads)
 
     @staticmethod
-    def _load_bin(package, resource) -> bytes:
-        return pkg_resources.resource_string(package, resource)
+    def _load_bin(package, resource) -> 'ContractArtifact':
+        return ContractArtifact(package, resource, lambda data: data)
+
+
+class ContractArtifact:
+    """Contract ABI or bytecode, which gets read and parsed only when it is used for the first time.
+
+    Meant to be used as a class attribute (see `Contract._load_abi` and `Contract._load_bin`),
+    accessing it returns the parsed artifact. Each artifact file gets parsed at most once
+    and the same object is returned on every access, even if the file is used by many classes.
+
+    Attributes:
+        package: Name of the package the resource file belongs to.
+        resource: Path to the resource file, relative to the package.
+    """
+
+    _artifacts = {}
+    _artifacts_lock = threading.Lock()
+
+    def __init__(self, package: str, resource: str, parse):
+        assert(isinstance(package, str))
+        assert(isinstance(resource, str))
+        assert(callable(parse))
+
+        self.package = package
+        self.resource = resource
+        self.parse = parse
+
+    @classmethod
+    def load(cls, package: str, resource: str, parse):
+        """Reads and parses a resource file, unless it has already been done before.
+
+        Args:
+            package: Name of the package the resource file belongs to.
+            resource: Path to the resource file, relative to the package.
+            parse: Function converting the file contents (as `bytes`) into the artifact.
+
+        Returns:
+            The parsed artifact.
+        """
+        path = os.path.join(os.path.dirname(sys.modules[package].__file__), resource)
+        with cls._artifacts_lock:
+            if path not in cls._artifacts:
+                with open(path, 'rb') as file:
+                    cls._artifacts[path] = parse(file.read())
+
+            return cls._artifacts[path]
+
+    def __get__(self, instance, owner):
+        return self.load(self.package, self.resource, self.parse)
+
+    def __repr__(self):
+        return f"ContractArtifact('{self.package}', '{self.resource}')"
 
 
 class Calldata:
@@ -170,6 +777,9 @@ class Calldata:
     Attributes:
         value: Calldata as a string starting with `0x`.
     """
+
+    __slots__ = ('value',)
+
     def __init__(self, value: str):
         assert(isinstance(value, str))
         assert(value.startswith('0x'))
@@ -216,31 +826,195 @@ class Receipt:
         gas_used: Amount of gas used by the Ethereum transaction.
         transfers: A list of ERC20 token transfers resulting from the execution
             of this Ethereum transaction. Each transfer is an instance of the
-            :py:class:`pymaker.Transfer` class.
+            :py:class:`pymaker.Transfer` class. Transfers get decoded on first access.
         successful: Boolean flag which is `True` if the Ethereum transaction
             was successful. We consider transaction successful if the contract
             method has been executed without throwing.
     """
+
+    __slots__ = ('raw_receipt', 'transaction_hash', 'gas_used', 'successful', '_transfers', '_events')
+
     def __init__(self, receipt):
         self.raw_receipt = receipt
         self.transaction_hash = receipt['transactionHash']
         self.gas_used = receipt['gasUsed']
-        self.transfers = []
-
-        receipt_logs = receipt['logs']
-        if (receipt_logs is not None) and (len(receipt_logs) > 0):
-            self.successful = True
-            for receipt_log in receipt_logs:
-                if len(receipt_log['topics']) > 0 and receipt_log['topics'][0] == '0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef':
-                    from pymaker.token import ERC20Token
-                    transfer_abi = [abi for abi in ERC20Token.abi if abi.get('name') == 'Transfer'][0]
-                    event_data = get_event_data(transfer_abi, receipt_log)
-                    self.transfers.append(Transfer(token_address=Address(event_data['address']),
-                                                   from_address=Address(event_data['args']['from']),
-                                                   to_address=Address(event_data['args']['to']),
-                                                   value=Wad(event_data['args']['value'])))
-        else:
-            self.successful = False
+        self.successful = (receipt['logs'] is not None) and (len(receipt['logs']) > 0)
+        self._transfers = None
+        self._events = None
+
+    @property
+    def transfers(self) -> list:
+        # transfers get decoded on first access only, as most of the time only `successful` gets checked
+        if self._transfers is None:
+            from pymaker.token import ERC20Token
+            transfer_decoder = EventDecoder.for_event(ERC20Token.abi, 'Transfer')
+
+            transfers = []
+            for receipt_log in self.raw_receipt['logs'] or []:
+                topics = receipt_log['topics']
+                if len(topics) == transfer_decoder.topic_count and topics[0].lower() == transfer_decoder.topic:
+                    event_data = transfer_decoder.decode(receipt_log)
+                    transfers.append(Transfer(token_address=Address(event_data['address']),
+                                              from_address=Address(event_data['args']['from']),
+                                              to_address=Address(event_data['args']['to']),
+                                              value=Wad(event_data['args']['value'])))
+
+            self._transfers = transfers
+
+        return self._transfers
+
+    @property
+    def events(self) -> list:
+        """Events emitted by the Ethereum transaction, decoded on first access.
+
+        Only logs of events defined in the ABIs bundled with `pymaker` get decoded, other logs are skipped.
+        See :py:meth:`pymaker.EventDecoder.for_log` for details.
+
+        Returns:
+            List of decoded events, in the same form `get_event_data` from `web3.py` returns them.
+        """
+        if self._events is None:
+            events = []
+            for receipt_log in self.raw_receipt['logs'] or []:
+                decoder = EventDecoder.for_log(receipt_log)
+                if decoder is not None:
+                    events.append(decoder.decode(receipt_log))
+
+            self._events = events
+
+        return self._events
+
+
+class ReceiptPoller:
+    """Waits for receipts of pending Ethereum transactions, checking all of them together.
+
+    All hashes of transactions waiting for their receipts are queried in one JSON-RPC batch per node,
+    so the number of requests sent each tick does not grow with the number of pending transactions.
+    Whenever a batch is sent, it covers all outstanding hashes, even those which are not due yet,
+    and every waiting coroutine whose transaction turns out to be mined gets woken up.
+
+    The interval between checks of a transaction adapts to how long ago it has been sent. Right after
+    sending it is `max_interval`, as the transaction is unlikely to be mined yet. It then decreases
+    linearly down to `min_interval` when `expected_inclusion_time` is reached, and stays there
+    afterwards. As transactions get mined instantly by `EthereumTesterProvider`, for it
+    `min_interval` is always used.
+
+    A poller must be used from a single event loop. :py:meth:`for_loop` returns the poller shared by
+    all transactions executed on a given event loop.
+
+    Args:
+        min_interval: Shortest interval (in seconds) between consecutive receipt checks.
+        max_interval: Longest interval (in seconds) between consecutive receipt checks.
+        expected_inclusion_time: Time (in seconds) after which the transaction is expected to be mined.
+    """
+
+    logger = logging.getLogger('receipt-poller')
+
+    _pollers = weakref.WeakKeyDictionary()
+
+    def __init__(self, min_interval: float = 0.25, max_interval: float = 2.0, expected_inclusion_time: float = 15.0):
+        assert(isinstance(min_interval, float) or isinstance(min_interval, int))
+        assert(isinstance(max_interval, float) or isinstance(max_interval, int))
+        assert(isinstance(expected_inclusion_time, float) or isinstance(expected_inclusion_time, int))
+        assert(0 < min_interval <= max_interval)
+        assert(expected_inclusion_time >= 0)
+
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.expected_inclusion_time = expected_inclusion_time
+        self._waiters = []
+        self._task = None
+
+    @classmethod
+    def for_loop(cls, loop: asyncio.AbstractEventLoop) -> 'ReceiptPoller':
+        """Returns the poller shared by all transactions executed on `loop`, creating it if necessary."""
+        if loop not in cls._pollers:
+            cls._pollers[loop] = ReceiptPoller()
+
+        return cls._pollers[loop]
+
+    def interval(self, web3: Web3, seconds_since_sent: float) -> float:
+        """Returns the interval between receipt checks of a transaction sent `seconds_since_sent` ago."""
+        if str(web3.providers[0]) == 'EthereumTesterProvider' or seconds_since_sent >= self.expected_inclusion_time:
+            return self.min_interval
+
+        progress = max(seconds_since_sent, 0) / self.expected_inclusion_time
+        return self.max_interval - (self.max_interval - self.min_interval) * progress
+
+    async def wait(self, web3: Web3, tx_hashes: list, sent_time: float) -> list:
+        """Waits until the transactions are due to be checked and returns their receipts.
+
+        Args:
+            web3: An instance of `Web` from `web3.py` the transactions have been sent with.
+            tx_hashes: List of hashes of the transactions.
+            sent_time: Time (as returned by `time.time()`) when the first of the transactions has been sent.
+
+        Returns:
+            List of :py:class:`pymaker.Receipt` objects, one for each hash. The elements are `None`
+            for transactions which have not been mined yet.
+        """
+        assert(isinstance(web3, Web3))
+        assert(isinstance(tx_hashes, list))
+        assert(isinstance(sent_time, float))
+
+        if len(tx_hashes) == 0:
+            return []
+
+        loop = asyncio.get_event_loop()
+        now = time.time()
+        waiter = _ReceiptWaiter(web3, tx_hashes, now + self.interval(web3, now - sent_time), loop.create_future())
+        self._waiters.append(waiter)
+
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+        try:
+            return await waiter.future
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    async def _run(self):
+        while len(self._waiters) > 0:
+            now = time.time()
+            next_due = min(waiter.due for waiter in self._waiters)
+            if next_due > now:
+                await asyncio.sleep(min(next_due - now, self.min_interval))
+            else:
+                self._poll(now)
+
+    def _poll(self, now: float):
+        tx_hashes_by_web3 = {}
+        for waiter in self._waiters:
+            tx_hashes = tx_hashes_by_web3.setdefault(waiter.web3, [])
+            tx_hashes.extend(tx_hash for tx_hash in waiter.tx_hashes if tx_hash not in tx_hashes)
+
+        receipts = {}
+        for web3, tx_hashes in tx_hashes_by_web3.items():
+            try:
+                raw_receipts = batch_requests(web3, [('eth_getTransactionReceipt', [tx_hash]) for tx_hash in tx_hashes])
+            except Exception as e:
+                self.logger.warning(f"Failed to check receipts of {len(tx_hashes)} transaction(s) ({e})")
+                continue
+
+            for tx_hash, raw_receipt in zip(tx_hashes, raw_receipts):
+                if raw_receipt is not None and raw_receipt['blockNumber'] is not None:
+                    receipts[tx_hash] = Receipt(raw_receipt)
+
+        for waiter in list(self._waiters):
+            waiter_receipts = [receipts.get(tx_hash) for tx_hash in waiter.tx_hashes]
+            if waiter.due <= now or any(waiter_receipts):
+                self._waiters.remove(waiter)
+                if not waiter.future.done():
+                    waiter.future.set_result(waiter_receipts)
+
+
+class _ReceiptWaiter:
+    def __init__(self, web3: Web3, tx_hashes: list, due: float, future: asyncio.Future):
+        self.web3 = web3
+        self.tx_hashes = tx_hashes
+        self.due = due
+        self.future = future
 
 
 class Transact:
@@ -274,13 +1048,7 @@ class Transact:
         self.function_name = function_name
         self.parameters = parameters
         self.extra = extra
-
-    def _get_receipt(self, transaction_hash: str) -> Optional[Receipt]:
-        receipt = self.web3.eth.getTransactionReceipt(transaction_hash)
-        if receipt is not None and receipt['blockNumber'] is not None:
-            return Receipt(receipt)
-        else:
-            return None
+        self._calldata_cache = None
 
     def _as_dict(self, dict_or_none) -> dict:
         if dict_or_none is None:
@@ -299,13 +1067,35 @@ class Transact:
         else:
             return gas_estimate + 100000
 
+    def _nonce_manager(self) -> Optional[NonceManager]:
+        # `EthereumTesterProvider` mines transactions instantly, so we let it pick the nonces itself
+        if str(self.web3.providers[0]) == 'EthereumTesterProvider':
+            return None
+
+        account = self._as_dict(self.extra).get('from', self.web3.eth.defaultAccount)
+        if eth_utils.is_address(account):
+            return NonceManager.for_account(self.web3, account)
+        else:
+            return None
+
+    def _calldata(self) -> str:
+        if self._calldata_cache is None:
+            encoder = FunctionEncoder.for_function(self.web3, self.abi, self.function_name, self.parameters)
+            self._calldata_cache = encoder.encode(self.parameters)
+
+        return self._calldata_cache
+
+    def _transaction(self, transaction: dict) -> dict:
+        from_dict = {'from': self.web3.eth.defaultAccount} if eth_utils.is_address(self.web3.eth.defaultAccount) else {}
+
+        return {**from_dict, **transaction, **{'to': self.address.address, 'data': self._calldata()}}
+
     def _func(self, gas: int, gas_price: Optional[int], nonce: Optional[int]):
         gas_price_dict = {'gasPrice': gas_price} if gas_price is not None else {}
         nonce_dict = {'nonce': nonce} if nonce is not None else {}
 
-        return self.contract.\
-            transact({**{'gas': gas}, **gas_price_dict, **nonce_dict, **self._as_dict(self.extra)}).\
-            __getattr__(self.function_name)(*self.parameters)
+        return self.web3.eth.sendTransaction(self._transaction({**{'gas': gas}, **gas_price_dict, **nonce_dict,
+                                                                **self._as_dict(self.extra)}))
 
     def name(self) -> str:
         """Returns the nicely formatted name of this pending Ethereum transaction.
@@ -324,7 +1114,7 @@ class Transact:
         Returns:
             Amount of gas as an integer.
         """
-        estimate = self.contract.estimateGas(self._as_dict(self.extra)).__getattr__(self.function_name)(*self.parameters)
+        estimate = self.web3.eth.estimateGas(self._transaction(self._as_dict(self.extra)))
 
         # testrpc does estimate too little gas at times, it did happen with TxManager definitely
         # so we always add 1mio tp the estimate as in testrpc gas block limit doesn't matter
@@ -376,6 +1166,9 @@ class Transact:
             A future value of either a :py:class:`pymaker.Receipt` object if the transaction
             invocation was successful, or `None` if it failed.
         """
+        return await self._transact_async(ReceiptPoller.for_loop(asyncio.get_event_loop()), **kwargs)
+
+    async def _transact_async(self, receipt_poller: ReceiptPoller, **kwargs) -> Optional[Receipt]:
         # First we try to estimate the gas usage of the transaction. If gas estimation fails
         # it means there is no point in sending the transaction, thus we fail instantly and
         # do not increment the nonce. If the estimation is successful, we pass the calculated
@@ -396,6 +1189,10 @@ class Transact:
         gas_price = kwargs['gas_price'] if ('gas_price' in kwargs) else DefaultGasPrice()
         assert(isinstance(gas_price, GasPrice))
 
+        # Nonces are handed out locally if we know which account the transaction is going to be sent from.
+        # Otherwise we let the node pick the nonce and fetch it back once the first transaction has been sent.
+        nonce_manager = self._nonce_manager()
+
         # Initialize variables which will be used in the main loop.
         nonce = None
         tx_hashes = []
@@ -403,12 +1200,9 @@ class Transact:
         gas_price_last = 0
 
         while True:
-            seconds_elapsed = int(time.time() - initial_time)
-
             # Check if any transaction sent so far has been mined (has a receipt).
             # If it has, we return either the receipt (if if was successful) or `None`.
-            for tx_hash in tx_hashes:
-                receipt = self._get_receipt(tx_hash)
+            for tx_hash, receipt in zip(tx_hashes, await receipt_poller.wait(self.web3, tx_hashes, initial_time)):
                 if receipt:
                     if receipt.successful:
                         self.logger.info(f"Transaction {self.name()} was successful (tx_hash={tx_hash})")
@@ -418,6 +1212,8 @@ class Transact:
                                             f" log entry, assuming it has failed (tx_hash={tx_hash})")
                         return None
 
+            seconds_elapsed = int(time.time() - initial_time)
+
             # Send a transaction if:
             # - no transaction has been sent yet, or
             # - the gas price requested has changed since the last transaction has been sent
@@ -427,6 +1223,9 @@ class Transact:
                 gas_price_last = gas_price_value
 
                 try:
+                    if nonce is None and nonce_manager is not None:
+                        nonce = nonce_manager.next_nonce()
+
                     tx_hash = self._func(gas, gas_price_value, nonce)
                     tx_hashes.append(tx_hash)
 
@@ -442,10 +1241,14 @@ class Transact:
                     self.logger.warning(f"Failed to send transaction {self.name()} with nonce={nonce}, gas={gas},"
                                         f" gas_price={gas_price_value if gas_price_value is not None else 'default'}")
 
+                    # If the first transaction could not be sent, the nonce handed out to it stays unused, so all
+                    # nonces handed out afterwards would never get mined. That's why we give it back in this case,
+                    # unless the node tells us it has been used by someone else (then the manager resynchronizes).
                     if len(tx_hashes) == 0:
-                        raise
+                        if nonce_manager is not None and nonce is not None:
+                            nonce_manager.failed(nonce, sys.exc_info()[1])
 
-            await asyncio.sleep(0.25)
+                        raise
 
     def invocation(self) -> Invocation:
         """Returns the `Invocation` object for this pending Ethereum transaction.
@@ -458,8 +1261,7 @@ class Transact:
         Returns:
             :py:class:`pymaker.Invocation` object for this pending Ethereum transaction.
         """
-        return Invocation(self.address,
-                          Calldata(self.web3.eth.contract(abi=self.abi).encodeABI(self.function_name, self.parameters)))
+        return Invocation(self.address, Calldata(self._calldata()))
 
 
 class Transfer:
@@ -474,6 +1276,9 @@ class Transfer:
         to_address: Destination address of the transfer.
         value: Value transferred.
     """
+
+    __slots__ = ('token_address', 'from_address', 'to_address', 'value')
+
     def __init__(self, token_address: Address, from_address: Address, to_address: Address, value: Wad):
         assert(isinstance(token_address, Address))
         assert(isinstance(from_address, Address))
@@ -492,4 +1297,4 @@ class Transfer:
                self.value == other.value
 
     def __hash__(self):
-        return hash((self.token_address, self.from_address, self.token_address, self.value))
+        return hash((self.token_address, self.from_address, self.to_address, self.value))
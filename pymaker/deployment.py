@@ -18,16 +18,15 @@
 import json
 from typing import Optional
 
-import pkg_resources
 from web3 import Web3, EthereumTesterProvider
 
-from pymaker import Address
+from pymaker import Address, ContractArtifact, ReadCache
 from pymaker.approval import directly
 from pymaker.auth import DSGuard
 from pymaker.etherdelta import EtherDelta
 from pymaker.feed import DSValue
 from pymaker.numeric import Wad, Ray
-from pymaker.oasis import MatchingMarket
+from pymaker.oasis import MatchingMarket, OrderBook
 from pymaker.sai import Tub, Tap, Top, Vox
 from pymaker.token import DSToken
 from pymaker.vault import DSVault
@@ -48,8 +47,8 @@ def deploy_contract(web3: Web3, contract_name: str, args: Optional[list]=None) -
     assert(isinstance(contract_name, str))
     assert(isinstance(args, list) or (args is None))
 
-    abi = json.loads(pkg_resources.resource_string('pymaker.deployment', f'abi/{contract_name}.abi'))
-    bytecode = pkg_resources.resource_string('pymaker.deployment', f'abi/{contract_name}.bin')
+    abi = ContractArtifact.load('pymaker.deployment', f'abi/{contract_name}.abi', json.loads)
+    bytecode = ContractArtifact.load('pymaker.deployment', f'abi/{contract_name}.bin', lambda data: data)
     tx_hash = web3.eth.contract(abi=abi, bytecode=bytecode).deploy(args=args)
     receipt = web3.eth.getTransactionReceipt(tx_hash)
     return Address(receipt['contractAddress'])
@@ -129,7 +128,9 @@ class Deployment:
         """Rollbacks all changes made since the initial deployment."""
         self.web3.providers[0].rpc_methods.evm_revert()
         self.web3.providers[0].rpc_methods.evm_snapshot()
+        ReadCache.for_web3(self.web3).clear()
         self.otc._none_orders = set()
+        self.otc._order_book = OrderBook(self.otc, reconcile_every=1)
 
     def time_travel_by(self, seconds: int):
         assert(isinstance(seconds, int))
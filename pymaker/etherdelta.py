@@ -16,21 +16,24 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import hashlib
-import json
 import logging
+import queue
 import random
 import threading
+import time
+import warnings
+from concurrent.futures import Future
 from pprint import pformat
-from subprocess import Popen, PIPE
-from typing import List
+from typing import List, Optional
 
 from eth_abi.encoding import get_single_encoder
 from web3 import Web3
 
-from pymaker import Contract, Address, Transact
+from pymaker import Contract, Address, Transact, cached_per_block
 from pymaker.numeric import Wad
 from pymaker.token import ERC20Token
 from pymaker.util import bytes_to_hexstring, hexstring_to_bytes, eth_sign
+from pymaker.websocket import SocketIO
 
 
 class Order:
@@ -48,6 +51,10 @@ class Order:
         r: R component of the order signature.
         s: S component of the order signature.
     """
+
+    __slots__ = ('_ether_delta', 'maker', 'pay_token', 'pay_amount', 'buy_token', 'buy_amount', 'expires', 'nonce',
+                 'v', 'r', 's')
+
     def __init__(self, ether_delta, maker: Address, pay_token: Address, pay_amount: Wad, buy_token: Address,
                  buy_amount: Wad, expires: int, nonce: int, v: int, r: bytes, s: bytes):
 
@@ -138,7 +145,7 @@ class Order:
                f" '{self.expires}', '{self.nonce}')"
 
     def __repr__(self):
-        return pformat(vars(self))
+        return pformat({slot: getattr(self, slot) for slot in self.__slots__})
 
 
 class LogTrade:
@@ -245,6 +252,7 @@ class EtherDelta(Contract):
         """
         return Address(self._contract.call().accountLevelsAddr())
 
+    @cached_per_block
     def fee_make(self) -> Wad:
         """Returns the maker fee configured in the contract.
 
@@ -253,6 +261,7 @@ class EtherDelta(Contract):
         """
         return Wad(self._contract.call().feeMake())
 
+    @cached_per_block
     def fee_take(self) -> Wad:
         """Returns the taker fee configured in the contract.
 
@@ -261,6 +270,7 @@ class EtherDelta(Contract):
         """
         return Wad(self._contract.call().feeTake())
 
+    @cached_per_block
     def fee_rebate(self) -> Wad:
         """Returns the rebate fee configured in the contract.
 
@@ -271,7 +281,7 @@ class EtherDelta(Contract):
         """
         return Wad(self._contract.call().feeRebate())
 
-    def on_trade(self, handler):
+    def on_trade(self, handler, confirmations: int = 0, removed_handler=None):
         """Subscribe to LogTrade events.
 
         `LogTrade` events are emitted by the EtherDelta contract every time someone takes an order.
@@ -279,10 +289,16 @@ class EtherDelta(Contract):
         Args:
             handler: Function which will be called for each subsequent `LogTrade` event.
                 This handler will receive a :py:class:`pymaker.etherdelta.LogTrade` class instance.
+            confirmations: Number of blocks which have to be mined on top of the block containing
+                the event before `handler` gets called.
+            removed_handler: Optional function which will be called for each `LogTrade` event already
+                passed to `handler`, which got removed from the chain by a chain reorganization.
         """
         assert(callable(handler))
+        assert(isinstance(confirmations, int))
+        assert(callable(removed_handler) or (removed_handler is None))
 
-        self._on_event(self._contract, 'Trade', LogTrade, handler)
+        self._on_event(self._contract, 'Trade', LogTrade, handler, confirmations, removed_handler)
 
     def past_trade(self, number_of_past_blocks: int) -> List[LogTrade]:
         """Synchronously retrieve past LogTrade events.
@@ -594,75 +610,161 @@ class EtherDelta(Contract):
 class EtherDeltaApi:
     """A client for the EtherDelta API backend.
 
+    Orders get published over one persistent Socket.IO connection to the API backend, which is established
+    on first use and re-established whenever it gets lost. Orders are queued and published one by one by
+    a background thread, each of them retried up to `number_of_attempts` times.
+
     Attributes:
-        client_tool_directory: Directory containing the `etherdelta-client` tool.
-        client_tool_command: Command for running the `etherdelta-client` tool.
         api_server: Base URL of the EtherDelta API backend server.
-        number_of_attempts: Number of attempts to run the `etherdelta-client` tool.
-        retry_interval: Interval between subsequent retries if order placement failed,
-            within one `etherdelta-client` run.
-        timeout: Timeout after which publish order is considered as failed by the
-            `etherdelta-client` tool. If number_of_attempts > 1, this tool will be
-            run several times though.
+        number_of_attempts: Number of attempts to publish each order.
+        retry_interval: Interval between subsequent attempts if order placement failed, in seconds.
+        timeout: Timeout after which an attempt to publish an order is considered as failed, in seconds.
+
+    The `client_tool_directory` and `client_tool_command` arguments are deprecated and ignored, as the external
+    `etherdelta-client` tool is not used anymore. They are still accepted for backwards compatibility,
+    but will be removed in the next release.
     """
     logger = logging.getLogger('etherdelta-api')
 
     def __init__(self,
-                 client_tool_directory: str,
-                 client_tool_command: str,
                  api_server: str,
                  number_of_attempts: int,
                  retry_interval: int,
-                 timeout: int):
-        assert(isinstance(client_tool_directory, str))
-        assert(isinstance(client_tool_command, str))
+                 timeout: int,
+                 client_tool_directory: Optional[str] = None,
+                 client_tool_command: Optional[str] = None):
         assert(isinstance(api_server, str))
         assert(isinstance(number_of_attempts, int))
         assert(isinstance(retry_interval, int))
         assert(isinstance(timeout, int))
+        assert(isinstance(client_tool_directory, str) or (client_tool_directory is None))
+        assert(isinstance(client_tool_command, str) or (client_tool_command is None))
+
+        if client_tool_directory is not None or client_tool_command is not None:
+            warnings.warn("`client_tool_directory` and `client_tool_command` are not used anymore,"
+                          " as orders get published without the `etherdelta-client` tool",
+                          DeprecationWarning, stacklevel=2)
 
-        self.client_tool_directory = client_tool_directory
-        self.client_tool_command = client_tool_command
         self.api_server = api_server
         self.number_of_attempts = number_of_attempts
         self.retry_interval = retry_interval
         self.timeout = timeout
 
-    def publish_order(self, order: Order):
-        assert(isinstance(order, Order))
+        self._queue = queue.Queue()
+        self._socket = None
+        self._thread = None
+        self._thread_lock = threading.Lock()
 
-        def _publish_order_via_client() -> bool:
-            process = Popen(self.client_tool_command.split() + ['--url', self.api_server,
-                                                                '--timeout', str(self.timeout),
-                                                                '--retry-interval', str(self.retry_interval),
-                                                                json.dumps(order.to_json())],
-                            cwd=self.client_tool_directory, stdin=PIPE, stdout=PIPE, stderr=PIPE, shell=False)
+    def publish_order(self, order: Order) -> Future:
+        """Queues an order to be published to the API backend.
 
-            result = process.communicate(None, timeout=self.timeout+15)
-            stdout = result[0].decode("utf-8").rstrip().replace('\n', ' -> ')
-            stderr = result[1].decode("utf-8").rstrip().replace('\n', ' -> ')
+        Args:
+            order: Order to publish.
 
-            if len(stdout) > 0:
-                if process.returncode == 0:
-                    self.logger.info(f"Output from 'etherdelta-client': {stdout}")
-                else:
-                    self.logger.warning(f"Non-zero exit code output from 'etherdelta-client': {stdout}")
+        Returns:
+            A `Future` resolving to `True` if the order has been published successfully,
+            or to `False` if all attempts to publish it have failed.
+        """
+        assert(isinstance(order, Order))
 
-            if len(stderr) > 0:
-                self.logger.fatal(f"Error from 'etherdelta-client': {stderr}")
+        future = Future()
+        self._queue.put((order, future))
 
-            return process.returncode == 0
+        with self._thread_lock:
+            # the thread should never die, but if it ever does, queued orders must not be stuck forever
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
 
-        def _run():
-            for attempt in range(self.number_of_attempts):
-                self.logger.info(f"Sending order (attempt #{attempt+1}): {order}")
-                if _publish_order_via_client():
-                    self.logger.info(f"Order {order} sent successfully")
-                    return
+        return future
 
-            self.logger.warning(f"Failed to send order {order}")
+    def close(self):
+        """Stops publishing orders and closes the connection to the API backend.
 
-        threading.Thread(target=_run, daemon=True).start()
+        Orders queued before this method has been called still get published first.
+        """
+        with self._thread_lock:
+            thread, self._thread = self._thread, None
+
+        if thread is not None:
+            self._queue.put((None, None))
+            thread.join()
+
+    def _run(self):
+        while True:
+            try:
+                # while connected, wake up often enough to keep the connection alive
+                order, future = self._queue.get(timeout=self._socket.ping_interval/2 if self._socket else None)
+            except queue.Empty:
+                self._keep_alive()
+                continue
+
+            if order is None:
+                self._disconnect()
+                break
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(self._publish(order))
+                except Exception:
+                    # e.g. a malformed packet received from the backend, it must not kill the thread
+                    self.logger.exception(f"Failed to send order {order}")
+                    self._disconnect()
+                    future.set_result(False)
+
+    def _publish(self, order: Order) -> bool:
+        for attempt in range(self.number_of_attempts):
+            if attempt > 0:
+                time.sleep(self.retry_interval)
+
+            self.logger.info(f"Sending order (attempt #{attempt+1}): {order}")
+            try:
+                if self._publish_once(order):
+                    self.logger.info(f"Order {order} sent successfully")
+                    return True
+            except OSError as e:
+                self.logger.warning(f"Lost connection to EtherDelta API backend: {e}")
+                self._disconnect()
+
+        self.logger.warning(f"Failed to send order {order}")
+        return False
+
+    def _publish_once(self, order: Order) -> bool:
+        if self._socket is None:
+            self._socket = SocketIO(self.api_server, self.timeout)
+            self.logger.info(f"Connected to EtherDelta API backend at {self.api_server}")
+
+        self._socket.emit('message', order.to_json())
+
+        deadline = time.time() + self.timeout
+        while time.time() < deadline:
+            event = self._socket.receive(deadline - time.time())
+            if event is not None and event[0] == 'messageResult':
+                self.logger.info(f"Response received: {event[1]}")
+                message_result = event[1][0] if len(event[1]) > 0 else None
+                return isinstance(message_result, list) and message_result[:1] == ['Added/updated order.']
+
+        # a late response could be taken for the response to the next order, so we better reconnect
+        self.logger.warning(f"Timed out waiting for response to order {order}")
+        self._disconnect()
+        return False
+
+    def _keep_alive(self):
+        try:
+            # also drains events broadcast by the backend, we are not interested in
+            while self._socket is not None and self._socket.receive(0.01) is not None:
+                pass
+        except OSError as e:
+            self.logger.warning(f"Lost connection to EtherDelta API backend: {e}")
+            self._disconnect()
+        except Exception:
+            self.logger.exception(f"Failed to keep the connection to EtherDelta API backend alive")
+            self._disconnect()
+
+    def _disconnect(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
 
     def __repr__(self):
         return f"EtherDeltaApi()"
@@ -0,0 +1,574 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2017 reverendus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from web3 import Web3
+
+from pymaker import Address, register_filter_thread
+from pymaker.util import batch_requests
+
+
+def _to_int(value) -> int:
+    return int(value, 16) if isinstance(value, str) else value
+
+
+def _format_log(log: dict) -> dict:
+    # `web3.py` does not format results of `eth_getLogs` called directly, so numbers come back as hex strings
+    return dict(log, **{field: _to_int(log[field]) for field in ('blockNumber', 'logIndex', 'transactionIndex')
+                        if log.get(field) is not None})
+
+
+def _request_logs(web3: Web3, from_block: int, to_block: int, addresses: list, topics: list) -> list:
+    # returns logs emitted by any of `addresses` with any of `topics` as the first topic, in the order of emission
+    if str(web3.providers[0]) == 'EthereumTesterProvider':
+        # `EthereumTesterProvider` does not support `eth_getLogs`, nor lists of addresses or topics,
+        # so we retrieve all logs from these blocks using a filter and match them ourselves
+        log_filter = web3.eth.filter({'fromBlock': from_block, 'toBlock': to_block})
+        try:
+            logs = web3.eth.getFilterLogs(log_filter.filter_id)
+        finally:
+            web3.eth.uninstallFilter(log_filter.filter_id)
+
+        logs = [log for log in logs if log['address'].lower() in addresses
+                and len(log['topics']) > 0 and log['topics'][0].lower() in topics]
+
+    else:
+        logs = web3.manager.request_blocking('eth_getLogs', [{'fromBlock': hex(from_block),
+                                                              'toBlock': hex(to_block),
+                                                              'address': addresses,
+                                                              'topics': [topics]}])
+        logs = [_format_log(log) for log in logs]
+
+    return sorted(logs, key=lambda log: (log['blockNumber'], log['logIndex']))
+
+
+def get_logs(web3: Web3, address: Address, topic: str, from_block: int, to_block: int,
+             chunk_size: int = 5000, max_workers: int = 4) -> list:
+    """Retrieves past logs of one event of one contract, splitting the block range into chunks.
+
+    Chunks of at most `chunk_size` blocks are retrieved concurrently, using at most `max_workers` threads,
+    so even a large block range does not result in a single long-running request which could time out.
+    As `EthereumTesterProvider` can not be used from many threads at once, for it chunks are always
+    retrieved one by one.
+
+    Args:
+        web3: An instance of `Web` from `web3.py`.
+        address: Address of the contract emitting the logs.
+        topic: First topic of the logs (i.e. the event signature hash), as a hexadecimal string.
+        from_block: First block to retrieve the logs from.
+        to_block: Last block to retrieve the logs from (inclusive).
+        chunk_size: Maximum number of blocks to retrieve logs from in one request.
+        max_workers: Maximum number of requests to execute concurrently.
+
+    Returns:
+        List of raw logs, in the order they have been emitted.
+    """
+    assert(isinstance(web3, Web3))
+    assert(isinstance(address, Address))
+    assert(isinstance(topic, str))
+    assert(isinstance(from_block, int))
+    assert(isinstance(to_block, int))
+    assert(isinstance(chunk_size, int))
+    assert(isinstance(max_workers, int))
+    assert(chunk_size > 0)
+    assert(max_workers > 0)
+
+    chunks = [(chunk_start, min(chunk_start + chunk_size - 1, to_block))
+              for chunk_start in range(from_block, to_block + 1, chunk_size)]
+
+    def fetch(chunk: tuple) -> list:
+        return _request_logs(web3, chunk[0], chunk[1], [address.address.lower()], [topic.lower()])
+
+    if len(chunks) <= 1 or max_workers == 1 or str(web3.providers[0]) == 'EthereumTesterProvider':
+        results = [fetch(chunk) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            results = list(executor.map(fetch, chunks))
+
+    return [log for chunk_logs in results for log in chunk_logs]
+
+
+class LogCache:
+    """On-disk cache of past logs, so past events do not have to be retrieved from the node again and again.
+
+    Logs are kept in an SQLite database, keyed by the chain (its genesis block hash), the contract address,
+    the event topic and the position of the log in the chain. For each contract and event, the cache also keeps
+    track of the block ranges it has retrieved logs for, so only blocks which have not been seen before get
+    retrieved from the node (using :py:func:`get_logs`). As logs from the most recent blocks can still disappear
+    due to a chain reorganization, logs from the last `confirmations` blocks are never cached.
+
+    Past event methods of all contracts (`past_make()`, `past_take()`, `past_trade()` etc.) use the cache
+    registered for their `Web3` instance, if there is one. The typical usage pattern is as follows:
+
+        LogCache.register(web3, LogCache(web3, 'logs.db'))
+
+    Attributes:
+        web3: An instance of `Web` from `web3.py`.
+        path: Path of the SQLite database file, or `:memory:` for an in-memory cache.
+        confirmations: Number of most recent blocks logs from which will not be cached.
+    """
+
+    logger = logging.getLogger('log-cache')
+
+    _caches = weakref.WeakKeyDictionary()
+
+    def __init__(self, web3: Web3, path: str = ':memory:', confirmations: int = 12):
+        assert(isinstance(web3, Web3))
+        assert(isinstance(path, str))
+        assert(isinstance(confirmations, int))
+        assert(confirmations >= 0)
+
+        self.web3 = web3
+        self.path = path
+        self.confirmations = confirmations
+
+        self._lock = threading.Lock()
+        self._chain = None
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS logs (chain TEXT, address TEXT, topic TEXT,"
+                                     " block_number INTEGER, log_index INTEGER, log TEXT,"
+                                     " PRIMARY KEY (chain, address, topic, block_number, log_index))")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS ranges (chain TEXT, address TEXT, topic TEXT,"
+                                     " from_block INTEGER, to_block INTEGER)")
+
+    @classmethod
+    def register(cls, web3: Web3, log_cache: 'LogCache'):
+        """Makes past event methods of all contracts using `web3` use `log_cache`."""
+        assert(isinstance(web3, Web3))
+        assert(isinstance(log_cache, LogCache))
+
+        cls._caches[web3] = log_cache
+
+    @classmethod
+    def for_web3(cls, web3: Web3):
+        """Returns the cache registered for `web3`, `None` if there isn't one."""
+        return cls._caches.get(web3)
+
+    def get_logs(self, address: Address, topic: str, from_block: int, to_block: int) -> list:
+        """Retrieves past logs of one event of one contract, retrieving only blocks not seen before from the node.
+
+        Args:
+            address: Address of the contract emitting the logs.
+            topic: First topic of the logs (i.e. the event signature hash), as a hexadecimal string.
+            from_block: First block to retrieve the logs from.
+            to_block: Last block to retrieve the logs from (inclusive).
+
+        Returns:
+            List of raw logs, in the order they have been emitted.
+        """
+        assert(isinstance(address, Address))
+        assert(isinstance(topic, str))
+        assert(isinstance(from_block, int))
+        assert(isinstance(to_block, int))
+
+        key = (self._chain_id(), address.address.lower(), topic.lower())
+        cached_to_block = min(to_block, self.web3.eth.blockNumber - self.confirmations)
+
+        logs = []
+        if from_block <= cached_to_block:
+            for missing_from_block, missing_to_block in self._missing_ranges(key, from_block, cached_to_block):
+                self.logger.debug(f"Retrieving logs of {address} from blocks"
+                                  f" #{missing_from_block}-#{missing_to_block}")
+                self._store(key, missing_from_block, missing_to_block,
+                            get_logs(self.web3, address, topic, missing_from_block, missing_to_block))
+
+            logs.extend(self._load(key, from_block, cached_to_block))
+
+        if to_block > cached_to_block:
+            logs.extend(get_logs(self.web3, address, topic, max(from_block, cached_to_block + 1), to_block))
+
+        return logs
+
+    def _chain_id(self) -> str:
+        if self._chain is None:
+            self._chain = self.web3.eth.getBlock(0)['hash']
+
+        return self._chain
+
+    def _missing_ranges(self, key: tuple, from_block: int, to_block: int) -> list:
+        with self._lock:
+            ranges = self._connection.execute("SELECT from_block, to_block FROM ranges"
+                                              " WHERE chain = ? AND address = ? AND topic = ?"
+                                              " ORDER BY from_block", key).fetchall()
+
+        missing = []
+        current_block = from_block
+        for range_from_block, range_to_block in ranges:
+            if range_from_block > to_block:
+                break
+
+            if range_from_block > current_block:
+                missing.append((current_block, range_from_block - 1))
+
+            current_block = max(current_block, range_to_block + 1)
+
+        if current_block <= to_block:
+            missing.append((current_block, to_block))
+
+        return missing
+
+    def _store(self, key: tuple, from_block: int, to_block: int, logs: list):
+        with self._lock:
+            with self._connection:
+                self._connection.executemany("INSERT OR REPLACE INTO logs VALUES (?, ?, ?, ?, ?, ?)",
+                                             [key + (log['blockNumber'], log['logIndex'], json.dumps(dict(log)))
+                                              for log in logs])
+                self._connection.execute("INSERT INTO ranges VALUES (?, ?, ?, ?, ?)", key + (from_block, to_block))
+
+    def _load(self, key: tuple, from_block: int, to_block: int) -> list:
+        with self._lock:
+            rows = self._connection.execute("SELECT log FROM logs"
+                                            " WHERE chain = ? AND address = ? AND topic = ?"
+                                            " AND block_number BETWEEN ? AND ?"
+                                            " ORDER BY block_number, log_index", key + (from_block, to_block))
+
+            return [json.loads(row[0]) for row in rows.fetchall()]
+
+    def __repr__(self):
+        return f"LogCache('{self.path}')"
+
+
+class _Subscription:
+    def __init__(self, handler, confirmations: int, removed_handler, delivered_block: int):
+        self.handler = handler
+        self.confirmations = confirmations
+        self.removed_handler = removed_handler
+        # logs from this block and from all earlier ones have already been delivered (or skipped)
+        self.delivered_block = delivered_block
+
+
+class _Block:
+    __slots__ = ['number', 'hash', 'logs']
+
+    def __init__(self, number: int, hash: Optional[str], logs: list):
+        self.number = number
+        self.hash = hash
+        self.logs = logs
+
+
+class EventEngine:
+    """Watches logs of all contracts the process is interested in, using one thread per node.
+
+    Instead of creating a separate `web3.py` filter (each with its own thread polling `eth_getFilterChanges`)
+    for every event handler, handlers subscribe to the engine with the address of the contract and the topic
+    of the event. Once per block, the engine retrieves logs matching all subscriptions with a single
+    `eth_getLogs` call, and dispatches each of them to the handlers subscribed to it. Handlers subscribed
+    with :py:meth:`on_block` get notified about new blocks as well, so no separate block filter is needed.
+
+    The engine keeps track of the last block it has processed. If the node can not be reached or the call
+    fails, it keeps retrying and once it succeeds, it retrieves logs from all blocks it has missed in the
+    meantime (in chunks of at most `max_blocks_per_query` blocks). No events get lost in the process.
+
+    Hashes and logs of the last `history` blocks are kept in a ring buffer, which makes the engine aware
+    of chain reorganizations. Every time it polls, the engine checks whether the last block it has processed
+    is still part of the chain. If not, it rolls back to the last block which still is, notifies handlers
+    about logs from the orphaned blocks being removed, and processes blocks of the new chain. Subscribers
+    which would rather not deal with removals can ask for logs to be delivered only once they have
+    a given number of confirmations.
+
+    Handlers get invoked on the engine thread, one after another, in the order the logs have been emitted,
+    so they should return quickly. Use :py:meth:`for_web3` to get the engine shared by the whole process.
+
+    Attributes:
+        web3: An instance of `Web` from `web3.py`.
+        poll_interval: Interval (in seconds) between checks for a new block.
+        max_blocks_per_query: Maximum number of blocks to retrieve logs from in one `eth_getLogs` call.
+        history: Number of recent blocks kept in the ring buffer, i.e. the deepest chain reorganization
+            which can be rolled back.
+        alive_timeout: Time (in seconds) after which the engine reports it is not alive anymore
+            if it did not manage to poll the node successfully.
+    """
+
+    logger = logging.getLogger('event-engine')
+
+    _engines = weakref.WeakKeyDictionary()
+    _engines_lock = threading.Lock()
+
+    def __init__(self, web3: Web3, poll_interval: float = 1.0, max_blocks_per_query: int = 1000,
+                 history: int = 64, alive_timeout: float = 300.0):
+        assert(isinstance(web3, Web3))
+        assert(isinstance(poll_interval, float) or isinstance(poll_interval, int))
+        assert(isinstance(max_blocks_per_query, int))
+        assert(isinstance(history, int))
+        assert(isinstance(alive_timeout, float) or isinstance(alive_timeout, int))
+        assert(poll_interval > 0)
+        assert(max_blocks_per_query > 0)
+        assert(history > 0)
+        assert(alive_timeout > poll_interval)
+
+        self.web3 = web3
+        self.poll_interval = poll_interval
+        self.max_blocks_per_query = max_blocks_per_query
+        self.history = history
+        self.alive_timeout = alive_timeout
+
+        self._lock = threading.RLock()
+        self._subscriptions = {}
+        self._block_handlers = []
+        self._blocks = deque(maxlen=history)
+        self._last_block = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._registered = False
+        self._last_poll_time = None
+
+    @classmethod
+    def for_web3(cls, web3: Web3) -> 'EventEngine':
+        """Returns the engine shared by all contracts using `web3`, creating it if necessary."""
+        with cls._engines_lock:
+            if web3 not in cls._engines:
+                cls._engines[web3] = EventEngine(web3)
+
+            return cls._engines[web3]
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and not self._stopped.is_set()
+
+    @property
+    def alive(self) -> bool:
+        """`True` if the engine thread is working and polled the node successfully within the last
+        `alive_timeout` seconds, or if the engine has been stopped on purpose."""
+        if not self.running:
+            return True
+
+        return self._thread.is_alive() and time.time() - self._last_poll_time < self.alive_timeout
+
+    def subscribe(self, address: Address, topic: str, handler, confirmations: int = 0, removed_handler=None):
+        """Registers a handler to be called for every new log with the given address and first topic.
+
+        Only logs from blocks mined after the subscription are dispatched to the handler.
+
+        Args:
+            address: Address of the contract emitting the logs.
+            topic: First topic of the logs (i.e. the event signature hash), as a hexadecimal string.
+            handler: Function to be called with each matching raw log.
+            confirmations: Number of blocks which have to be mined on top of the block containing the log
+                before it gets dispatched to `handler`. Has to be lower than `history`.
+            removed_handler: Optional function to be called with each matching raw log which has already
+                been dispatched to `handler`, but its block got orphaned by a chain reorganization.
+                Such logs have the `removed` field set to `True`.
+        """
+        assert(isinstance(address, Address))
+        assert(isinstance(topic, str))
+        assert(callable(handler))
+        assert(isinstance(confirmations, int))
+        assert(0 <= confirmations < self.history)
+        assert(callable(removed_handler) or (removed_handler is None))
+
+        block_number = self.web3.eth.blockNumber
+        with self._lock:
+            if self._last_block is None:
+                self._last_block = block_number
+
+            key = (address.address.lower(), topic.lower())
+            self._subscriptions.setdefault(key, []).append(_Subscription(handler, confirmations,
+                                                                         removed_handler, block_number))
+
+        self._start()
+
+    def on_block(self, handler):
+        """Registers a handler to be called with the number of the latest block, every time a new block arrives.
+
+        Args:
+            handler: Function to be called with the block number.
+        """
+        assert(callable(handler))
+
+        block_number = self.web3.eth.blockNumber
+        with self._lock:
+            if self._last_block is None:
+                self._last_block = block_number
+
+            self._block_handlers.append(handler)
+
+        self._start()
+
+    def poll(self):
+        """Processes all blocks which arrived since the last call, dispatching their logs to the handlers.
+
+        Called periodically by the engine thread. Raises an exception if logs could not be retrieved,
+        in which case the blocks will be processed on the next call.
+        """
+        with self._lock:
+            block_number = self.web3.eth.blockNumber
+            if self._last_block is None:
+                self._last_block = block_number
+                return
+
+            # a reorganization which does not change the block number gets detected once the next block arrives
+            if block_number == self._last_block:
+                return
+
+            self._roll_back_orphaned_blocks(block_number)
+
+            # logs from blocks processed earlier may have reached the required number of confirmations
+            self._deliver(list(self._blocks), self._last_block, block_number)
+
+            while self._last_block < block_number:
+                from_block = self._last_block + 1
+                to_block = min(block_number, from_block + self.max_blocks_per_query - 1)
+
+                logs_by_block = {}
+                if len(self._subscriptions) > 0:
+                    for log in self._get_logs(from_block, to_block):
+                        logs_by_block.setdefault(_to_int(log['blockNumber']), []).append(log)
+
+                hashes = self._block_hashes(range(max(from_block, block_number - self.history + 1), to_block + 1))
+                blocks = [_Block(number, hashes.get(number), logs_by_block.get(number, []))
+                          for number in range(from_block, to_block + 1)
+                          if number in hashes or number in logs_by_block]
+
+                self._blocks.extend(block for block in blocks if block.hash is not None)
+                self._deliver(blocks, to_block, block_number)
+                self._last_block = to_block
+
+            for handler in list(self._block_handlers):
+                self._call(handler, block_number)
+
+    def stop_watching(self, timeout=None):
+        """Stops the engine thread and waits for it to terminate."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and not self._stopped.is_set():
+                return
+
+            self._stopped = threading.Event()
+            self._last_poll_time = time.time()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+            if not self._registered:
+                register_filter_thread(self)
+                self._registered = True
+
+            self.logger.debug(f"Event engine started for {self.web3.providers[0]}")
+
+    def _run(self):
+        stopped = self._stopped
+        retry_interval = self.poll_interval
+        while not stopped.is_set():
+            try:
+                self.poll()
+                self._last_poll_time = time.time()
+                retry_interval = self.poll_interval
+            except Exception as e:
+                self.logger.warning(f"Failed to retrieve logs after block #{self._last_block},"
+                                    f" will retry in {retry_interval} seconds: {e}")
+                stopped.wait(retry_interval)
+                retry_interval = min(retry_interval * 2, 60)
+                continue
+
+            stopped.wait(self.poll_interval)
+
+    def _get_logs(self, from_block: int, to_block: int) -> list:
+        addresses = sorted(set(address for address, _ in self._subscriptions))
+        topics = sorted(set(topic for _, topic in self._subscriptions))
+
+        return _request_logs(self.web3, from_block, to_block, addresses, topics)
+
+    def _block_hashes(self, block_numbers) -> dict:
+        blocks = batch_requests(self.web3, [('eth_getBlockByNumber', [hex(block_number), False])
+                                            for block_number in block_numbers])
+
+        return {_to_int(block['number']): block['hash'] for block in blocks if block is not None}
+
+    def _matching_subscriptions(self, log: dict) -> list:
+        if len(log['topics']) == 0:
+            return []
+
+        return list(self._subscriptions.get((log['address'].lower(), log['topics'][0].lower()), []))
+
+    def _deliver(self, blocks: list, up_to_block: int, head_block: int):
+        # `blocks` have to cover all blocks with logs up to `up_to_block` not delivered yet, in ascending order
+        for block in blocks:
+            for log in block.logs:
+                for subscription in self._matching_subscriptions(log):
+                    if subscription.delivered_block < block.number <= head_block - subscription.confirmations:
+                        self._call(subscription.handler, log)
+
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.delivered_block = max(subscription.delivered_block,
+                                                   min(up_to_block, head_block - subscription.confirmations))
+
+    def _roll_back_orphaned_blocks(self, head_block: int):
+        if len(self._blocks) == 0:
+            if head_block < self._last_block:
+                self.logger.warning(f"Block number went down from #{self._last_block} to #{head_block},"
+                                    f" continuing from block #{head_block}")
+                self._roll_back_to(head_block)
+
+            return
+
+        # if the last block is still part of the chain, so are all blocks before it
+        if self._block_hashes([self._blocks[-1].number]).get(self._blocks[-1].number) == self._blocks[-1].hash:
+            return
+
+        hashes = self._block_hashes([block.number for block in self._blocks])
+        orphaned_blocks = []
+        while len(self._blocks) > 0 and hashes.get(self._blocks[-1].number) != self._blocks[-1].hash:
+            orphaned_blocks.append(self._blocks.pop())
+
+        if len(self._blocks) > 0:
+            common_block = self._blocks[-1].number
+        else:
+            common_block = orphaned_blocks[-1].number - 1
+            self.logger.warning(f"Chain reorganization deeper than {self.history} blocks detected,"
+                                f" logs from blocks before #{common_block + 1} may be inconsistent")
+
+        self.logger.info(f"Chain reorganization detected, rolling back {len(orphaned_blocks)} block(s)"
+                         f" to block #{common_block}")
+
+        for block in orphaned_blocks:
+            for log in reversed(block.logs):
+                for subscription in self._matching_subscriptions(log):
+                    if subscription.removed_handler is not None and block.number <= subscription.delivered_block:
+                        self._call(subscription.removed_handler, dict(log, removed=True))
+
+        self._roll_back_to(common_block)
+
+    def _roll_back_to(self, block_number: int):
+        self._last_block = block_number
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.delivered_block = min(subscription.delivered_block, block_number)
+
+    def _call(self, handler, argument):
+        # a failing handler must not prevent other handlers from being called,
+        # nor make the engine process the same block again
+        try:
+            handler(argument)
+        except:
+            self.logger.exception(f"Event handler {handler} failed")
+
+    def __repr__(self):
+        return f"EventEngine({self.web3.providers[0]})"
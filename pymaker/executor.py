@@ -0,0 +1,94 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2017 reverendus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Optional
+
+from pymaker import ReceiptPoller, Transact
+
+
+class TransactExecutor:
+    """Executes many Ethereum transactions concurrently on one event loop.
+
+    The executor owns a single event loop, running in a background thread. Transactions submitted to it
+    are executed there in the same way as :py:meth:`pymaker.Transact.transact_async` does, including gas
+    price bumping. All of them share one :py:class:`pymaker.ReceiptPoller`, so receipts of all pending
+    transactions get checked together, in one JSON-RPC batch per node.
+
+    Submitting a transaction returns a `concurrent.futures.Future`, which will eventually hold either
+    a :py:class:`pymaker.Receipt` or `None`, exactly as the return value of `transact()`.
+
+    Args:
+        receipt_poller: The :py:class:`pymaker.ReceiptPoller` to check receipts with. If not specified,
+            a poller with default intervals is used.
+    """
+
+    def __init__(self, receipt_poller: Optional[ReceiptPoller] = None):
+        assert(isinstance(receipt_poller, ReceiptPoller) or (receipt_poller is None))
+
+        self.receipt_poller = receipt_poller if receipt_poller is not None else ReceiptPoller()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, transact: Transact, **kwargs) -> concurrent.futures.Future:
+        """Starts executing an Ethereum transaction.
+
+        Accepts the same keyword arguments as :py:meth:`pymaker.Transact.transact_async`.
+
+        Args:
+            transact: The transaction to execute.
+
+        Returns:
+            A `concurrent.futures.Future`, which will hold a :py:class:`pymaker.Receipt` object if the
+            transaction invocation was successful, or `None` if it failed.
+        """
+        assert(isinstance(transact, Transact))
+
+        return asyncio.run_coroutine_threadsafe(transact._transact_async(self.receipt_poller, **kwargs), self._loop)
+
+    def submit_all(self, transacts: list, **kwargs) -> list:
+        """Starts executing multiple Ethereum transactions.
+
+        Args:
+            transacts: List of :py:class:`pymaker.Transact` objects to execute.
+
+        Returns:
+            List of `concurrent.futures.Future` objects, one for each transaction.
+        """
+        assert(isinstance(transacts, list))
+
+        return [self.submit(transact, **kwargs) for transact in transacts]
+
+    def stop(self):
+        """Stops the event loop and the background thread.
+
+        Transactions which are still pending at that time will never complete.
+        """
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def __repr__(self):
+        return "TransactExecutor()"
@@ -23,7 +23,8 @@ import time
 
 from web3 import Web3
 
-from pymaker import register_filter_thread, any_filter_thread_present, stop_all_filter_threads, all_filter_threads_alive
+from pymaker import any_filter_thread_present, stop_all_filter_threads, all_filter_threads_alive
+from pymaker.events import EventEngine
 from pymaker.util import AsyncCallback
 
 
@@ -239,37 +240,33 @@ class Web3Lifecycle:
             self.terminated_externally = True
 
     def _start_watching_blocks(self):
-        def new_block_callback(block_hash):
+        def new_block_callback(block_number):
             self._last_block_time = datetime.datetime.now()
-            block = self.web3.eth.getBlock(block_hash)
-            block_number = block['number']
             if not self.web3.eth.syncing:
                 max_block_number = self.web3.eth.blockNumber
                 if block_number == max_block_number:
                     def on_start():
-                        self.logger.debug(f"Processing block #{block_number} ({block_hash})")
+                        self.logger.debug(f"Processing block #{block_number}")
 
                     def on_finish():
-                        self.logger.debug(f"Finished processing block #{block_number} ({block_hash})")
+                        self.logger.debug(f"Finished processing block #{block_number}")
 
                     if not self.terminated_internally and not self.terminated_externally:
                         if not self._on_block_callback.trigger(on_start, on_finish):
-                            self.logger.debug(f"Ignoring block #{block_number} ({block_hash}),"
+                            self.logger.debug(f"Ignoring block #{block_number},"
                                               f" as previous callback is still running")
                     else:
                         self.logger.debug(f"Ignoring block #{block_number} as keeper is already terminating")
                 else:
-                    self.logger.debug(f"Ignoring block #{block_number} ({block_hash}),"
+                    self.logger.debug(f"Ignoring block #{block_number},"
                                       f" as there is already block #{max_block_number} available")
             else:
-                self.logger.info(f"Ignoring block #{block_number} ({block_hash}), as the node is syncing")
+                self.logger.info(f"Ignoring block #{block_number}, as the node is syncing")
 
         if self.block_function:
             self._on_block_callback = AsyncCallback(self.block_function)
 
-            block_filter = self.web3.eth.filter('latest')
-            block_filter.watch(new_block_callback)
-            register_filter_thread(block_filter)
+            EventEngine.for_web3(self.web3).on_block(new_block_callback)
 
             self.logger.info("Watching for new blocks")
 
@@ -322,7 +319,8 @@ class Web3Lifecycle:
                 self.logger.warning("The keeper is terminating due do SIGINT/SIGTERM signal received")
                 break
 
-            # if any exception is raised in filter handling thread (could be an HTTP exception
+            # the event engine retries by itself if communication with the node fails, but if any
+            # exception is raised in a web3.py filter handling thread (could be an HTTP exception
             # while communicating with the node), web3.py does not retry and the filter becomes
             # dysfunctional i.e. no new callbacks will ever be fired. we detect it and terminate
             # the keeper so it can be restarted.
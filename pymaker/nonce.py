@@ -0,0 +1,191 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2017 reverendus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import logging
+import threading
+import time
+import weakref
+
+from web3 import Web3
+
+
+class NonceManager:
+    """Hands out nonces for Ethereum transactions sent from one account.
+
+    Instead of letting the Ethereum node pick the nonce and then fetching it back, the next nonce
+    is tracked locally. It gets seeded from the number of pending transactions of the account
+    on first use and then incremented with every nonce handed out. Nonces are handed out atomically,
+    so many transactions can be sent concurrently (even within one block) without racing on nonces.
+
+    If a transaction could not be sent, :py:meth:`failed` has to be called with its nonce. Unless the
+    node reported the nonce as already used, it gets handed out again to the next transaction, so no gap
+    is left which would prevent all transactions with higher nonces from being mined. If the nonce has
+    been used by someone else, the manager resynchronizes with the node instead.
+
+    The manager also compares its state with the number of pending transactions reported by the node
+    every `sync_interval` seconds. Nonces used by other users of the account in the meantime get skipped.
+    Nonces handed out so far are never handed out again just because the node does not know about them
+    yet, as transactions using them may still be on their way to the node. But if the lowest nonce the node
+    is missing has been handed out more than `sync_interval` seconds ago (i.e. the transaction using it has
+    been dropped by the network, and all transactions with higher nonces are stuck behind it), it gets
+    handed out again to the next transaction, which closes the gap.
+
+    Use :py:meth:`for_account` to get the instance shared by all transactions sent from an account.
+
+    Attributes:
+        web3: An instance of `Web` from `web3.py`.
+        account: Address of the account the nonces are handed out for.
+        sync_interval: Interval (in seconds) between checks of the number of pending transactions,
+            also the time after which a nonce still unknown to the node is considered to be dropped.
+    """
+
+    logger = logging.getLogger('nonce-manager')
+
+    # errors returned by nodes (both Parity and geth) if the nonce has already been used
+    NONCE_USED_ERRORS = ['nonce too low', 'nonce is too low', 'replacement transaction underpriced',
+                         'transaction with the same hash was already imported', 'known transaction',
+                         'already known']
+
+    _managers = weakref.WeakKeyDictionary()
+    _managers_lock = threading.Lock()
+
+    def __init__(self, web3: Web3, account: str, sync_interval: int = 60):
+        assert(isinstance(web3, Web3))
+        assert(isinstance(account, str))
+        assert(isinstance(sync_interval, int))
+
+        # managers are kept per `Web3` instance in a weak dictionary, so they must not keep it alive themselves
+        self._web3 = weakref.ref(web3)
+        self.account = account
+        self.sync_interval = sync_interval
+        self._next_nonce = None
+        self._released_nonces = set()
+        self._issued_nonces = {}
+        self._last_sync = None
+        self._lock = threading.Lock()
+
+    @property
+    def web3(self) -> Web3:
+        return self._web3()
+
+    @classmethod
+    def for_account(cls, web3: Web3, account: str) -> 'NonceManager':
+        """Returns the nonce manager shared by all transactions sent from `account`, creating it if necessary.
+
+        Args:
+            web3: An instance of `Web` from `web3.py`.
+            account: Address of the account.
+
+        Returns:
+            The `NonceManager` instance for this account.
+        """
+        assert(isinstance(web3, Web3))
+        assert(isinstance(account, str))
+
+        with cls._managers_lock:
+            managers = cls._managers.setdefault(web3, {})
+            if account.lower() not in managers:
+                managers[account.lower()] = NonceManager(web3, account)
+
+            return managers[account.lower()]
+
+    def next_nonce(self) -> int:
+        """Returns the nonce to be used for the next transaction sent from the account.
+
+        Returns:
+            The nonce, as an integer. Each call returns a different one, unless the nonce has been
+            passed to :py:meth:`failed` or the transaction using it has been dropped in the meantime.
+        """
+        with self._lock:
+            if self._next_nonce is None or time.time() - self._last_sync >= self.sync_interval:
+                self._sync()
+
+            if len(self._released_nonces) > 0:
+                nonce = min(self._released_nonces)
+                self._released_nonces.remove(nonce)
+            else:
+                nonce = self._next_nonce
+                self._next_nonce += 1
+
+            self._issued_nonces[nonce] = time.time()
+            return nonce
+
+    def failed(self, nonce: int, error: BaseException):
+        """Records that a transaction using `nonce` could not be sent.
+
+        Args:
+            nonce: Nonce handed out to the transaction by :py:meth:`next_nonce`.
+            error: Exception raised by the node when sending the transaction.
+        """
+        assert(isinstance(nonce, int))
+        assert(isinstance(error, BaseException))
+
+        if any(message in str(error).lower() for message in self.NONCE_USED_ERRORS):
+            self.logger.info(f"Nonce {nonce} of {self.account} has already been used")
+            self.resync()
+        else:
+            with self._lock:
+                self._issued_nonces.pop(nonce, None)
+                if self._next_nonce is None or nonce >= self._next_nonce:
+                    return
+
+                self._released_nonces.add(nonce)
+
+                # if the most recent nonces have been released, the counter can simply go back instead
+                while self._next_nonce - 1 in self._released_nonces:
+                    self._released_nonces.remove(self._next_nonce - 1)
+                    self._next_nonce -= 1
+
+    def resync(self):
+        """Skips nonces which have been used by someone else, according to the Ethereum node.
+
+        Also hands out the lowest nonce the node is missing again, if the transaction using it
+        seems to have been dropped.
+        """
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        # has to be called with `_lock` held
+        next_nonce = self.web3.eth.getTransactionCount(self.account, 'pending')
+        self._last_sync = time.time()
+
+        if self._next_nonce is None:
+            self._next_nonce = next_nonce
+
+        elif next_nonce > self._next_nonce:
+            self.logger.info(f"Resynchronized nonce of {self.account} from {self._next_nonce} to {next_nonce}")
+            self._next_nonce = next_nonce
+
+        # nonces below the pending transaction count have been used, either by us or by someone else
+        self._released_nonces = set(nonce for nonce in self._released_nonces if nonce >= next_nonce)
+        self._issued_nonces = {nonce: issued_at for nonce, issued_at in self._issued_nonces.items()
+                               if nonce >= next_nonce}
+
+        # if the node still does not know the lowest nonce we have handed out a while ago, the transaction
+        # using it got dropped and all our transactions with higher nonces are stuck, so we reuse it
+        if next_nonce < self._next_nonce and next_nonce not in self._released_nonces:
+            issued_at = self._issued_nonces.get(next_nonce)
+            if issued_at is None or self._last_sync - issued_at > self.sync_interval:
+                self.logger.warning(f"Nonce {next_nonce} of {self.account} seems to have been dropped,"
+                                    f" it will be used again")
+                self._issued_nonces.pop(next_nonce, None)
+                self._released_nonces.add(next_nonce)
+
+    def __repr__(self):
+        return f"NonceManager('{self.account}')"
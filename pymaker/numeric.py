@@ -19,6 +19,15 @@ from functools import total_ordering, reduce
 from decimal import *
 
 
+def _div_down(dividend: int, divisor: int) -> int:
+    # integer division rounding towards zero, same as `Decimal.quantize(1, rounding=ROUND_DOWN)`
+    # does, whereas the `//` operator rounds towards negative infinity
+    quotient = dividend // divisor
+    if quotient < 0 and quotient * divisor != dividend:
+        quotient += 1
+    return quotient
+
+
 @total_ordering
 class Wad:
     """Represents a number with 18 decimal places.
@@ -32,8 +41,12 @@ class Wad:
     Notes:
         The internal representation of `Wad` is an unbounded integer, the last 18 digits of it being treated
         as decimal places. It is similar to the representation used in Maker contracts (`uint128`).
+        All arithmetic is done on these integers directly, results of multiplication and division
+        get rounded towards zero.
     """
 
+    __slots__ = ('value',)
+
     def __init__(self, value):
         """Creates a new Wad number.
 
@@ -42,13 +55,13 @@ class Wad:
                 of Maker contracts is used which means that passing `1` will create an instance of `Wad`
                 with a value of `0.000000000000000001'.
         """
-        if isinstance(value, Wad):
-            self.value = value.value
-        elif isinstance(value, Ray):
-            self.value = int((Decimal(value.value) / (Decimal(10)**Decimal(9))).quantize(1, rounding=ROUND_DOWN))
-        elif isinstance(value, int):
+        if isinstance(value, int):
             # assert(value >= 0)
             self.value = value
+        elif isinstance(value, Wad):
+            self.value = value.value
+        elif isinstance(value, Ray):
+            self.value = _div_down(value.value, 10**9)
         else:
             raise ArithmeticError
 
@@ -81,19 +94,17 @@ class Wad:
     # z = cast((uint256(x) * y + WAD / 2) / WAD);
     def __mul__(self, other):
         if isinstance(other, Wad):
-            result = Decimal(self.value) * Decimal(other.value) / (Decimal(10) ** Decimal(18))
-            return Wad(int(result.quantize(1, rounding=ROUND_DOWN)))
+            return Wad(_div_down(self.value * other.value, 10**18))
         elif isinstance(other, Ray):
-            result = Decimal(self.value) * Decimal(other.value) / (Decimal(10) ** Decimal(27))
-            return Wad(int(result.quantize(1, rounding=ROUND_DOWN)))
+            return Wad(_div_down(self.value * other.value, 10**27))
         elif isinstance(other, int):
-            return Wad(int((Decimal(self.value) * Decimal(other)).quantize(1)))
+            return Wad(self.value * other)
         else:
             raise ArithmeticError
 
     def __truediv__(self, other):
         if isinstance(other, Wad):
-            return Wad(int((Decimal(self.value) * (Decimal(10) ** Decimal(18)) / Decimal(other.value)).quantize(1, rounding=ROUND_DOWN)))
+            return Wad(_div_down(self.value * 10**18, other.value))
         else:
             raise ArithmeticError
 
@@ -145,8 +156,12 @@ class Ray:
     Notes:
         The internal representation of `Ray` is an unbounded integer, the last 27 digits of it being treated
         as decimal places. It is similar to the representation used in Maker contracts (`uint128`).
+        All arithmetic is done on these integers directly, results of multiplication and division
+        get rounded towards zero.
     """
 
+    __slots__ = ('value',)
+
     def __init__(self, value):
         """Creates a new Ray number.
 
@@ -155,13 +170,13 @@ class Ray:
                 of Maker contracts is used which means that passing `1` will create an instance of `Ray`
                 with a value of `0.000000000000000000000000001'.
         """
-        if isinstance(value, Ray):
-            self.value = value.value
-        elif isinstance(value, Wad):
-            self.value = int((Decimal(value.value) * (Decimal(10)**Decimal(9))).quantize(1))
-        elif isinstance(value, int):
+        if isinstance(value, int):
             # assert(value >= 0)
             self.value = value
+        elif isinstance(value, Ray):
+            self.value = value.value
+        elif isinstance(value, Wad):
+            self.value = value.value * 10**9
         else:
             raise ArithmeticError
 
@@ -193,19 +208,17 @@ class Ray:
 
     def __mul__(self, other):
         if isinstance(other, Ray):
-            result = Decimal(self.value) * Decimal(other.value) / (Decimal(10) ** Decimal(27))
-            return Ray(int(result.quantize(1, rounding=ROUND_DOWN)))
+            return Ray(_div_down(self.value * other.value, 10**27))
         elif isinstance(other, Wad):
-            result = Decimal(self.value) * Decimal(other.value) / (Decimal(10) ** Decimal(18))
-            return Ray(int(result.quantize(1, rounding=ROUND_DOWN)))
+            return Ray(_div_down(self.value * other.value, 10**18))
         elif isinstance(other, int):
-            return Ray(int((Decimal(self.value) * Decimal(other)).quantize(1)))
+            return Ray(self.value * other)
         else:
             raise ArithmeticError
 
     def __truediv__(self, other):
         if isinstance(other, Ray):
-            return Ray(int((Decimal(self.value) * (Decimal(10) ** Decimal(27)) / Decimal(other.value)).quantize(1, rounding=ROUND_DOWN)))
+            return Ray(_div_down(self.value * 10**27, other.value))
         else:
             raise ArithmeticError
 
@@ -242,3 +255,345 @@ class Ray:
     def max(*args):
         """Returns the higher of the Ray values"""
         return reduce(lambda x, y: x if x > y else y, args[1:], args[0])
+
+
+def _pairs(values: tuple, other_values: tuple):
+    if len(values) != len(other_values):
+        raise ArithmeticError
+    return zip(values, other_values)
+
+
+class WadArray:
+    """Represents a sequence of `Wad` numbers which can be operated on as a whole.
+
+    `WadArray` implements addition, subtraction, multiplication and division operators, working element-wise.
+    The other operand can either be another `WadArray` of the same length or a single `Wad`, which is then
+    applied to each element. Multiplication also works with `RayArray`, `Ray` and `int`. The rounding
+    is exactly the same as for the corresponding `Wad` operations.
+
+    Element-wise comparisons are available as :py:meth:`lt`, :py:meth:`le`, :py:meth:`gt` and :py:meth:`ge`,
+    which return a list of booleans. Ordering operators (`<`, `<=`, `>`, `>=`) are not supported, as a list
+    would always be truthy when used in a condition, whereas `==` compares the arrays as a whole.
+
+    Notes:
+        The values are kept as a tuple of integers, in the same representation `Wad` uses internally,
+        so operating on an array does not create a `Wad` instance for each of its elements.
+    """
+
+    __slots__ = ('values',)
+
+    def __init__(self, values):
+        """Creates a new WadArray.
+
+        Args:
+            values: an instance of `WadArray` or `RayArray`, or an iterable of `Wad`, `Ray` or integers.
+                Each element is converted in the same way as the `Wad` constructor does.
+        """
+        if isinstance(values, WadArray):
+            self.values = values.values
+        elif isinstance(values, RayArray):
+            self.values = tuple(_div_down(value, 10**9) for value in values.values)
+        else:
+            self.values = tuple(value if isinstance(value, int) else Wad(value).value for value in values)
+
+    @classmethod
+    def _of(cls, values):
+        array = cls.__new__(cls)
+        array.values = tuple(values)
+        return array
+
+    def to_list(self) -> list:
+        """Returns the elements of this array as a list of `Wad`s."""
+        return [Wad(value) for value in self.values]
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return (Wad(value) for value in self.values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return WadArray._of(self.values[index])
+        else:
+            return Wad(self.values[index])
+
+    def __repr__(self):
+        return "WadArray(" + repr(list(self.values)) + ")"
+
+    def __add__(self, other):
+        if isinstance(other, WadArray):
+            return WadArray._of(x + y for x, y in _pairs(self.values, other.values))
+        elif isinstance(other, Wad):
+            return WadArray._of(x + other.value for x in self.values)
+        else:
+            raise ArithmeticError
+
+    def __sub__(self, other):
+        if isinstance(other, WadArray):
+            return WadArray._of(x - y for x, y in _pairs(self.values, other.values))
+        elif isinstance(other, Wad):
+            return WadArray._of(x - other.value for x in self.values)
+        else:
+            raise ArithmeticError
+
+    def __mul__(self, other):
+        if isinstance(other, WadArray):
+            return WadArray._of(_div_down(x * y, 10**18) for x, y in _pairs(self.values, other.values))
+        elif isinstance(other, RayArray):
+            return WadArray._of(_div_down(x * y, 10**27) for x, y in _pairs(self.values, other.values))
+        elif isinstance(other, Wad):
+            return WadArray._of(_div_down(x * other.value, 10**18) for x in self.values)
+        elif isinstance(other, Ray):
+            return WadArray._of(_div_down(x * other.value, 10**27) for x in self.values)
+        elif isinstance(other, int):
+            return WadArray._of(x * other for x in self.values)
+        else:
+            raise ArithmeticError
+
+    def __truediv__(self, other):
+        if isinstance(other, WadArray):
+            return WadArray._of(_div_down(x * 10**18, y) for x, y in _pairs(self.values, other.values))
+        elif isinstance(other, Wad):
+            return WadArray._of(_div_down(x * 10**18, other.value) for x in self.values)
+        else:
+            raise ArithmeticError
+
+    def __eq__(self, other):
+        if isinstance(other, WadArray):
+            return self.values == other.values
+        else:
+            return NotImplemented
+
+    def __hash__(self):
+        return hash(self.values)
+
+    def _compare(self, other, operator) -> list:
+        if isinstance(other, WadArray):
+            return [operator(x, y) for x, y in _pairs(self.values, other.values)]
+        elif isinstance(other, Wad):
+            return [operator(x, other.value) for x in self.values]
+        else:
+            raise ArithmeticError
+
+    def lt(self, other) -> list:
+        """Returns a list of booleans telling which elements are lower than `other`."""
+        return self._compare(other, lambda x, y: x < y)
+
+    def le(self, other) -> list:
+        """Returns a list of booleans telling which elements are lower than or equal to `other`."""
+        return self._compare(other, lambda x, y: x <= y)
+
+    def gt(self, other) -> list:
+        """Returns a list of booleans telling which elements are greater than `other`."""
+        return self._compare(other, lambda x, y: x > y)
+
+    def ge(self, other) -> list:
+        """Returns a list of booleans telling which elements are greater than or equal to `other`."""
+        return self._compare(other, lambda x, y: x >= y)
+
+    def sum(self) -> Wad:
+        """Returns the sum of all elements, `Wad(0)` for an empty array."""
+        return Wad(sum(self.values))
+
+    def min(self) -> Wad:
+        """Returns the lowest element. The array must not be empty."""
+        return Wad(min(self.values))
+
+    def max(self) -> Wad:
+        """Returns the highest element. The array must not be empty."""
+        return Wad(max(self.values))
+
+    def minimum(self, other):
+        """Returns an array of the lower of each pair of elements of this array and `other`.
+
+        Args:
+            other: an instance of `WadArray` of the same length or a single `Wad`.
+        """
+        if isinstance(other, WadArray):
+            return WadArray._of(min(x, y) for x, y in _pairs(self.values, other.values))
+        elif isinstance(other, Wad):
+            return WadArray._of(min(x, other.value) for x in self.values)
+        else:
+            raise ArithmeticError
+
+    def maximum(self, other):
+        """Returns an array of the higher of each pair of elements of this array and `other`.
+
+        Args:
+            other: an instance of `WadArray` of the same length or a single `Wad`.
+        """
+        if isinstance(other, WadArray):
+            return WadArray._of(max(x, y) for x, y in _pairs(self.values, other.values))
+        elif isinstance(other, Wad):
+            return WadArray._of(max(x, other.value) for x in self.values)
+        else:
+            raise ArithmeticError
+
+
+class RayArray:
+    """Represents a sequence of `Ray` numbers which can be operated on as a whole.
+
+    `RayArray` implements addition, subtraction, multiplication and division operators, working element-wise.
+    The other operand can either be another `RayArray` of the same length or a single `Ray`, which is then
+    applied to each element. Multiplication also works with `WadArray`, `Wad` and `int`. The rounding
+    is exactly the same as for the corresponding `Ray` operations.
+
+    Element-wise comparisons are available as :py:meth:`lt`, :py:meth:`le`, :py:meth:`gt` and :py:meth:`ge`,
+    which return a list of booleans. Ordering operators (`<`, `<=`, `>`, `>=`) are not supported, as a list
+    would always be truthy when used in a condition, whereas `==` compares the arrays as a whole.
+
+    Notes:
+        The values are kept as a tuple of integers, in the same representation `Ray` uses internally,
+        so operating on an array does not create a `Ray` instance for each of its elements.
+    """
+
+    __slots__ = ('values',)
+
+    def __init__(self, values):
+        """Creates a new RayArray.
+
+        Args:
+            values: an instance of `RayArray` or `WadArray`, or an iterable of `Ray`, `Wad` or integers.
+                Each element is converted in the same way as the `Ray` constructor does.
+        """
+        if isinstance(values, RayArray):
+            self.values = values.values
+        elif isinstance(values, WadArray):
+            self.values = tuple(value * 10**9 for value in values.values)
+        else:
+            self.values = tuple(value if isinstance(value, int) else Ray(value).value for value in values)
+
+    @classmethod
+    def _of(cls, values):
+        array = cls.__new__(cls)
+        array.values = tuple(values)
+        return array
+
+    def to_list(self) -> list:
+        """Returns the elements of this array as a list of `Ray`s."""
+        return [Ray(value) for value in self.values]
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return (Ray(value) for value in self.values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return RayArray._of(self.values[index])
+        else:
+            return Ray(self.values[index])
+
+    def __repr__(self):
+        return "RayArray(" + repr(list(self.values)) + ")"
+
+    def __add__(self, other):
+        if isinstance(other, RayArray):
+            return RayArray._of(x + y for x, y in _pairs(self.values, other.values))
+        elif isinstance(other, Ray):
+            return RayArray._of(x + other.value for x in self.values)
+        else:
+            raise ArithmeticError
+
+    def __sub__(self, other):
+        if isinstance(other, RayArray):
+            return RayArray._of(x - y for x, y in _pairs(self.values, other.values))
+        elif isinstance(other, Ray):
+            return RayArray._of(x - other.value for x in self.values)
+        else:
+            raise ArithmeticError
+
+    def __mul__(self, other):
+        if isinstance(other, RayArray):
+            return RayArray._of(_div_down(x * y, 10**27) for x, y in _pairs(self.values, other.values))
+        elif isinstance(other, WadArray):
+            return RayArray._of(_div_down(x * y, 10**18) for x, y in _pairs(self.values, other.values))
+        elif isinstance(other, Ray):
+            return RayArray._of(_div_down(x * other.value, 10**27) for x in self.values)
+        elif isinstance(other, Wad):
+            return RayArray._of(_div_down(x * other.value, 10**18) for x in self.values)
+        elif isinstance(other, int):
+            return RayArray._of(x * other for x in self.values)
+        else:
+            raise ArithmeticError
+
+    def __truediv__(self, other):
+        if isinstance(other, RayArray):
+            return RayArray._of(_div_down(x * 10**27, y) for x, y in _pairs(self.values, other.values))
+        elif isinstance(other, Ray):
+            return RayArray._of(_div_down(x * 10**27, other.value) for x in self.values)
+        else:
+            raise ArithmeticError
+
+    def __eq__(self, other):
+        if isinstance(other, RayArray):
+            return self.values == other.values
+        else:
+            return NotImplemented
+
+    def __hash__(self):
+        return hash(self.values)
+
+    def _compare(self, other, operator) -> list:
+        if isinstance(other, RayArray):
+            return [operator(x, y) for x, y in _pairs(self.values, other.values)]
+        elif isinstance(other, Ray):
+            return [operator(x, other.value) for x in self.values]
+        else:
+            raise ArithmeticError
+
+    def lt(self, other) -> list:
+        """Returns a list of booleans telling which elements are lower than `other`."""
+        return self._compare(other, lambda x, y: x < y)
+
+    def le(self, other) -> list:
+        """Returns a list of booleans telling which elements are lower than or equal to `other`."""
+        return self._compare(other, lambda x, y: x <= y)
+
+    def gt(self, other) -> list:
+        """Returns a list of booleans telling which elements are greater than `other`."""
+        return self._compare(other, lambda x, y: x > y)
+
+    def ge(self, other) -> list:
+        """Returns a list of booleans telling which elements are greater than or equal to `other`."""
+        return self._compare(other, lambda x, y: x >= y)
+
+    def sum(self) -> Ray:
+        """Returns the sum of all elements, `Ray(0)` for an empty array."""
+        return Ray(sum(self.values))
+
+    def min(self) -> Ray:
+        """Returns the lowest element. The array must not be empty."""
+        return Ray(min(self.values))
+
+    def max(self) -> Ray:
+        """Returns the highest element. The array must not be empty."""
+        return Ray(max(self.values))
+
+    def minimum(self, other):
+        """Returns an array of the lower of each pair of elements of this array and `other`.
+
+        Args:
+            other: an instance of `RayArray` of the same length or a single `Ray`.
+        """
+        if isinstance(other, RayArray):
+            return RayArray._of(min(x, y) for x, y in _pairs(self.values, other.values))
+        elif isinstance(other, Ray):
+            return RayArray._of(min(x, other.value) for x in self.values)
+        else:
+            raise ArithmeticError
+
+    def maximum(self, other):
+        """Returns an array of the higher of each pair of elements of this array and `other`.
+
+        Args:
+            other: an instance of `RayArray` of the same length or a single `Ray`.
+        """
+        if isinstance(other, RayArray):
+            return RayArray._of(max(x, y) for x, y in _pairs(self.values, other.values))
+        elif isinstance(other, Ray):
+            return RayArray._of(max(x, other.value) for x in self.values)
+        else:
+            raise ArithmeticError
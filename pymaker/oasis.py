@@ -15,13 +15,18 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import bisect
+import logging
+import threading
 from pprint import pformat
 from typing import Optional, List
 
 from web3 import Web3
 
 from pymaker import Contract, Address, Transact
+from pymaker.events import EventEngine
 from pymaker.numeric import Wad
+from pymaker.snapshot import Snapshot, web3_snapshot
 from pymaker.token import ERC20Token
 from pymaker.util import int_to_bytes32, bytes_to_int
 
@@ -43,6 +48,8 @@ class Order:
         timestamp: Date and time when this order has been created, as a unix timestamp.
     """
 
+    __slots__ = ('_market', 'order_id', 'maker', 'pay_token', 'pay_amount', 'buy_token', 'buy_amount', 'timestamp')
+
     def __init__(self, market, order_id: int, maker: Address, pay_token: Address, pay_amount: Wad, buy_token: Address,
                  buy_amount: Wad, timestamp: int):
         assert(isinstance(order_id, int))
@@ -82,7 +89,7 @@ class Order:
         return self.order_id
 
     def __repr__(self):
-        return pformat(vars(self))
+        return pformat({slot: getattr(self, slot) for slot in self.__slots__})
 
 
 class LogMake:
@@ -200,7 +207,7 @@ class SimpleMarket(Contract):
         for token in tokens:
             approval_function(token, self.address, 'OasisDEX')
 
-    def on_make(self, handler):
+    def on_make(self, handler, confirmations: int = 0, removed_handler=None):
         """Subscribe to LogMake events.
 
         `LogMake` events are emitted by the Oasis contract every time someone places an order.
@@ -208,12 +215,18 @@ class SimpleMarket(Contract):
         Args:
             handler: Function which will be called for each subsequent `LogMake` event.
                 This handler will receive a :py:class:`pymaker.oasis.LogMake` class instance.
+            confirmations: Number of blocks which have to be mined on top of the block containing
+                the event before `handler` gets called.
+            removed_handler: Optional function which will be called for each `LogMake` event already
+                passed to `handler`, which got removed from the chain by a chain reorganization.
         """
         assert(callable(handler))
+        assert(isinstance(confirmations, int))
+        assert(callable(removed_handler) or (removed_handler is None))
 
-        self._on_event(self._contract, 'LogMake', LogMake, handler)
+        self._on_event(self._contract, 'LogMake', LogMake, handler, confirmations, removed_handler)
 
-    def on_bump(self, handler):
+    def on_bump(self, handler, confirmations: int = 0, removed_handler=None):
         """Subscribe to LogBump events.
 
         `LogBump` events are emitted by the Oasis contract every time someone calls the `bump()` function.
@@ -221,12 +234,18 @@ class SimpleMarket(Contract):
         Args:
             handler: Function which will be called for each subsequent `LogBump` event.
                 This handler will receive a :py:class:`pymaker.oasis.LogBump` class instance.
+            confirmations: Number of blocks which have to be mined on top of the block containing
+                the event before `handler` gets called.
+            removed_handler: Optional function which will be called for each `LogBump` event already
+                passed to `handler`, which got removed from the chain by a chain reorganization.
         """
         assert(callable(handler))
+        assert(isinstance(confirmations, int))
+        assert(callable(removed_handler) or (removed_handler is None))
 
-        self._on_event(self._contract, 'LogBump', LogBump, handler)
+        self._on_event(self._contract, 'LogBump', LogBump, handler, confirmations, removed_handler)
 
-    def on_take(self, handler):
+    def on_take(self, handler, confirmations: int = 0, removed_handler=None):
         """Subscribe to LogTake events.
 
         `LogTake` events are emitted by the Oasis contract every time someone takes an order.
@@ -234,12 +253,18 @@ class SimpleMarket(Contract):
         Args:
             handler: Function which will be called for each subsequent `LogTake` event.
                 This handler will receive a :py:class:`pymaker.oasis.LogTake` class instance.
+            confirmations: Number of blocks which have to be mined on top of the block containing
+                the event before `handler` gets called.
+            removed_handler: Optional function which will be called for each `LogTake` event already
+                passed to `handler`, which got removed from the chain by a chain reorganization.
         """
         assert(callable(handler))
+        assert(isinstance(confirmations, int))
+        assert(callable(removed_handler) or (removed_handler is None))
 
-        self._on_event(self._contract, 'LogTake', LogTake, handler)
+        self._on_event(self._contract, 'LogTake', LogTake, handler, confirmations, removed_handler)
 
-    def on_kill(self, handler):
+    def on_kill(self, handler, confirmations: int = 0, removed_handler=None):
         """Subscribe to LogKill events.
 
         `LogKill` events are emitted by the Oasis contract every time someone cancels an order.
@@ -247,10 +272,16 @@ class SimpleMarket(Contract):
         Args:
             handler: Function which will be called for each subsequent `LogKill` event.
                 This handler will receive a :py:class:`pymaker.oasis.LogKill` class instance.
+            confirmations: Number of blocks which have to be mined on top of the block containing
+                the event before `handler` gets called.
+            removed_handler: Optional function which will be called for each `LogKill` event already
+                passed to `handler`, which got removed from the chain by a chain reorganization.
         """
         assert(callable(handler))
+        assert(isinstance(confirmations, int))
+        assert(callable(removed_handler) or (removed_handler is None))
 
-        self._on_event(self._contract, 'LogKill', LogKill, handler)
+        self._on_event(self._contract, 'LogKill', LogKill, handler, confirmations, removed_handler)
 
     def past_make(self, number_of_past_blocks: int) -> List[LogMake]:
         """Synchronously retrieve past LogMake events.
@@ -336,24 +367,39 @@ class SimpleMarket(Contract):
         if order_id in self._none_orders:
             return None
 
-        array = self._contract.call().offers(order_id)
-        if array[5] == 0:
-            self._none_orders.add(order_id)
-            return None
-        else:
-            return Order(market=self, order_id=order_id, maker=Address(array[4]), pay_token=Address(array[1]),
-                         pay_amount=Wad(array[0]), buy_token=Address(array[3]), buy_amount=Wad(array[2]),
-                         timestamp=array[5])
+        return self._parse_order(order_id, self._contract.call().offers(order_id))
 
-    def get_orders(self) -> List[Order]:
+    def get_orders(self, batch_size: int = Contract.DEFAULT_BATCH_SIZE) -> List[Order]:
         """Get all active order details.
 
+        Order details are retrieved in JSON-RPC batches of `batch_size` orders each, so the number
+        of round trips to the node is much lower than if each order was retrieved individually
+        with `get_order()`. Results are exactly the same though.
+
+        Args:
+            batch_size: Maximum number of orders to retrieve in one JSON-RPC batch.
+
         Returns:
             A list of `Order` objects representing all active orders on Oasis.
         """
-        orders = [self.get_order(order_id + 1) for order_id in range(self.get_last_order_id())]
+        assert(isinstance(batch_size, int))
+
+        order_ids = [order_id + 1 for order_id in range(self.get_last_order_id())
+                     if order_id + 1 not in self._none_orders]
+        arrays = self._call_many([('offers', [order_id]) for order_id in order_ids], batch_size)
+
+        orders = [self._parse_order(order_id, array) for order_id, array in zip(order_ids, arrays)]
         return [order for order in orders if order is not None]
 
+    def _parse_order(self, order_id: int, array: list) -> Optional[Order]:
+        if array[5] == 0:
+            self._none_orders.add(order_id)
+            return None
+        else:
+            return Order(market=self, order_id=order_id, maker=Address(array[4]), pay_token=Address(array[1]),
+                         pay_amount=Wad(array[0]), buy_token=Address(array[3]), buy_amount=Wad(array[2]),
+                         timestamp=array[5])
+
     #TODO make it return the id of the newly created order
     def make(self, pay_token: Address, pay_amount: Wad, buy_token: Address, buy_amount: Wad) -> Transact:
         """Create a new order.
@@ -491,6 +537,12 @@ class MatchingMarket(ExpiringMarket):
     abi = Contract._load_abi(__name__, 'abi/MatchingMarket.abi')
     bin = Contract._load_bin(__name__, 'abi/MatchingMarket.bin')
 
+    def __init__(self, web3: Web3, address: Address):
+        super().__init__(web3=web3, address=address)
+        self._order_book = OrderBook(self, reconcile_every=100)
+        self._order_book_started = False
+        self._order_book_lock = threading.Lock()
+
     @staticmethod
     def deploy(web3: Web3, close_time: int):
         """Deploy a new instance of the `MatchingMarket` contract.
@@ -624,7 +676,10 @@ class MatchingMarket(ExpiringMarket):
         due to high gas usage.
 
         This method is responsible for calculating the correct insertion position. It is used internally
-        by `make` when `pos` argument is omitted (or is `None`).
+        by `make` when `pos` argument is omitted (or is `None`). Orders are kept in an
+        :py:class:`pymaker.oasis.OrderBook`, which gets seeded with `get_orders()` when this method
+        is called for the first time and is kept up to date with market events from then on. The whole
+        order book only gets retrieved from the market again every 100 blocks, as a safety check.
 
         Args:
             pay_token: Address of the ERC20 token you want to put on sale.
@@ -640,12 +695,234 @@ class MatchingMarket(ExpiringMarket):
         assert(isinstance(buy_token, Address))
         assert(isinstance(buy_amount, Wad))
 
-        orders = filter(lambda o: o.pay_token == pay_token and
-                                  o.buy_token == buy_token and
-                                  o.pay_amount / o.buy_amount >= pay_amount / buy_amount, self.get_orders())
-
-        sorted_orders = sorted(orders, key=lambda o: o.pay_amount / o.buy_amount)
-        return sorted_orders[0].order_id if len(sorted_orders) > 0 else 0
+        with self._order_book_lock:
+            if not self._order_book_started:
+                self._order_book.start()
+                self._order_book_started = True
+            else:
+                # process events from blocks the event engine thread has not got to yet,
+                # so orders placed in the most recent blocks are taken into account
+                EventEngine.for_web3(self.web3).poll()
+                self._order_book.reconcile_if_due()
+
+        return self._order_book.position(pay_token=pay_token,
+                                         pay_amount=pay_amount,
+                                         buy_token=buy_token,
+                                         buy_amount=buy_amount)
 
     def __repr__(self):
         return f"MatchingMarket('{self.address}')"
+
+
+class OrderBook:
+    """Order book of an `OasisDEX` market, kept up to date incrementally using contract events.
+
+    Instead of retrieving all orders from the market with `get_orders()` every time, the order book
+    gets seeded once and then kept up to date by applying `LogMake`, `LogBump`, `LogTake` and `LogKill`
+    events emitted by the market contract. This way processing a new block only costs its events.
+
+    As events can get missed (a filter can die, a chain reorganization can happen etc.), the order book
+    gets reconciled with the actual state of the market every `reconcile_every` blocks. This happens
+    in `reconcile_if_due()`, which can be called for example from the `on_block` callback of the keeper.
+    A reconciliation can also be triggered manually at any time by calling `reconcile()`.
+
+    The typical usage pattern is as follows:
+
+        order_book = OrderBook(otc, reconcile_every=100)
+        order_book.start()
+
+        lifecycle.on_block(order_book.reconcile_if_due)
+
+    Attributes:
+        market: The market this order book represents.
+        reconcile_every: Number of blocks after which the order book gets reconciled with the market
+            by `reconcile_if_due()`.
+    """
+    logger = logging.getLogger('oasis-order-book')
+
+    def __init__(self, market: SimpleMarket, reconcile_every: int = 100):
+        assert(isinstance(market, SimpleMarket))
+        assert(isinstance(reconcile_every, int))
+        assert(reconcile_every > 0)
+
+        self.market = market
+        self.reconcile_every = reconcile_every
+
+        self._lock = threading.RLock()
+        self._orders = {}
+        self._pairs = {}
+        self._reconciled_block = None
+
+    def start(self):
+        """Seeds the order book and starts keeping it up to date by listening to market events.
+
+        Events get subscribed to before the order book gets seeded, so no event can get missed
+        in between these two operations.
+        """
+        self.market.on_make(self.apply)
+        self.market.on_bump(self.apply)
+        self.market.on_take(self.apply)
+        self.market.on_kill(self.apply)
+
+        self.reconcile()
+
+    def reconcile(self):
+        """Replaces the contents of the order book with orders retrieved from the market.
+
+        Events from the block the order book has been reconciled at and from earlier blocks
+        will be ignored from now on, as their effects are already reflected in the order book.
+        """
+        with self._lock:
+            # orders have to be read from the same block `_reconciled_block` gets set to, otherwise
+            # events from blocks mined while `get_orders()` was running could get ignored by `apply()`
+            snapshot = Snapshot.active(self.market.web3)
+            if snapshot is not None:
+                block_number = snapshot.block_number
+                orders = self.market.get_orders()
+            else:
+                with web3_snapshot(self.market.web3) as snapshot:
+                    block_number = snapshot.block_number
+                    orders = self.market.get_orders()
+
+            self._orders = {}
+            self._pairs = {}
+            for order in orders:
+                self._add(order)
+
+            self._reconciled_block = block_number
+            self.logger.debug(f"Reconciled order book of {self.market} at block #{block_number},"
+                              f" {len(orders)} order(s) present")
+
+    def reconcile_if_due(self):
+        """Reconciles the order book with the market if at least `reconcile_every` blocks
+        passed since the last reconciliation (or if the order book has never been seeded)."""
+        with self._lock:
+            block_number = self.market.web3.eth.blockNumber
+            if self._reconciled_block is None or \
+                    block_number < self._reconciled_block or \
+                    block_number - self._reconciled_block >= self.reconcile_every:
+                self.reconcile()
+
+    def apply(self, event):
+        """Applies a market event to the order book.
+
+        Used as the handler for all events the order book subscribes to in `start()`.
+        Can also be used to replay events retrieved with `past_make()`, `past_take()` etc.
+
+        Args:
+            event: Either :py:class:`pymaker.oasis.LogMake`, :py:class:`pymaker.oasis.LogBump`,
+                :py:class:`pymaker.oasis.LogTake` or :py:class:`pymaker.oasis.LogKill`.
+        """
+        assert(isinstance(event, (LogMake, LogBump, LogTake, LogKill)))
+
+        with self._lock:
+            if self._reconciled_block is not None and event.raw['blockNumber'] <= self._reconciled_block:
+                return
+
+            if isinstance(event, LogMake) or isinstance(event, LogBump):
+                self._remove(event.order_id)
+                self._add(Order(market=self.market, order_id=event.order_id, maker=event.maker,
+                                pay_token=event.pay_token, pay_amount=event.pay_amount,
+                                buy_token=event.buy_token, buy_amount=event.buy_amount,
+                                timestamp=event.timestamp))
+
+            elif isinstance(event, LogTake):
+                order = self._remove(event.order_id)
+                if order is None:
+                    self.logger.debug(f"Ignoring LogTake for unknown order #{event.order_id}")
+                    return
+
+                pay_amount = order.pay_amount - event.take_amount
+                buy_amount = order.buy_amount - event.give_amount
+                if pay_amount > Wad(0) and buy_amount > Wad(0):
+                    self._add(Order(market=self.market, order_id=order.order_id, maker=order.maker,
+                                    pay_token=order.pay_token, pay_amount=pay_amount,
+                                    buy_token=order.buy_token, buy_amount=buy_amount,
+                                    timestamp=order.timestamp))
+
+            elif isinstance(event, LogKill):
+                self._remove(event.order_id)
+
+    def order(self, order_id: int) -> Optional[Order]:
+        """Get order details.
+
+        Args:
+            order_id: The id of the order to get the details of.
+
+        Returns:
+            An instance of `Order` if the order is present in the order book, `None` otherwise.
+        """
+        assert(isinstance(order_id, int))
+
+        with self._lock:
+            return self._orders.get(order_id)
+
+    def orders(self) -> List[Order]:
+        """Get all orders present in the order book.
+
+        Returns:
+            A list of `Order` objects, sorted by their ids.
+        """
+        with self._lock:
+            return sorted(self._orders.values(), key=lambda order: order.order_id)
+
+    def orders_by_pair(self, pay_token: Address, buy_token: Address) -> List[Order]:
+        """Get all orders for a token pair, sorted by price.
+
+        Args:
+            pay_token: The address of the token which is put on sale.
+            buy_token: The address of the token the order creators want to be paid with.
+
+        Returns:
+            A list of `Order` objects, sorted by `sell_to_buy_price` (ascending). Orders
+            with the same price are sorted by their ids.
+        """
+        assert(isinstance(pay_token, Address))
+        assert(isinstance(buy_token, Address))
+
+        with self._lock:
+            return [self._orders[order_id] for _, order_id in self._pairs.get((pay_token, buy_token), [])]
+
+    def position(self, pay_token: Address, pay_amount: Wad, buy_token: Address, buy_amount: Wad) -> int:
+        """Calculate the position (`pos`) new order should be inserted at in a `MatchingMarket`.
+
+        The position is the id of the cheapest order for the same token pair with a price not lower
+        than the price of the new order. It gets found with a binary search on the per-pair price index.
+
+        Args:
+            pay_token: Address of the ERC20 token you want to put on sale.
+            pay_amount: Amount of the `pay_token` token you want to put on sale.
+            buy_token: Address of the ERC20 token you want to be paid with.
+            buy_amount: Amount of the `buy_token` you want to receive.
+
+        Returns:
+            The position (`pos`) new order should be inserted at, `0` if there is no such order.
+        """
+        assert(isinstance(pay_token, Address))
+        assert(isinstance(pay_amount, Wad))
+        assert(isinstance(buy_token, Address))
+        assert(isinstance(buy_amount, Wad))
+
+        with self._lock:
+            pair = self._pairs.get((pay_token, buy_token), [])
+            index = bisect.bisect_left(pair, (pay_amount / buy_amount, 0))
+            return pair[index][1] if index < len(pair) else 0
+
+    @staticmethod
+    def _key(order: Order) -> tuple:
+        return order.pay_amount / order.buy_amount, order.order_id
+
+    def _add(self, order: Order):
+        self._orders[order.order_id] = order
+        bisect.insort(self._pairs.setdefault((order.pay_token, order.buy_token), []), self._key(order))
+
+    def _remove(self, order_id: int) -> Optional[Order]:
+        order = self._orders.pop(order_id, None)
+        if order is not None:
+            pair = self._pairs[(order.pay_token, order.buy_token)]
+            del pair[bisect.bisect_left(pair, self._key(order))]
+
+        return order
+
+    def __repr__(self):
+        return f"OrderBook({self.market})"
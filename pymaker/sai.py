@@ -15,11 +15,16 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import bisect
+import logging
+import threading
+from fractions import Fraction
 from typing import Optional
 
+import eth_utils
 from web3 import Web3
 
-from pymaker import Address, Contract, Transact
+from pymaker import Address, Contract, Transact, cached, cached_per_block
 from pymaker.numeric import Wad, Ray
 from pymaker.token import ERC20Token
 from pymaker.util import int_to_bytes32
@@ -52,6 +57,60 @@ class Cup:
         return f"Cup(cup_id={self.cup_id}, lad={repr(self.lad)}, art={self.art}, ink={self.ink})"
 
 
+class CupState:
+    """Represents the state of a single cup at a given moment, as returned by `Tub.cup_states()`.
+
+    Attributes:
+        cup_id: The identifier of the cup.
+        lad: Address of the owner of the cup.
+        ink: The amount of SKR collateral locked in the cup.
+        art: The amount of outstanding debt (denominated in internal debt units).
+        tab: The amount of outstanding debt, in SAI. The same value `Tub.tab()` returns.
+        collateralization: Value of the collateral divided by the value of the debt (both in REF),
+            `None` if the cup has no debt. The cup can be liquidated if it falls below `mat()`.
+        safe: `True` if the cup is safe. The same value `Tub.safe()` returns.
+    """
+
+    __slots__ = ('cup_id', 'lad', 'ink', 'art', 'tab', 'collateralization', 'safe')
+
+    def __init__(self, cup_id: int, lad: Address, ink: Wad, art: Wad, tab: Wad,
+                 collateralization: Optional[Wad], safe: bool):
+        assert(isinstance(cup_id, int))
+        assert(isinstance(lad, Address))
+        assert(isinstance(ink, Wad))
+        assert(isinstance(art, Wad))
+        assert(isinstance(tab, Wad))
+        assert(isinstance(collateralization, Wad) or (collateralization is None))
+        assert(isinstance(safe, bool))
+
+        self.cup_id = cup_id
+        self.lad = lad
+        self.ink = ink
+        self.art = art
+        self.tab = tab
+        self.collateralization = collateralization
+        self.safe = safe
+
+    def __repr__(self):
+        return f"CupState(cup_id={self.cup_id}, lad={repr(self.lad)}, ink={self.ink}, art={self.art}," \
+               f" tab={self.tab}, collateralization={self.collateralization}, safe={self.safe})"
+
+
+def _rmul(x: int, y: int) -> int:
+    # `rmul` from `DSMath`, the same rounding the `Tub` uses when calculating `tab()` and `safe()`
+    return (x * y + 10**27 // 2) // 10**27
+
+
+def _pro_and_con(ink: int, art: int, tag: int, chi: int, par: int) -> tuple:
+    # value of the collateral and of the debt of a cup (both in REF), calculated the same way `Tub.safe()` does
+    return _rmul(tag, ink), _rmul(par, _rmul(art, chi))
+
+
+def _safe(ink: int, art: int, tag: int, mat: int, chi: int, par: int) -> bool:
+    pro, con = _pro_and_con(ink, art, tag, chi, par)
+    return pro >= _rmul(con, mat)
+
+
 class Tub(Contract):
     """A client for the `Tub` contract, the primary contract driving the `SAI Stablecoin System`.
 
@@ -125,6 +184,7 @@ class Tub(Contract):
         """
         return self._contract.call().era()
 
+    @cached
     def tap(self) -> Address:
         """Get the address of the `Tap` contract.
 
@@ -133,6 +193,7 @@ class Tub(Contract):
         """
         return Address(self._contract.call().tap())
 
+    @cached
     def sai(self) -> Address:
         """Get the SAI token.
 
@@ -141,6 +202,7 @@ class Tub(Contract):
         """
         return Address(self._contract.call().sai())
 
+    @cached
     def sin(self) -> Address:
         """Get the SIN token.
 
@@ -149,6 +211,7 @@ class Tub(Contract):
         """
         return Address(self._contract.call().sin())
 
+    @cached
     def gov(self) -> Address:
         """Get the MKR token.
 
@@ -157,6 +220,7 @@ class Tub(Contract):
         """
         return Address(self._contract.call().gov())
 
+    @cached
     def vox(self) -> Address:
         """Get the address of the `Vox` contract.
 
@@ -173,6 +237,7 @@ class Tub(Contract):
         """
         return Address(self._contract.call().pit())
 
+    @cached
     def skr(self) -> Address:
         """Get the SKR token.
 
@@ -181,6 +246,7 @@ class Tub(Contract):
         """
         return Address(self._contract.call().skr())
 
+    @cached
     def gem(self) -> Address:
         """Get the collateral token (eg. W-ETH).
 
@@ -189,6 +255,7 @@ class Tub(Contract):
         """
         return Address(self._contract.call().gem())
 
+    @cached
     def pip(self) -> Address:
         """Get the reference (GEM) price feed.
 
@@ -197,6 +264,7 @@ class Tub(Contract):
         """
         return Address(self._contract.call().pip())
 
+    @cached
     def pep(self) -> Address:
         """Get the governance (MKR) price feed.
 
@@ -381,6 +449,7 @@ class Tub(Contract):
         """
         return Wad(self._contract.call().air())
 
+    @cached_per_block
     def tag(self) -> Ray:
         """Get the reference price (REF per SKR).
 
@@ -392,6 +461,7 @@ class Tub(Contract):
         """
         return Ray(self._contract.call().tag())
 
+    @cached_per_block
     def per(self) -> Ray:
         """Get the current average entry/exit price (GEM per SKR).
 
@@ -500,6 +570,48 @@ class Tub(Contract):
         assert isinstance(cup_id, int)
         return self._contract.call().safe(int_to_bytes32(cup_id))
 
+    def cup_states(self, cup_ids=None, batch_size: int = Contract.DEFAULT_BATCH_SIZE) -> list:
+        """Get the state of many cups at once.
+
+        Instead of calling `cups()`, `tab()` and `safe()` for each cup separately, cup details get fetched
+        in JSON-RPC batches of `batch_size` calls each. `tag()`, `mat()`, `chi()` and `par()` are read only
+        once, and the debt and collateralization of all cups is calculated locally, with exactly the same
+        rounding the contract uses. As the values are read in a few separate round trips, it is
+        advisable to call it within :py:func:`pymaker.snapshot.web3_snapshot` if they have to reflect
+        the same block.
+
+        Args:
+            cup_ids: Ids of the cups to get the state of, as a list or a `range`. If not specified,
+                the state of all cups (from `1` to `cupi()`) will be returned.
+            batch_size: Maximum number of calls to send to the node in one JSON-RPC batch.
+
+        Returns:
+            List of :py:class:`pymaker.sai.CupState` objects, in the order of `cup_ids`. Cups which
+            do not exist or have been shut are skipped.
+        """
+        assert(isinstance(cup_ids, list) or isinstance(cup_ids, range) or (cup_ids is None))
+        assert(isinstance(batch_size, int))
+
+        tag, mat, chi, vox, cupi = self._call_many([('tag', []), ('mat', []), ('chi', []), ('vox', []), ('cupi', [])])
+        par = Vox(web3=self.web3, address=Address(vox)).par().value
+        if cup_ids is None:
+            cup_ids = range(1, cupi + 1)
+
+        cups = self._call_many([('cups', [int_to_bytes32(cup_id)]) for cup_id in cup_ids], batch_size)
+
+        result = []
+        for cup_id, (lad, ink, art, _) in zip(cup_ids, cups):
+            lad = Address(lad)
+            if lad == Address('0x0000000000000000000000000000000000000000'):
+                continue
+
+            pro, con = _pro_and_con(ink, art, tag, chi, par)
+            result.append(CupState(cup_id=cup_id, lad=lad, ink=Wad(ink), art=Wad(art), tab=Wad(_rmul(art, chi)),
+                                   collateralization=Wad(pro) / Wad(con) if con > 0 else None,
+                                   safe=_safe(ink, art, tag, mat, chi, par)))
+
+        return result
+
     def join(self, amount_in_skr: Wad) -> Transact:
         """Buy SKR for GEMs.
 
@@ -688,6 +800,7 @@ class Tap(Contract):
         approval_function(ERC20Token(web3=self.web3, address=self.skr()), self.address, 'Tap')
         approval_function(ERC20Token(web3=self.web3, address=tub.gem()), self.address, 'Tap')
 
+    @cached
     def tub(self) -> Address:
         """Get the address of the `Tub` contract.
 
@@ -696,6 +809,7 @@ class Tap(Contract):
         """
         return Address(self._contract.call().tub())
 
+    @cached
     def sai(self) -> Address:
         """Get the SAI token.
 
@@ -704,6 +818,7 @@ class Tap(Contract):
         """
         return Address(self._contract.call().sai())
 
+    @cached
     def sin(self) -> Address:
         """Get the SIN token.
 
@@ -712,6 +827,7 @@ class Tap(Contract):
         """
         return Address(self._contract.call().sin())
 
+    @cached
     def skr(self) -> Address:
         """Get the SKR token.
 
@@ -767,6 +883,7 @@ class Tap(Contract):
         assert isinstance(new_gap, Wad)
         return Transact(self, self.web3, self.abi, self.address, self._contract, 'mold', ['gap', new_gap.value])
 
+    @cached_per_block
     def s2s(self) -> Ray:
         """Get the current SKR per SAI rate (for `boom` and `bust`).
 
@@ -938,6 +1055,7 @@ class Vox(Contract):
         """
         return self._contract.call().era()
 
+    @cached_per_block
     def par(self) -> Ray:
         """Get the accrued holder fee (REF per SAI).
 
@@ -956,3 +1074,277 @@ class Vox(Contract):
 
     def __repr__(self):
         return f"Vox('{self.address}')"
+
+
+class CupTracker:
+    """Keeps track of cups of a `Tub`, so unsafe cups can be found without checking all of them.
+
+    Instead of calling `safe()` for every cup on every block, the tracker keeps an in-memory copy of all cups,
+    seeded once with `Tub.cup_states()` and then kept up to date by applying `LogNewCup` events and `LogNote`
+    events of `lock`, `free`, `draw`, `wipe`, `give`, `shut` and `bite` emitted by the `Tub`. Only cups
+    touched by these events get retrieved from the contract again.
+
+    Cups with debt are kept sorted by their `ink` to `art` ratio. As a cup is unsafe exactly when this ratio
+    drops below a threshold depending only on `tag()`, `mat()`, `chi()` and `par()`, changes of these values
+    do not require any per-cup work. Only the threshold gets recalculated, and `unsafe_cups()` checks the
+    cups at the head of the sorted list only, using exactly the same rounding as `Tub.safe()` does.
+    Rounding can shift the value of a dust cup (one with a tiny `art`) by a few wei, which is more than
+    the margin above the threshold accounts for, so such cups get always checked exactly as well.
+
+    The typical usage pattern is as follows:
+
+        cup_tracker = CupTracker(tub)
+        cup_tracker.update()
+
+        lifecycle.on_block(cup_tracker.update)
+
+        for cup in cup_tracker.unsafe_cups():
+            tub.bite(cup.cup_id).transact()
+
+    Attributes:
+        tub: The `Tub` the cups of which are being tracked.
+    """
+    logger = logging.getLogger('sai-cup-tracker')
+
+    # the threshold is only used to narrow the scan, each candidate cup gets checked exactly afterwards,
+    # so a small margin makes sure no unsafe cup gets omitted due to `rmul` rounding (unless it's a dust cup)
+    THRESHOLD_MARGIN = Fraction(1000001, 1000000)
+
+    CUP_FUNCTIONS = ['lock', 'free', 'draw', 'wipe', 'give', 'shut', 'bite']
+
+    def __init__(self, tub: Tub):
+        assert(isinstance(tub, Tub))
+
+        self.tub = tub
+
+        self._lock = threading.RLock()
+        self._cups = {}
+        self._keys = []
+        self._keys_by_art = []
+        self._reconciled_block = None
+        self._last_block = None
+        self._prices = None
+        self._threshold = None
+        self._dust_art = None
+
+        self._log_new_cup_topic = None
+        self._cup_selectors = set()
+        for element in tub.abi:
+            if element.get('type') == 'event' and element.get('name') == 'LogNewCup':
+                self._log_new_cup_topic = eth_utils.event_abi_to_log_topic(element).lower()
+            if element.get('type') == 'function' and element.get('name') in self.CUP_FUNCTIONS:
+                self._cup_selectors.add(eth_utils.function_abi_to_4byte_selector(element).lower())
+
+    def reconcile(self):
+        """Replaces the contents of the tracker with the state of all cups retrieved from the `Tub`.
+
+        Events from the block the tracker has been reconciled at and from earlier blocks will be
+        ignored from now on, as their effects are already reflected in the tracker.
+        """
+        with self._lock:
+            block_number = self.tub.web3.eth.blockNumber
+            cup_states = self.tub.cup_states()
+
+            self._cups = {}
+            self._keys = []
+            self._keys_by_art = []
+            for cup_state in cup_states:
+                self._add(Cup(cup_state.cup_id, cup_state.lad, cup_state.ink, cup_state.art))
+
+            self._reconciled_block = block_number
+            self._last_block = block_number
+            self.update_prices()
+
+            self.logger.debug(f"Reconciled cup tracker of {self.tub} at block #{block_number},"
+                              f" {len(self._cups)} cup(s) present")
+
+    def update(self):
+        """Applies all `Tub` events emitted since the last update, then refreshes the prices.
+
+        Seeds the tracker if it hasn't been seeded yet. Also reseeds it if the chain seems to
+        have been rewound, as in this case the events cannot be relied upon. Intended to be called
+        on every new block, for example from the `on_block` callback of the keeper.
+        """
+        with self._lock:
+            block_number = self.tub.web3.eth.blockNumber
+            if self._last_block is None or block_number < self._last_block:
+                self.reconcile()
+                return
+
+            if block_number > self._last_block:
+                self.apply_logs(self.tub._get_logs(self._last_block + 1, block_number))
+                self._last_block = block_number
+
+            self.update_prices()
+
+    def apply_logs(self, logs: list):
+        """Applies raw `Tub` logs to the tracker.
+
+        Cups touched by the logs get retrieved from the `Tub` again, in one JSON-RPC batch.
+        Logs from blocks the tracker has been reconciled at or before get ignored.
+
+        Args:
+            logs: List of raw logs, as returned by `web3.eth.getFilterLogs()`.
+        """
+        assert(isinstance(logs, list))
+
+        with self._lock:
+            cup_ids = []
+            for log in logs:
+                if self._reconciled_block is not None and log['blockNumber'] <= self._reconciled_block:
+                    continue
+
+                cup_id = self._cup_id(log)
+                if cup_id is not None and cup_id not in cup_ids:
+                    cup_ids.append(cup_id)
+
+            self.refresh(cup_ids)
+
+    def refresh(self, cup_ids: list):
+        """Retrieves the given cups from the `Tub` again and updates the tracker with them.
+
+        Args:
+            cup_ids: Ids of the cups to refresh.
+        """
+        assert(isinstance(cup_ids, list))
+
+        if len(cup_ids) == 0:
+            return
+
+        with self._lock:
+            cups = self.tub._call_many([('cups', [int_to_bytes32(cup_id)]) for cup_id in cup_ids])
+            for cup_id, (lad, ink, art, _) in zip(cup_ids, cups):
+                self._remove(cup_id)
+
+                lad = Address(lad)
+                if lad != Address('0x0000000000000000000000000000000000000000'):
+                    self._add(Cup(cup_id, lad, Wad(ink), Wad(art)))
+
+            self.logger.debug(f"Refreshed cup(s) {cup_ids}")
+
+    def update_prices(self):
+        """Reads `tag()`, `mat()`, `chi()` and `par()` and recalculates the liquidation threshold.
+
+        Called by `update()`, but can also be called on its own if only these values could have changed.
+        """
+        with self._lock:
+            tag, mat, chi, vox = self.tub._call_many([('tag', []), ('mat', []), ('chi', []), ('vox', [])])
+            par = Vox(web3=self.tub.web3, address=Address(vox)).par().value
+
+            self._prices = (tag, mat, chi, par)
+            if tag > 0:
+                # a cup is safe if `tag * ink >= mat * par * chi * art` (ignoring rounding)
+                self._threshold = Fraction(mat * par * chi, tag * 10**54) * self.THRESHOLD_MARGIN
+
+                # `rmul` rounding changes the value of the collateral by at most 1/2 wei, and the value of
+                # the debt by at most 1/2 wei for each `rmul`, multiplied by the factors applied afterwards.
+                # If that's more than the margin above, the cup has to be checked exactly in any case.
+                if mat * par * chi > 0:
+                    slack = Fraction(1, 2) * (2 + Fraction(mat * par, 10**54) + Fraction(mat, 10**27))
+                    self._dust_art = slack * 10**81 / ((self.THRESHOLD_MARGIN - 1) * mat * par * chi)
+                else:
+                    self._dust_art = None
+            else:
+                self._threshold = None
+                self._dust_art = None
+
+    def cup(self, cup_id: int) -> Optional[Cup]:
+        """Returns a cup being tracked, if it exists.
+
+        Args:
+            cup_id: Id of the cup.
+
+        Returns:
+            :py:class:`pymaker.sai.Cup` or `None` if the cup doesn't exist or has been shut.
+        """
+        assert(isinstance(cup_id, int))
+
+        with self._lock:
+            return self._cups.get(cup_id)
+
+    def cups(self) -> list:
+        """Returns all cups being tracked.
+
+        Returns:
+            List of :py:class:`pymaker.sai.Cup` objects, ordered by cup id.
+        """
+        with self._lock:
+            return [self._cups[cup_id] for cup_id in sorted(self._cups)]
+
+    def unsafe_cups(self) -> list:
+        """Returns cups which are unsafe, according to the prices read during the last update.
+
+        Only cups with the lowest `ink` to `art` ratio get checked, up to the first one which is
+        certainly safe, so the cost of this method depends on the number of unsafe cups and not
+        on the number of all cups.
+
+        Returns:
+            List of unsafe cups, as :py:class:`pymaker.sai.Cup` objects, the least collateralized ones first.
+        """
+        with self._lock:
+            if self._prices is None:
+                return []
+
+            tag, mat, chi, par = self._prices
+            result = []
+            for ratio, cup_id in self._keys:
+                if self._threshold is not None and ratio > self._threshold:
+                    break
+
+                cup = self._cups[cup_id]
+                if not _safe(cup.ink.value, cup.art.value, tag, mat, chi, par):
+                    result.append(cup)
+
+            # dust cups above the threshold can still be unsafe due to rounding
+            if self._threshold is not None and self._dust_art is not None:
+                for art, cup_id in self._keys_by_art:
+                    if art >= self._dust_art:
+                        break
+
+                    cup = self._cups[cup_id]
+                    if self._key(cup)[0] > self._threshold \
+                            and not _safe(cup.ink.value, cup.art.value, tag, mat, chi, par):
+                        result.append(cup)
+
+                result.sort(key=self._key)
+
+            return result
+
+    def _cup_id(self, log) -> Optional[int]:
+        topics = [topic.lower() for topic in log['topics']]
+        if len(topics) == 0:
+            return None
+
+        if topics[0] == self._log_new_cup_topic:
+            return int(log['data'], 16)
+
+        if len(topics) == 4 and topics[0][:10] in self._cup_selectors:
+            return int(topics[2], 16)
+
+        return None
+
+    @staticmethod
+    def _key(cup: Cup) -> tuple:
+        return Fraction(cup.ink.value, cup.art.value), cup.cup_id
+
+    def _add(self, cup: Cup):
+        self._cups[cup.cup_id] = cup
+
+        # cups without any debt are always safe, so there is no point in keeping them sorted
+        if cup.art > Wad(0):
+            bisect.insort(self._keys, self._key(cup))
+            bisect.insort(self._keys_by_art, (cup.art.value, cup.cup_id))
+
+    def _remove(self, cup_id: int) -> Optional[Cup]:
+        cup = self._cups.pop(cup_id, None)
+        if cup is not None and cup.art > Wad(0):
+            key = self._key(cup)
+            index = bisect.bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+
+            index = bisect.bisect_left(self._keys_by_art, (cup.art.value, cup.cup_id))
+            if index < len(self._keys_by_art) and self._keys_by_art[index] == (cup.art.value, cup.cup_id):
+                del self._keys_by_art[index]
+
+        return cup
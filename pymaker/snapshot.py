@@ -0,0 +1,227 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2017 reverendus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import logging
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Optional
+
+from web3 import Web3
+
+
+class Snapshot:
+    """Consistent, cached view of the blockchain state as of one block.
+
+    Snapshots get created by :py:func:`web3_snapshot`. While a snapshot is active, all contract calls
+    made through its `Web3` instance by the thread which created it (by `pymaker` contract wrappers,
+    by `Contract._call_many()` and by `web3.py` itself) are executed against the block the snapshot
+    has been created for, instead of against `latest`. This way all values read within a snapshot are
+    consistent with each other. Other threads using the same `Web3` instance are not affected.
+
+    As the state of a past block never changes, results of all read requests made within a snapshot get
+    cached, so reading the same value again does not result in another request to the node. Values which
+    are going to be needed can be retrieved in one JSON-RPC batch upfront using :py:meth:`prefetch`.
+
+    Attributes:
+        web3: An instance of `Web` from `web3.py`.
+        block_number: Number of the block all reads are pinned to.
+        hits: Number of read requests answered from the snapshot cache.
+        misses: Number of read requests which had to be sent to the node.
+    """
+
+    logger = logging.getLogger('snapshot')
+
+    CACHEABLE_METHODS = ['eth_call', 'eth_getBalance', 'eth_getCode', 'eth_getStorageAt']
+
+    # active snapshots are kept per thread, so a snapshot never affects reads made by other threads
+    _local = threading.local()
+    _middleware_lock = threading.Lock()
+
+    def __init__(self, web3: Web3, block_number: int):
+        assert(isinstance(web3, Web3))
+        assert(isinstance(block_number, int))
+
+        self.web3 = web3
+        self.block_number = block_number
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._results = {}
+
+    @classmethod
+    def active(cls, web3: Web3) -> Optional['Snapshot']:
+        """Returns the snapshot currently active for `web3` in the calling thread, `None` if there is none."""
+        return cls._thread_snapshots().get(web3)
+
+    @classmethod
+    def _thread_snapshots(cls) -> weakref.WeakKeyDictionary:
+        if not hasattr(cls._local, 'snapshots'):
+            cls._local.snapshots = weakref.WeakKeyDictionary()
+
+        return cls._local.snapshots
+
+    def prefetch(self, contract, calls: list) -> list:
+        """Reads many values of one contract in JSON-RPC batches, so they get cached in the snapshot.
+
+        Values read later by calling contract methods one by one will be answered from the cache.
+
+        Args:
+            contract: The contract to read the values from (a subclass of :py:class:`pymaker.Contract`).
+            calls: List of `(function_name, args)` tuples, as accepted by `Contract._call_many()`.
+
+        Returns:
+            List of return values, in the same order as `calls`.
+        """
+        assert(contract.web3 is self.web3)
+        assert(isinstance(calls, list))
+
+        return contract._call_many(calls)
+
+    def execute(self, calls: list, send) -> list:
+        """Executes JSON-RPC requests, answering the ones already made within this snapshot from the cache.
+
+        Only requests for the snapshot block are cached. Other requests are always passed to `send`.
+
+        Args:
+            calls: List of `(method, params)` tuples.
+            send: Function executing a list of `(method, params)` tuples and returning their results.
+
+        Returns:
+            List of results, in the same order as `calls`.
+        """
+        assert(isinstance(calls, list))
+        assert(callable(send))
+
+        keys = [self._key(method, params) for method, params in calls]
+        results = [None] * len(calls)
+        missing = []
+
+        with self._lock:
+            for index, key in enumerate(keys):
+                if key is not None and key in self._results:
+                    results[index] = self._results[key]
+                    self.hits += 1
+                else:
+                    missing.append(index)
+                    if key is not None:
+                        self.misses += 1
+
+        if len(missing) > 0:
+            missing_results = send([calls[index] for index in missing])
+            with self._lock:
+                for index, result in zip(missing, missing_results):
+                    results[index] = result
+                    if keys[index] is not None:
+                        self._results[keys[index]] = result
+
+        return results
+
+    def _key(self, method: str, params: list) -> Optional[tuple]:
+        if method not in self.CACHEABLE_METHODS or len(params) == 0 or not self._is_pinned(params[-1]):
+            return None
+
+        return method, json.dumps(params[:-1], sort_keys=True).lower()
+
+    def _is_pinned(self, block_identifier) -> bool:
+        if isinstance(block_identifier, int):
+            return block_identifier == self.block_number
+
+        if isinstance(block_identifier, str) and block_identifier.startswith('0x'):
+            return int(block_identifier, 16) == self.block_number
+
+        return False
+
+    @classmethod
+    def _middleware(cls, make_request, web3):
+        # installed once per `Web3` instance, pins reads made by `web3.py` using the default block (`latest`)
+        # to the snapshot active in the calling thread, and answers them from the snapshot cache
+        def middleware(method, params):
+            snapshot = cls.active(web3)
+            if snapshot is None or method not in cls.CACHEABLE_METHODS \
+                    or len(params) == 0 or params[-1] != 'latest':
+                return make_request(method, params)
+
+            def send(calls: list) -> list:
+                responses = [make_request(*call) for call in calls]
+                for response in responses:
+                    if 'error' in response:
+                        raise ValueError(response['error'])
+
+                return [response['result'] for response in responses]
+
+            pinned_params = list(params[:-1]) + [snapshot.block_number]
+            return {'result': snapshot.execute([(method, pinned_params)], send)[0]}
+
+        return middleware
+
+    def _activate(self):
+        with self._middleware_lock:
+            if 'snapshot' not in self.web3.manager.middleware_stack:
+                self.web3.manager.middleware_stack.add(self._middleware, 'snapshot')
+
+        snapshots = self._thread_snapshots()
+        if self.web3 in snapshots:
+            raise Exception("Another snapshot is already active for this Web3 instance")
+
+        snapshots[self.web3] = self
+        self.logger.debug(f"Snapshot of block #{self.block_number} activated")
+
+    def _deactivate(self):
+        del self._thread_snapshots()[self.web3]
+
+        self.logger.debug(f"Snapshot of block #{self.block_number} deactivated,"
+                          f" {self.hits} cache hit(s), {self.misses} cache miss(es)")
+
+    def __repr__(self):
+        return f"Snapshot({self.block_number})"
+
+
+@contextmanager
+def web3_snapshot(web3: Web3, block_number: Optional[int] = None):
+    """Pins all reads made through `web3` to one block, for the duration of the `with` block.
+
+    The typical usage pattern is as follows:
+
+        with web3_snapshot(web3) as snapshot:
+            snapshot.prefetch(tub, [('tag', []), ('chi', [])])
+            tag = tub.tag()
+            chi = tub.chi()
+            orders = otc.get_orders()
+
+    The snapshot only affects reads made by the calling thread, other threads using `web3` keep reading
+    the latest state. Only one snapshot can be active for a `Web3` instance in a thread at a time. Transactions
+    can still be sent from within a snapshot, but their effects will not be visible in values read within it.
+
+    Args:
+        web3: An instance of `Web` from `web3.py`.
+        block_number: Number of the block to pin all reads to. The latest block will be used if not specified.
+
+    Returns:
+        A :py:class:`pymaker.snapshot.Snapshot` instance, active until the `with` block exits.
+    """
+    assert(isinstance(web3, Web3))
+    assert(isinstance(block_number, int) or (block_number is None))
+
+    snapshot = Snapshot(web3, block_number if block_number is not None else web3.eth.blockNumber)
+    snapshot._activate()
+    try:
+        yield snapshot
+    finally:
+        snapshot._deactivate()
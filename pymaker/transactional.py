@@ -15,8 +15,6 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import operator
-from functools import reduce
 from typing import List
 
 from web3 import Web3
@@ -94,7 +92,7 @@ class TxManager(Contract):
             return list(map(lambda address: address.address, tokens))
 
         def script() -> bytes:
-            return reduce(operator.add, map(lambda invocation: script_entry(invocation), invocations), bytes())
+            return b''.join(map(lambda invocation: script_entry(invocation), invocations))
 
         def script_entry(invocation: Invocation) -> bytes:
             address = invocation.address.as_bytes()
@@ -18,15 +18,14 @@
 import asyncio
 import threading
 
-from eth_utils import coerce_return_to_text, encode_hex
-from ethereum import utils
-from ethereum.tester import k0
-from ethereum.utils import int_to_bytes
-from secp256k1 import PrivateKey
-from web3 import Web3
+import requests
+from eth_utils import coerce_return_to_text, encode_hex, keccak
+from web3 import Web3, HTTPProvider
 from web3.eth import Eth
+from web3.middleware import combine_middlewares
 
 from pymaker.numeric import Wad
+from pymaker.snapshot import Snapshot
 
 
 def chain(web3: Web3) -> str:
@@ -54,6 +53,80 @@ def synchronize(futures) -> list:
         return []
 
 
+def batch_requests(web3: Web3, calls: list) -> list:
+    """Executes multiple JSON-RPC requests at once.
+
+    If the node is connected to over HTTP, all requests get sent to it in one JSON-RPC batch,
+    which means only one round trip is made. For other providers (including `EthereumTesterProvider`
+    used in unit tests) they get executed sequentially, one by one.
+
+    Results get passed through the `web3.py` middleware stack, so they are formatted exactly
+    the same way as if each request has been made using `web3.manager.request_blocking()`.
+
+    Args:
+        web3: An instance of `Web3` from `web3.py`.
+        calls: List of `(method, params)` tuples, parameters need to be already in the
+            format expected by the node (i.e. numbers as hexadecimal strings).
+
+    Returns:
+        List of results, in the same order as `calls`.
+    """
+    assert(isinstance(web3, Web3))
+    assert(isinstance(calls, list))
+
+    if len(calls) == 0:
+        return []
+
+    provider = web3.providers[0]
+    if isinstance(provider, HTTPProvider):
+        send = lambda calls_to_send: _send_batch(web3, provider, calls_to_send)
+    else:
+        send = lambda calls_to_send: [web3.manager.request_blocking(method, params)
+                                      for method, params in calls_to_send]
+
+    snapshot = Snapshot.active(web3)
+    if snapshot is not None:
+        return snapshot.execute(calls, send)
+
+    return send(calls)
+
+
+def _send_batch(web3: Web3, provider: HTTPProvider, calls: list) -> list:
+    if len(calls) == 0:
+        return []
+
+    request_data = [{'jsonrpc': '2.0', 'method': method, 'params': params, 'id': request_id}
+                    for request_id, (method, params) in enumerate(calls)]
+
+    response = requests.post(provider.endpoint_uri, json=request_data, **provider.get_request_kwargs())
+    response.raise_for_status()
+
+    response_data = response.json()
+    if not isinstance(response_data, list):
+        raise ValueError(f"Invalid response to JSON-RPC batch request: {response_data}")
+
+    responses = {item['id']: item for item in response_data}
+
+    # we pass each raw response through the same middlewares `request_blocking()` would use,
+    # so the results are formatted the same way as if they have been retrieved individually
+    current_response = []
+    request_fn = combine_middlewares(tuple(web3.manager.middleware_stack) + tuple(provider.middlewares),
+                                     web3, lambda method, params: current_response[0])
+
+    def result(request_id: int, method: str, params: list):
+        if request_id not in responses:
+            raise ValueError(f"No response to JSON-RPC request '{method}' received in a batch")
+
+        current_response[:] = [responses[request_id]]
+        formatted_response = request_fn(method, params)
+        if 'error' in formatted_response:
+            raise ValueError(formatted_response['error'])
+
+        return formatted_response['result']
+
+    return [result(request_id, method, params) for request_id, (method, params) in enumerate(calls)]
+
+
 def eth_balance(web3: Web3, address) -> Wad:
     return Wad(web3.eth.getBalance(address.address))
 
@@ -65,24 +138,56 @@ def eth_sign(web3: Web3, data_hash: bytes):
 
     # as `EthereumTesterProvider` does not support `eth_sign`, we implement it ourselves
     if str(web3.providers[0]) == 'EthereumTesterProvider':
-        key = k0
-        msg = hexstring_to_bytes(Eth._recoveryMessageHash(data=data_hash))
+        # imported here as `ethereum.tester` is slow to import and only ever needed in tests
+        from ethereum.tester import k0
 
-        pk = PrivateKey(key, raw=True)
-        signature = pk.ecdsa_recoverable_serialize(
-            pk.ecdsa_sign_recoverable(msg, raw=True)
-        )
-
-        signature = signature[0] + utils.bytearray_to_bytestr([signature[1]])
-        signature_hex = signature.hex()[0:128] + int_to_bytes(ord(bytes.fromhex(signature.hex()[128:130]))+27).hex()
-
-        return '0x' + signature_hex
+        return eth_sign_with_key(data_hash, k0)
 
     return web3.manager.request_blocking(
         "eth_sign", [web3.eth.defaultAccount, encode_hex(data_hash)],
     )
 
 
+def eth_sign_with_key(data_hash: bytes, private_key: bytes) -> str:
+    """Signs data the same way `eth_sign` does, but locally with a private key, without any node involved.
+
+    Args:
+        data_hash: Data to sign, usually a 32-byte hash.
+        private_key: Raw 32-byte private key to sign with.
+
+    Returns:
+        The signature, as a hex string with `r`, `s` and `v` concatenated, `v` being either 27 or 28.
+    """
+    assert(isinstance(data_hash, bytes))
+    assert(isinstance(private_key, bytes))
+
+    from secp256k1 import PrivateKey
+
+    message_hash = keccak(b'\x19Ethereum Signed Message:\n' + str(len(data_hash)).encode() + data_hash)
+
+    key = PrivateKey(private_key, raw=True)
+    signature, recovery_id = key.ecdsa_recoverable_serialize(key.ecdsa_sign_recoverable(message_hash, raw=True))
+
+    return '0x' + signature.hex() + bytes([recovery_id + 27]).hex()
+
+
+def private_key_to_address(private_key: bytes) -> str:
+    """Returns the Ethereum address corresponding to a private key.
+
+    Args:
+        private_key: Raw 32-byte private key.
+
+    Returns:
+        Normalized hexadecimal representation of the address.
+    """
+    assert(isinstance(private_key, bytes))
+
+    from secp256k1 import PrivateKey
+
+    public_key = PrivateKey(private_key, raw=True).pubkey.serialize(compressed=False)
+    return bytes_to_hexstring(keccak(public_key[1:])[12:])
+
+
 def int_to_bytes32(value: int) -> bytes:
     assert(isinstance(value, int))
     return value.to_bytes(32, byteorder='big')
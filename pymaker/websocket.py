@@ -0,0 +1,310 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2017 reverendus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import base64
+import hashlib
+import json
+import os
+import socket
+import ssl
+import struct
+import time
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+def encode_frame(opcode: int, payload: bytes, mask: bool) -> bytes:
+    """Encodes a single, final WebSocket frame. Frames sent by clients have to be masked."""
+    assert(isinstance(opcode, int))
+    assert(isinstance(payload, bytes))
+    assert(isinstance(mask, bool))
+
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0x00
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, mask_bit | length)
+    elif length < 2**16:
+        header = struct.pack('!BBH', 0x80 | opcode, mask_bit | 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, mask_bit | 127, length)
+
+    if mask:
+        mask_key = os.urandom(4)
+        return header + mask_key + _apply_mask(payload, mask_key)
+    else:
+        return header + payload
+
+
+def decode_frame(buffer: bytes) -> Optional[Tuple[bool, int, bytes, int]]:
+    """Decodes a WebSocket frame from the beginning of `buffer`.
+
+    Returns:
+        A `(fin, opcode, payload, frame_length)` tuple, or `None` if `buffer` does not contain a complete frame yet.
+    """
+    assert(isinstance(buffer, bytes))
+
+    if len(buffer) < 2:
+        return None
+
+    fin, opcode = bool(buffer[0] & 0x80), buffer[0] & 0x0f
+    masked, length = bool(buffer[1] & 0x80), buffer[1] & 0x7f
+    offset = 2
+    if length == 126:
+        if len(buffer) < 4:
+            return None
+        length, offset = struct.unpack('!H', buffer[2:4])[0], 4
+    elif length == 127:
+        if len(buffer) < 10:
+            return None
+        length, offset = struct.unpack('!Q', buffer[2:10])[0], 10
+
+    mask_key = None
+    if masked:
+        mask_key, offset = buffer[offset:offset+4], offset + 4
+
+    if len(buffer) < offset + length:
+        return None
+
+    payload = buffer[offset:offset+length]
+    if mask_key is not None:
+        payload = _apply_mask(payload, mask_key)
+
+    return fin, opcode, payload, offset + length
+
+
+def _apply_mask(payload: bytes, mask_key: bytes) -> bytes:
+    mask = (mask_key * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(mask, 'big')).to_bytes(len(payload), 'big')
+
+
+class WebSocket:
+    """Minimal WebSocket client, implementing only what :py:class:`SocketIO` needs.
+
+    Only text messages can be sent and received. Pings from the server get answered automatically.
+    Instances of this class are not thread-safe.
+
+    Args:
+        url: URL to connect to, starting with either `ws://` or `wss://`.
+        timeout: Timeout for establishing the connection, in seconds.
+    """
+
+    def __init__(self, url: str, timeout: float):
+        assert(isinstance(url, str))
+        assert(isinstance(timeout, float) or isinstance(timeout, int))
+
+        parsed_url = urlparse(url)
+        assert(parsed_url.scheme in ['ws', 'wss'])
+
+        secure = parsed_url.scheme == 'wss'
+        path = (parsed_url.path or '/') + (f"?{parsed_url.query}" if parsed_url.query else '')
+
+        self._buffer = b''
+        self._fragments = []
+        self._socket = socket.create_connection((parsed_url.hostname, parsed_url.port or (443 if secure else 80)),
+                                                timeout=timeout)
+        try:
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if secure:
+                self._socket = ssl.create_default_context().wrap_socket(self._socket,
+                                                                        server_hostname=parsed_url.hostname)
+
+            self._handshake(parsed_url.netloc, path, timeout)
+        except:
+            self._socket.close()
+            raise
+
+    def _handshake(self, host: str, path: str, timeout: float):
+        key = base64.b64encode(os.urandom(16)).decode()
+        self._socket.sendall(f"GET {path} HTTP/1.1\r\n"
+                             f"Host: {host}\r\n"
+                             f"Upgrade: websocket\r\n"
+                             f"Connection: Upgrade\r\n"
+                             f"Sec-WebSocket-Key: {key}\r\n"
+                             f"Sec-WebSocket-Version: 13\r\n\r\n".encode())
+
+        deadline = time.time() + timeout
+        while b'\r\n\r\n' not in self._buffer:
+            if not self._fill(deadline - time.time()):
+                raise ConnectionError("WebSocket handshake timed out")
+
+        response, self._buffer = self._buffer.split(b'\r\n\r\n', 1)
+        status_line, *header_lines = response.decode('iso-8859-1').split('\r\n')
+        headers = {name.strip().lower(): value.strip() for name, value in
+                   (header_line.split(':', 1) for header_line in header_lines if ':' in header_line)}
+
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        if status_line.split(' ')[1:2] != ['101'] or headers.get('sec-websocket-accept') != accept:
+            raise ConnectionError(f"WebSocket handshake failed: {status_line}")
+
+    def _fill(self, timeout: float) -> bool:
+        if timeout <= 0:
+            return False
+
+        self._socket.settimeout(timeout)
+        try:
+            data = self._socket.recv(65536)
+        except socket.timeout:
+            return False
+
+        if len(data) == 0:
+            raise ConnectionError("Connection closed by the server")
+
+        self._buffer += data
+        return True
+
+    def send(self, message: str):
+        """Sends a text message."""
+        assert(isinstance(message, str))
+
+        self._socket.sendall(encode_frame(OPCODE_TEXT, message.encode(), mask=True))
+
+    def receive(self, timeout: float) -> Optional[str]:
+        """Receives a text message.
+
+        Args:
+            timeout: Maximum time to wait for a message, in seconds.
+
+        Returns:
+            The message received, or `None` if no message arrived within `timeout`.
+        """
+        deadline = time.time() + timeout
+        while True:
+            frame = decode_frame(self._buffer)
+            if frame is None:
+                if not self._fill(deadline - time.time()):
+                    return None
+                continue
+
+            fin, opcode, payload, frame_length = frame
+            self._buffer = self._buffer[frame_length:]
+
+            if opcode == OPCODE_PING:
+                self._socket.sendall(encode_frame(OPCODE_PONG, payload, mask=True))
+            elif opcode == OPCODE_CLOSE:
+                raise ConnectionError("Connection closed by the server")
+            elif opcode in [OPCODE_TEXT, OPCODE_CONTINUATION]:
+                self._fragments.append(payload)
+                if fin:
+                    message, self._fragments = b''.join(self._fragments).decode(), []
+                    return message
+
+    def close(self):
+        """Closes the connection, ignoring any errors."""
+        try:
+            self._socket.sendall(encode_frame(OPCODE_CLOSE, struct.pack('!H', 1000), mask=True))
+        except OSError:
+            pass
+        finally:
+            self._socket.close()
+
+
+class SocketIO:
+    """Minimal Socket.IO client, using the WebSocket transport only.
+
+    Implements version 4 of the Socket.IO protocol (Engine.IO version 3), as used by `socket.io` 2.x.
+    Only events in the default namespace, without acknowledgements, are supported. Engine.IO pings get sent
+    while waiting for events in :py:meth:`receive`, so it has to be called at least every `ping_interval`
+    seconds to keep the connection alive. Instances of this class are not thread-safe.
+
+    Args:
+        url: Base URL of the Socket.IO server, starting with `http://`, `https://`, `ws://` or `wss://`.
+        timeout: Timeout for establishing the connection, in seconds.
+
+    Attributes:
+        ping_interval: Interval between pings requested by the server, in seconds.
+    """
+
+    def __init__(self, url: str, timeout: float):
+        assert(isinstance(url, str))
+        assert(isinstance(timeout, float) or isinstance(timeout, int))
+
+        parsed_url = urlparse(url)
+        scheme = {'http': 'ws', 'https': 'wss'}.get(parsed_url.scheme, parsed_url.scheme)
+        self._websocket = WebSocket(f"{scheme}://{parsed_url.netloc}/socket.io/?EIO=3&transport=websocket", timeout)
+        try:
+            deadline = time.time() + timeout
+
+            # the server opens the Engine.IO session first...
+            packet = self._websocket.receive(deadline - time.time())
+            if packet is None or not packet.startswith('0'):
+                raise ConnectionError(f"Socket.IO handshake failed: {packet}")
+
+            self.ping_interval = json.loads(packet[1:])['pingInterval'] / 1000
+            self._next_ping = time.time() + self.ping_interval
+
+            # ...and then confirms the connection to the default namespace
+            while packet != '40':
+                packet = self._websocket.receive(deadline - time.time())
+                if packet is None:
+                    raise ConnectionError("Socket.IO handshake timed out")
+        except:
+            self._websocket.close()
+            raise
+
+    def emit(self, event: str, *args):
+        """Emits an event with JSON-serializable arguments."""
+        assert(isinstance(event, str))
+
+        self._websocket.send('42' + json.dumps([event] + list(args)))
+
+    def receive(self, timeout: float) -> Optional[Tuple[str, list]]:
+        """Waits for an event from the server, keeping the connection alive meanwhile.
+
+        Args:
+            timeout: Maximum time to wait for an event, in seconds.
+
+        Returns:
+            An `(event, args)` tuple, or `None` if no event arrived within `timeout`.
+        """
+        deadline = time.time() + timeout
+        while True:
+            now = time.time()
+            if now >= self._next_ping:
+                self._websocket.send('2')
+                self._next_ping = now + self.ping_interval
+
+            if now >= deadline:
+                return None
+
+            packet = self._websocket.receive(min(deadline, self._next_ping) - now)
+            if packet is None:
+                continue
+            elif packet.startswith('42'):
+                data = json.loads(packet[packet.index('['):])
+                return data[0], data[1:]
+            elif packet == '2':
+                self._websocket.send('3')
+            elif packet in ['1', '41']:
+                raise ConnectionError("Disconnected by the server")
+
+    def close(self):
+        """Closes the connection, ignoring any errors."""
+        try:
+            self._websocket.send('41')
+        except OSError:
+            pass
+        finally:
+            self._websocket.close()
@@ -15,23 +15,29 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import array
 import copy
 import logging
 import random
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pformat
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
+import eth_utils
 import requests
 from web3 import Web3
 
-from pymaker import Contract, Address, Transact
+from pymaker import Contract, Address, Transact, cached
 from pymaker.numeric import Wad
 from pymaker.token import ERC20Token
-from pymaker.util import bytes_to_hexstring, hexstring_to_bytes, eth_sign
+from pymaker.util import bytes_to_hexstring, hexstring_to_bytes, eth_sign, eth_sign_with_key, int_to_bytes32, \
+    private_key_to_address
 
 
 class Order:
+    __slots__ = ('_exchange', 'maker', 'taker', 'maker_fee', 'taker_fee', 'pay_token', 'pay_amount', 'buy_token',
+                 'buy_amount', 'salt', 'fee_recipient', 'expiration', 'exchange_contract_address',
+                 'ec_signature_r', 'ec_signature_s', 'ec_signature_v')
+
     def __init__(self, exchange, maker: Address, taker: Address, maker_fee: Wad, taker_fee: Wad, pay_token: Address,
                  pay_amount: Wad, buy_token: Address, buy_amount: Wad, salt: int, fee_recipient: Address,
                  expiration: int, exchange_contract_address: Address, ec_signature_r: Optional[str],
@@ -178,7 +184,7 @@ class Order:
                f" '{self.exchange_contract_address}', '{self.salt}')"
 
     def __repr__(self):
-        return pformat(vars(self))
+        return pformat({slot: getattr(self, slot) for slot in self.__slots__})
 
 
 class ZrxExchange(Contract):
@@ -187,9 +193,16 @@ class ZrxExchange(Contract):
     You can find the source code of the `0x` exchange contract here:
     <https://etherscan.io/address/0x12459c951127e0c374ff9105dda097662a027093#code.
 
+    Order hashes are calculated locally. Orders get signed either by the node, using `eth_sign`, or locally
+    if a private key has been passed to the constructor. In the latter case creating and signing orders
+    does not need any interaction with the node at all.
+
     Attributes:
         web3: An instance of `Web` from `web3.py`.
         address: Ethereum address of the _0x_ `Exchange` contract.
+        private_key: Optional raw private key to sign orders with locally. If present, orders get created
+            with the address corresponding to this key as the maker, and orders get cancelled from that
+            address as well, so it has to be an account the node can send transactions from.
     """
 
     abi = Contract._load_abi(__name__, 'abi/Exchange.abi')
@@ -215,14 +228,18 @@ class ZrxExchange(Contract):
                               token_transfer_proxy.address
                           ]))
 
-    def __init__(self, web3: Web3, address: Address):
+    def __init__(self, web3: Web3, address: Address, private_key: Optional[bytes] = None):
         assert(isinstance(web3, Web3))
         assert(isinstance(address, Address))
+        assert(isinstance(private_key, bytes) or private_key is None)
 
         self.web3 = web3
         self.address = address
+        self.private_key = private_key
+        self._signer = Address(private_key_to_address(private_key)) if private_key is not None else None
         self._contract = self._get_contract(web3, self.abi, address)
 
+    @cached
     def zrx_token(self) -> Address:
         """Get the address of the ZRX token contract associated with this `Exchange` contract.
 
@@ -231,6 +248,7 @@ class ZrxExchange(Contract):
         """
         return Address(self._contract.call().ZRX_TOKEN_CONTRACT())
 
+    @cached
     def token_transfer_proxy(self) -> Address:
         """Get the address of the `TokenTransferProxy` contract associated with this `Exchange` contract.
 
@@ -273,7 +291,7 @@ class ZrxExchange(Contract):
         assert(isinstance(expiration, int))
 
         return Order(exchange=self,
-                     maker=Address(self.web3.eth.defaultAccount),
+                     maker=self._signer or Address(self.web3.eth.defaultAccount),
                      taker=self._ZERO_ADDRESS,
                      maker_fee=Wad(0),
                      taker_fee=Wad(0),
@@ -295,19 +313,52 @@ class ZrxExchange(Contract):
         # the hash depends on the exchange contract address as well
         assert(order.exchange_contract_address == self.address)
 
-        result = self._contract.call().getOrderHash(self._order_addresses(order), self._order_values(order))
-        return bytes_to_hexstring(array.array('B', [ord(x) for x in result]).tobytes())
+        # same as `getOrderHash` of the exchange contract, i.e. keccak256 of tightly packed
+        # exchange address, order addresses and order values
+        packed = self.address.as_bytes() + \
+            b''.join(Address(address).as_bytes() for address in self._order_addresses(order)) + \
+            b''.join(int_to_bytes32(value) for value in self._order_values(order))
+
+        return bytes_to_hexstring(eth_utils.keccak(packed))
 
     def get_unavailable_buy_amount(self, order: Order) -> Wad:
         assert(isinstance(order, Order))
 
         return Wad(self._contract.call().getUnavailableTakerTokenAmount(hexstring_to_bytes(self.get_order_hash(order))))
 
+    def get_unavailable_buy_amounts(self, orders: List[Order],
+                                    batch_size: int = Contract.DEFAULT_BATCH_SIZE) -> List[Wad]:
+        """Get the filled and cancelled amounts of many orders at once.
+
+        Order hashes are calculated locally, and the amounts get retrieved in JSON-RPC batches
+        of `batch_size` orders each, so for up to `batch_size` orders this takes only one round
+        trip to the node. Results are exactly the same as :py:meth:`get_unavailable_buy_amount` returns.
+
+        Args:
+            orders: Orders to get the unavailable amounts of.
+            batch_size: Maximum number of orders to query in one JSON-RPC batch.
+
+        Returns:
+            List of unavailable (filled or cancelled) amounts, denominated in the `buy_token` of each order,
+            in the same order as `orders`.
+        """
+        assert(isinstance(orders, list))
+        assert(all(isinstance(order, Order) for order in orders))
+
+        calls = [('getUnavailableTakerTokenAmount', [hexstring_to_bytes(self.get_order_hash(order))])
+                 for order in orders]
+
+        return [Wad(amount) for amount in self._call_many(calls, batch_size)]
+
     def sign_order(self, order: Order) -> Order:
         assert(isinstance(order, Order))
 
-        # TODO duplicate code below
-        signed_hash = eth_sign(self.web3, hexstring_to_bytes(self.get_order_hash(order)))[2:]
+        order_hash = hexstring_to_bytes(self.get_order_hash(order))
+        if self.private_key is not None:
+            signed_hash = eth_sign_with_key(order_hash, self.private_key)[2:]
+        else:
+            signed_hash = eth_sign(self.web3, order_hash)[2:]
+
         r = bytes.fromhex(signed_hash[0:64])
         s = bytes.fromhex(signed_hash[64:128])
         v = ord(bytes.fromhex(signed_hash[128:130]))
@@ -321,8 +372,10 @@ class ZrxExchange(Contract):
     def cancel_order(self, order: Order) -> Transact:
         assert(isinstance(order, Order))
 
+        # only the maker can cancel an order, which is not necessarily the default account if we sign locally
+        extra = {'from': self._signer.address} if self._signer is not None else None
         return Transact(self, self.web3, self.abi, self.address, self._contract, 'cancelOrder',
-                        [self._order_addresses(order), self._order_values(order), order.buy_amount.value])
+                        [self._order_addresses(order), self._order_values(order), order.buy_amount.value], extra)
 
     @staticmethod
     def _order_values(order):
@@ -354,34 +407,106 @@ class ZrxRelayerApi:
 
     <https://github.com/0xProject/standard-relayer-api>
 
+    All requests go through one `requests` session, so connections to the relayer get pooled and kept
+    alive between requests. Many orders can be submitted concurrently using :py:meth:`submit_orders`.
+
     Attributes:
         exchange: The 0x Exchange contract.
         api_server: Base URL of the Standard Relayer API server.
+        timeout: Timeout of each request to the relayer, in seconds.
+        max_workers: Maximum number of concurrent requests made by :py:meth:`submit_orders`,
+            which is also the maximum number of pooled connections.
     """
     logger = logging.getLogger('0x-relayer-api')
 
-    def __init__(self, exchange: ZrxExchange, api_server: str):
+    def __init__(self, exchange: ZrxExchange, api_server: str, timeout: float = 9.5, max_workers: int = 8):
         assert(isinstance(exchange, ZrxExchange))
         assert(isinstance(api_server, str))
+        assert(isinstance(timeout, float) or isinstance(timeout, int))
+        assert(isinstance(max_workers, int))
+        assert(max_workers > 0)
 
         self.exchange = exchange
         self.api_server = api_server
+        self.timeout = timeout
+        self.max_workers = max_workers
 
-    def get_orders_by_maker(self, maker: Address) -> List[Order]:
-        assert(isinstance(maker, Address))
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_orders_by_maker(self, maker: Address, per_page: int = 100) -> List[Order]:
+        """Get all orders of a maker.
+
+        Args:
+            maker: Address of the maker to get the orders of.
+            per_page: Number of orders to fetch from the relayer in one request.
+
+        Returns:
+            List of orders placed by `maker`.
+        """
+        return list(self.iter_orders_by_maker(maker, per_page))
+
+    def iter_orders_by_maker(self, maker: Address, per_page: int = 100, prefetch: bool = True) -> Iterator[Order]:
+        """Iterate over orders of a maker, fetching them from the relayer page by page.
+
+        Pages are fetched lazily, so at most two pages of orders are held in memory at any time and
+        orders from the first page can be processed before the remaining ones have been downloaded.
+        With `prefetch` enabled, the next page gets fetched in the background while orders from
+        the current page are being processed.
+
+        As relayers may return fewer orders per page than requested, iteration only ends once an empty
+        page has been received. A relayer ignoring the `page` parameter altogether would therefore make
+        the iterator return the same orders over and over again, forever.
 
-        url = f"{self.api_server}/v0/orders?" \
-              f"exchangeContractAddress={self.exchange.address.address}&" \
-              f"maker={maker.address}&" \
-              f"per_page=10000"
+        Args:
+            maker: Address of the maker to get the orders of.
+            per_page: Number of orders to fetch from the relayer in one request.
+            prefetch: Whether to fetch the next page while the current one is being processed.
 
-        response = requests.get(url).json()
-        return list(map(lambda item: Order.from_json(self.exchange, item), response))
+        Returns:
+            Iterator over orders placed by `maker`.
+        """
+        assert(isinstance(maker, Address))
+        assert(isinstance(per_page, int))
+        assert(per_page > 0)
+        assert(isinstance(prefetch, bool))
+
+        def fetch(page: int) -> list:
+            url = f"{self.api_server}/v0/orders?" \
+                  f"exchangeContractAddress={self.exchange.address.address}&" \
+                  f"maker={maker.address}&" \
+                  f"page={page}&" \
+                  f"per_page={per_page}"
+
+            response = self.session.get(url, timeout=self.timeout)
+            if response.status_code == 200:
+                return response.json()
+            else:
+                raise Exception(f"Failed to fetch orders: {response.text} ({response.status_code})")
+
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            page, items = 1, fetch(1)
+            while len(items) > 0:
+                if executor is not None:
+                    next_items = executor.submit(fetch, page + 1)
+
+                for item in items:
+                    yield Order.from_json(self.exchange, item)
+
+                page += 1
+                items = next_items.result() if executor is not None else fetch(page)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
 
     def calculate_fees(self, order: Order) -> Order:
         assert(isinstance(order, Order))
 
-        response = requests.post(f"{self.api_server}/v0/fees", json=order.to_json_without_fees())
+        response = self.session.post(f"{self.api_server}/v0/fees", json=order.to_json_without_fees(),
+                                     timeout=self.timeout)
         if response.status_code == 200:
             data = response.json()
 
@@ -396,7 +521,12 @@ class ZrxRelayerApi:
     def submit_order(self, order: Order) -> bool:
         assert(isinstance(order, Order))
 
-        response = requests.post(f"{self.api_server}/v0/order", json=order.to_json())
+        try:
+            response = self.session.post(f"{self.api_server}/v0/order", json=order.to_json(), timeout=self.timeout)
+        except requests.RequestException as e:
+            self.logger.warning(f"Failed to place 0x order: {e}")
+            return False
+
         if response.status_code == 201:
             self.logger.info(f"Placed 0x order: {order}")
             return True
@@ -404,5 +534,26 @@ class ZrxRelayerApi:
             self.logger.warning(f"Failed to place 0x order: {response.text} ({response.status_code})")
             return False
 
+    def submit_orders(self, orders: List[Order]) -> List[bool]:
+        """Submits many orders to the relayer concurrently.
+
+        At most `max_workers` orders are being submitted at the same time, each of them
+        the same way :py:meth:`submit_order` does it.
+
+        Args:
+            orders: Orders to submit.
+
+        Returns:
+            List of flags indicating whether each order has been placed successfully,
+            in the same order as `orders`.
+        """
+        assert(isinstance(orders, list))
+
+        if len(orders) == 0:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(orders))) as executor:
+            return list(executor.map(self.submit_order, orders))
+
     def __repr__(self):
         return f"ZrxRelayerApi()"
@@ -15,7 +15,19 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import base64
+import hashlib
+import json
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
 from unittest.mock import Mock
+from urllib.parse import parse_qs, urlparse
+
+from pymaker.websocket import OPCODE_CLOSE, OPCODE_TEXT, WEBSOCKET_GUID, decode_frame, encode_frame
 
 
 def is_hashable(v):
@@ -31,3 +43,216 @@ def wait_until_mock_called(mock: Mock):
     while not mock.called:
         pass
     return mock.call_args[0]
+
+
+class StubRelayer:
+    """Minimal Standard 0x Relayer API server, running in a background thread.
+
+    Accepts all submitted orders except those with a salt listed in `rejected_salts`, returns
+    the same fees for every order and returns accepted orders, page by page, when queried for orders.
+    Each request gets delayed by `delay` seconds, to simulate a remote relayer. Like real relayers, it never
+    returns more than `max_per_page` orders in one page, regardless of the page size requested.
+    """
+    def __init__(self, delay: float = 0.0, rejected_salts: tuple = (), max_per_page: int = 100):
+        self.delay = delay
+        self.rejected_salts = set(rejected_salts)
+        self.max_per_page = max_per_page
+        self.orders = []
+        self.pages = []
+        self.client_ports = set()
+        self.lock = threading.Lock()
+
+        relayer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                relayer.track(self)
+                query = parse_qs(urlparse(self.path).query)
+                page = int(query.get('page', ['1'])[0])
+                per_page = min(int(query.get('per_page', ['100'])[0]), relayer.max_per_page)
+                with relayer.lock:
+                    relayer.pages.append(page)
+                    orders = [order for order in relayer.orders
+                              if 'maker' not in query or order['maker'] == query['maker'][0]]
+                self.reply(200, orders[(page - 1) * per_page:page * per_page])
+
+            def do_POST(self):
+                relayer.track(self)
+                data = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                if self.path == '/v0/fees':
+                    self.reply(200, {'makerFee': '1', 'takerFee': '2',
+                                     'feeRecipient': '0x6666666666666666666666666666666666666666'})
+                elif int(data['salt']) in relayer.rejected_salts:
+                    self.reply(400, {'reason': 'rejected'})
+                else:
+                    with relayer.lock:
+                        relayer.orders.append(data)
+                    self.reply(201, {})
+
+            def reply(self, status: int, data):
+                body = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except ConnectionError:
+                    # the client has given up waiting already
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def track(self, handler: BaseHTTPRequestHandler):
+        with self.lock:
+            self.client_ports.add(handler.client_address[1])
+
+        if self.delay > 0:
+            time.sleep(self.delay)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeEtherDeltaServer:
+    """Minimal Socket.IO server pretending to be the EtherDelta API backend, running in background threads.
+
+    Accepts all orders except the ones with a nonce listed in `rejections`, which get rejected the given
+    number of times first, and never responds to orders with a nonce listed in `ignored_nonces`. Like the
+    real backend, it also sends other events to connected clients. The first `malformed_connections`
+    connections get a malformed Engine.IO handshake.
+    """
+    def __init__(self, rejections: dict = None, ignored_nonces: tuple = (), ping_interval: int = 25000,
+                 malformed_connections: int = 0):
+        self.rejections = dict(rejections or {})
+        self.ignored_nonces = set(ignored_nonces)
+        self.ping_interval = ping_interval
+        self.malformed_connections = malformed_connections
+        self.messages = []
+        self.connections = 0
+        self.pings = 0
+        self.lock = threading.Lock()
+        self.client_sockets = []
+
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.bind(('127.0.0.1', 0))
+        self.server_socket.listen(5)
+        self.url = f"http://127.0.0.1:{self.server_socket.getsockname()[1]}"
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while True:
+            try:
+                client_socket, _ = self.server_socket.accept()
+            except OSError:
+                return
+
+            client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.lock:
+                self.connections += 1
+                self.client_sockets.append(client_socket)
+                malformed = self.connections <= self.malformed_connections
+
+            threading.Thread(target=self.serve, args=(client_socket, malformed), daemon=True).start()
+
+    def serve(self, client_socket: socket.socket, malformed: bool):
+        try:
+            buffer = b''
+            while b'\r\n\r\n' not in buffer:
+                buffer += self.receive(client_socket)
+
+            request, buffer = buffer.split(b'\r\n\r\n', 1)
+            key = re.search(rb'Sec-WebSocket-Key: *(\S+)', request, re.IGNORECASE).group(1)
+            accept = base64.b64encode(hashlib.sha1(key + WEBSOCKET_GUID.encode()).digest())
+            client_socket.sendall(b'HTTP/1.1 101 Switching Protocols\r\n'
+                                  b'Upgrade: websocket\r\n'
+                                  b'Connection: Upgrade\r\n'
+                                  b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+
+            if malformed:
+                self.send(client_socket, '0{"sid": "fake", "upgr')
+                return
+
+            self.send(client_socket, '0' + json.dumps({'sid': 'fake', 'upgrades': [],
+                                                       'pingInterval': self.ping_interval, 'pingTimeout': 60000}))
+            self.send(client_socket, '40')
+
+            while True:
+                frame = decode_frame(buffer)
+                if frame is None:
+                    buffer += self.receive(client_socket)
+                    continue
+
+                fin, opcode, payload, frame_length = frame
+                buffer = buffer[frame_length:]
+                if opcode == OPCODE_CLOSE:
+                    break
+
+                self.handle(client_socket, payload.decode())
+        except OSError:
+            pass
+        finally:
+            client_socket.close()
+
+    def handle(self, client_socket: socket.socket, packet: str):
+        if packet == '2':
+            with self.lock:
+                self.pings += 1
+            self.send(client_socket, '3')
+
+        elif packet.startswith('42'):
+            event, order = json.loads(packet[2:])
+            if event == 'message':
+                with self.lock:
+                    self.messages.append(order)
+                    rejected = self.rejections.get(order['nonce'], 0) > 0
+                    if rejected:
+                        self.rejections[order['nonce']] -= 1
+
+                if order['nonce'] not in self.ignored_nonces:
+                    self.send(client_socket, '42' + json.dumps(['orders', {'buys': [], 'sells': []}]))
+                    self.send(client_socket, '42' + json.dumps(['messageResult', ['Invalid order.' if rejected
+                                                                                  else 'Added/updated order.', order]]))
+
+    @staticmethod
+    def receive(client_socket: socket.socket) -> bytes:
+        data = client_socket.recv(65536)
+        if len(data) == 0:
+            raise ConnectionError("Connection closed by the client")
+
+        return data
+
+    @staticmethod
+    def send(client_socket: socket.socket, packet: str):
+        client_socket.sendall(encode_frame(OPCODE_TEXT, packet.encode(), mask=False))
+
+    def drop_connections(self):
+        with self.lock:
+            client_sockets, self.client_sockets = self.client_sockets, []
+
+        for client_socket in client_sockets:
+            try:
+                client_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            client_socket.close()
+
+    def stop(self):
+        try:
+            self.server_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.server_socket.close()
+        self.drop_connections()
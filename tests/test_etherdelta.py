@@ -15,16 +15,19 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import threading
+import time
+
 import pytest
 from mock import Mock
 from web3 import Web3, EthereumTesterProvider
 
 from pymaker import Address
 from pymaker.approval import directly
-from pymaker.etherdelta import EtherDelta, EtherDeltaApi
+from pymaker.etherdelta import EtherDelta, EtherDeltaApi, Order
 from pymaker.numeric import Wad
 from pymaker.token import DSToken
-from tests.helpers import is_hashable, wait_until_mock_called
+from tests.helpers import is_hashable, wait_until_mock_called, FakeEtherDeltaServer
 
 PAST_BLOCKS = 100
 
@@ -229,12 +232,121 @@ class TestEtherDelta:
 
 class TestEtherDeltaApi:
     def setup_method(self):
-        self.etherdelta_api = EtherDeltaApi(client_tool_directory='some-dir',
-                                            client_tool_command='some command',
-                                            api_server='https://127.0.0.1:66666',
-                                            number_of_attempts=1,
-                                            retry_interval=15,
-                                            timeout=90)
+        self.server = FakeEtherDeltaServer(rejections={2: 1, 3: 5}, ignored_nonces=[4], ping_interval=100)
+        self.etherdelta_api = EtherDeltaApi(api_server=self.server.url,
+                                            number_of_attempts=3,
+                                            retry_interval=0,
+                                            timeout=1)
+
+    def teardown_method(self):
+        self.etherdelta_api.close()
+        self.server.stop()
+
+    @staticmethod
+    def order(nonce: int) -> Order:
+        return Order(ether_delta=Mock(address=Address('0x1111100000111110000011111000001111100000')),
+                     maker=Address('0x2222200000222220000022222000002222200000'),
+                     pay_token=Address('0x3333300000333330000033333000003333300000'),
+                     pay_amount=Wad.from_number(10),
+                     buy_token=Address('0x4444400000444440000044444000004444400000'),
+                     buy_amount=Wad.from_number(2),
+                     expires=100,
+                     nonce=nonce,
+                     v=27,
+                     r=bytes.fromhex('11' * 32),
+                     s=bytes.fromhex('22' * 32))
+
+    def test_publish_order(self):
+        # when
+        future = self.etherdelta_api.publish_order(self.order(1))
+
+        # then
+        assert future.result(timeout=5) is True
+        assert self.server.messages == [self.order(1).to_json()]
+
+    def test_should_publish_all_orders_over_one_connection(self):
+        # when
+        futures = [self.etherdelta_api.publish_order(self.order(nonce)) for nonce in range(10, 30)]
+
+        # then
+        assert [future.result(timeout=5) for future in futures] == [True] * 20
+        assert [message['nonce'] for message in self.server.messages] == list(range(10, 30))
+        assert self.server.connections == 1
+
+    def test_should_retry_rejected_orders(self):
+        # expect
+        assert self.etherdelta_api.publish_order(self.order(2)).result(timeout=5) is True
+        assert len(self.server.messages) == 2
+
+    def test_should_give_up_after_all_attempts_failed(self):
+        # expect
+        assert self.etherdelta_api.publish_order(self.order(3)).result(timeout=5) is False
+        assert len(self.server.messages) == 3
+
+    def test_should_reconnect_after_timeout(self):
+        # expect
+        assert self.etherdelta_api.publish_order(self.order(4)).result(timeout=10) is False
+        assert self.etherdelta_api.publish_order(self.order(1)).result(timeout=5) is True
+        assert self.server.connections == 4
+
+    def test_should_reconnect_when_connection_lost(self):
+        # given
+        assert self.etherdelta_api.publish_order(self.order(1)).result(timeout=5) is True
+
+        # when
+        self.server.drop_connections()
+
+        # then
+        assert self.etherdelta_api.publish_order(self.order(5)).result(timeout=5) is True
+        assert self.server.connections == 2
+
+    def test_should_survive_malformed_packets(self):
+        # given
+        server = FakeEtherDeltaServer(malformed_connections=1)
+        etherdelta_api = EtherDeltaApi(api_server=server.url, number_of_attempts=1, retry_interval=0, timeout=1)
+
+        try:
+            # expect
+            assert etherdelta_api.publish_order(self.order(1)).result(timeout=5) is False
+            assert etherdelta_api.publish_order(self.order(1)).result(timeout=5) is True
+            assert server.connections == 2
+        finally:
+            etherdelta_api.close()
+            server.stop()
+
+    def test_should_restart_dead_thread(self):
+        # given
+        dead_thread = threading.Thread(target=lambda: None)
+        dead_thread.start()
+        dead_thread.join()
+        self.etherdelta_api._thread = dead_thread
+
+        # expect
+        assert self.etherdelta_api.publish_order(self.order(1)).result(timeout=5) is True
+
+    def test_should_keep_connection_alive(self):
+        # given
+        assert self.etherdelta_api.publish_order(self.order(1)).result(timeout=5) is True
+
+        # when
+        time.sleep(0.5)
+
+        # then
+        assert self.server.pings >= 2
+        assert self.server.connections == 1
+
+    def test_should_accept_deprecated_client_tool_arguments(self):
+        # expect
+        with pytest.warns(DeprecationWarning):
+            etherdelta_api = EtherDeltaApi(client_tool_directory='lib/etherdelta-client',
+                                           client_tool_command='node main.js',
+                                           api_server=self.server.url,
+                                           number_of_attempts=1,
+                                           retry_interval=0,
+                                           timeout=1)
+
+        # and
+        assert etherdelta_api.api_server == self.server.url
 
     def test_should_have_printable_representation(self):
         assert repr(self.etherdelta_api) == f"EtherDeltaApi()"
@@ -0,0 +1,454 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2017 reverendus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+from unittest.mock import Mock, patch
+
+from web3 import EthereumTesterProvider, HTTPProvider, Web3
+
+import pymaker
+from pymaker import Address
+from pymaker.events import EventEngine, LogCache, get_logs
+from pymaker.numeric import Wad
+from pymaker.token import DSToken
+from tests.helpers import wait_until_mock_called
+
+TRANSFER_TOPIC = '0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef'
+
+
+class FakeNode:
+    """Answers JSON-RPC requests the way a real node does, i.e. with numbers as hexadecimal strings.
+
+    Unlike `EthereumTesterProvider`, supports `eth_getLogs` and JSON-RPC batches, and can be made
+    to replace its most recent blocks with new ones, simulating a chain reorganization.
+    """
+    def __init__(self):
+        self.blocks = []
+        self.hash_counter = 0
+        self.mine()
+
+    def mine(self, *addresses):
+        block_number = len(self.blocks)
+        self.hash_counter += 1
+        block_hash = '0x%064x' % self.hash_counter
+        logs = [{'address': address.address, 'topics': [TRANSFER_TOPIC], 'data': '0x',
+                 'blockNumber': hex(block_number), 'blockHash': block_hash,
+                 'transactionHash': '0x%064x' % (self.hash_counter * 1000 + log_index),
+                 'transactionIndex': hex(log_index), 'logIndex': hex(log_index)}
+                for log_index, address in enumerate(addresses)]
+        self.blocks.append({'number': hex(block_number), 'hash': block_hash, 'logs': logs})
+
+    def reorganize(self, depth: int):
+        del self.blocks[-depth:]
+
+    def install(self, web3: Web3):
+        # single requests go through the provider, batches get posted by `batch_requests()` directly
+        web3.providers[0].make_request = Mock(side_effect=self.make_request)
+        return patch('pymaker.util.requests.post', side_effect=self.post)
+
+    def result(self, method: str, params: list):
+        if method == 'eth_blockNumber':
+            return hex(len(self.blocks) - 1)
+        elif method == 'eth_getBlockByNumber':
+            block_number = params[0] if isinstance(params[0], int) else int(params[0], 16)
+            if block_number >= len(self.blocks):
+                return None
+            return {'number': self.blocks[block_number]['number'], 'hash': self.blocks[block_number]['hash']}
+        elif method == 'eth_getLogs':
+            from_block = int(params[0]['fromBlock'], 16)
+            to_block = int(params[0]['toBlock'], 16)
+            return [log for block in self.blocks[from_block:to_block + 1] for log in block['logs']
+                    if log['address'].lower() in params[0]['address'] and log['topics'][0] in params[0]['topics'][0]]
+        else:
+            raise Exception(f"Unsupported method {method}")
+
+    def make_request(self, method: str, params: list):
+        return {'jsonrpc': '2.0', 'id': 0, 'result': self.result(method, params)}
+
+    def post(self, url, json, **kwargs):
+        response = Mock()
+        response.json = Mock(return_value=[{'jsonrpc': '2.0', 'id': item['id'],
+                                            'result': self.result(item['method'], item['params'])}
+                                           for item in json])
+        return response
+
+
+class TestEventEngine:
+    def setup_method(self):
+        self.web3 = Web3(EthereumTesterProvider())
+        self.web3.eth.defaultAccount = self.web3.eth.accounts[0]
+        self.our_address = Address(self.web3.eth.defaultAccount)
+        self.token1 = DSToken.deploy(self.web3, 'AAA')
+        self.token2 = DSToken.deploy(self.web3, 'BBB')
+        self.token1.mint(Wad(1000000)).transact()
+        self.token2.mint(Wad(1000000)).transact()
+
+    def test_should_be_shared_per_web3(self):
+        # expect
+        assert EventEngine.for_web3(self.web3) is EventEngine.for_web3(self.web3)
+
+    def test_should_dispatch_logs_to_subscribed_handlers_only(self):
+        # given
+        event_engine = EventEngine(self.web3)
+        handler1 = Mock()
+        handler2 = Mock()
+        event_engine.subscribe(self.token1.address, TRANSFER_TOPIC, handler1)
+        event_engine.subscribe(self.token2.address, TRANSFER_TOPIC, handler2)
+
+        # when
+        self.token1.transfer(Address(self.web3.eth.accounts[1]), Wad(500)).transact()
+
+        # then
+        log = wait_until_mock_called(handler1)[0]
+        assert Address(log['address']) == self.token1.address
+        assert not handler2.called
+
+        # cleanup
+        event_engine.stop_watching()
+
+    def test_should_not_dispatch_logs_from_before_subscription(self):
+        # given
+        event_engine = EventEngine(self.web3)
+        event_engine.on_block(Mock())
+        self.token1.transfer(Address(self.web3.eth.accounts[1]), Wad(500)).transact()
+
+        # when
+        handler = Mock()
+        event_engine.subscribe(self.token1.address, TRANSFER_TOPIC, handler)
+        event_engine.stop_watching()
+        event_engine.poll()
+
+        # then
+        assert not handler.called
+
+    def test_should_notify_about_new_blocks(self):
+        # given
+        event_engine = EventEngine(self.web3)
+        handler = Mock()
+        event_engine.on_block(handler)
+
+        # when
+        self.token1.transfer(Address(self.web3.eth.accounts[1]), Wad(500)).transact()
+
+        # then
+        assert wait_until_mock_called(handler)[0] == self.web3.eth.blockNumber
+
+        # cleanup
+        event_engine.stop_watching()
+
+    def test_should_register_only_once_when_restarted(self):
+        # given
+        event_engine = EventEngine(self.web3)
+        filter_threads = pymaker.filter_threads.count(event_engine)
+
+        # when
+        event_engine.on_block(Mock())
+        event_engine.stop_watching()
+        event_engine.on_block(Mock())
+
+        # then
+        assert pymaker.filter_threads.count(event_engine) == filter_threads + 1
+
+        # cleanup
+        event_engine.stop_watching()
+
+    def test_should_not_be_alive_if_polling_keeps_failing(self):
+        # given
+        event_engine = EventEngine(self.web3, poll_interval=0.1, alive_timeout=0.5)
+        event_engine.on_block(Mock())
+        assert event_engine.alive
+
+        # when
+        with patch.object(event_engine, 'poll', side_effect=Exception("Node unreachable")):
+            time.sleep(1)
+
+            # then
+            assert event_engine._thread.is_alive()
+            assert not event_engine.alive
+
+        # cleanup
+        event_engine.stop_watching()
+
+    def test_should_catch_up_after_failure(self):
+        # given
+        event_engine = EventEngine(self.web3)
+        handler = Mock()
+        event_engine.subscribe(self.token1.address, TRANSFER_TOPIC, handler)
+        event_engine.stop_watching()
+
+        # and
+        self.token1.transfer(Address(self.web3.eth.accounts[1]), Wad(500)).transact()
+        self.token1.transfer(Address(self.web3.eth.accounts[1]), Wad(600)).transact()
+
+        # when
+        get_logs = event_engine._get_logs
+        event_engine._get_logs = Mock(side_effect=Exception("Connection refused"))
+        try:
+            event_engine.poll()
+        except Exception:
+            pass
+
+        # and
+        event_engine._get_logs = get_logs
+        event_engine.poll()
+
+        # then
+        assert handler.call_count == 2
+
+    def test_should_only_dispatch_confirmed_logs(self):
+        # given
+        event_engine = EventEngine(self.web3)
+        handler = Mock()
+        event_engine.subscribe(self.token1.address, TRANSFER_TOPIC, handler, confirmations=2)
+        event_engine.stop_watching()
+
+        # when
+        self.token1.transfer(Address(self.web3.eth.accounts[1]), Wad(500)).transact()
+        self.web3.providers[0].rpc_methods.evm_mine()
+        event_engine.poll()
+
+        # then
+        assert not handler.called
+
+        # when
+        self.web3.providers[0].rpc_methods.evm_mine()
+        event_engine.poll()
+
+        # then
+        assert handler.call_count == 1
+
+    def test_should_roll_back_orphaned_blocks(self):
+        # given
+        event_engine = EventEngine(self.web3)
+        handler = Mock()
+        removed_handler = Mock()
+        event_engine.subscribe(self.token1.address, TRANSFER_TOPIC, handler, removed_handler=removed_handler)
+        event_engine.stop_watching()
+
+        # and
+        self.web3.providers[0].rpc_methods.evm_snapshot()
+        self.token1.transfer(Address(self.web3.eth.accounts[1]), Wad(500)).transact()
+        event_engine.poll()
+        assert handler.call_count == 1
+
+        # when
+        self.web3.providers[0].rpc_methods.evm_revert()
+        self.token1.transfer(Address(self.web3.eth.accounts[1]), Wad(600)).transact()
+        self.token1.transfer(Address(self.web3.eth.accounts[1]), Wad(700)).transact()
+        event_engine.poll()
+
+        # then
+        assert removed_handler.call_count == 1
+        assert removed_handler.call_args[0][0]['removed'] is True
+        assert removed_handler.call_args[0][0]['transactionHash'] == handler.call_args_list[0][0][0]['transactionHash']
+
+        # and
+        assert handler.call_count == 3
+
+    def test_should_dispatch_logs_retrieved_with_eth_get_logs(self):
+        # given
+        web3 = Web3(HTTPProvider("http://localhost:8545"))
+        node = FakeNode()
+        event_engine = EventEngine(web3)
+        handler = Mock()
+        block_handler = Mock()
+
+        with node.install(web3):
+            event_engine.subscribe(self.token1.address, TRANSFER_TOPIC, handler)
+            event_engine.on_block(block_handler)
+            event_engine.stop_watching()
+
+            # when
+            node.mine(self.token1.address, self.token2.address)
+            node.mine()
+            node.mine(self.token1.address)
+            event_engine.poll()
+
+        # then
+        assert [(call[0][0]['blockNumber'], call[0][0]['logIndex']) for call in handler.call_args_list] == \
+               [(1, 0), (3, 0)]
+        block_handler.assert_called_once_with(3)
+
+    def test_should_roll_back_orphaned_blocks_retrieved_with_eth_get_logs(self):
+        # given
+        web3 = Web3(HTTPProvider("http://localhost:8545"))
+        node = FakeNode()
+        event_engine = EventEngine(web3)
+        handler = Mock()
+        removed_handler = Mock()
+        confirmed_handler = Mock()
+
+        with node.install(web3):
+            event_engine.subscribe(self.token1.address, TRANSFER_TOPIC, handler, removed_handler=removed_handler)
+            event_engine.subscribe(self.token1.address, TRANSFER_TOPIC, confirmed_handler, confirmations=2)
+            event_engine.stop_watching()
+
+            # and
+            node.mine(self.token1.address)
+            node.mine(self.token1.address)
+            event_engine.poll()
+            orphaned_log = handler.call_args_list[1][0][0]
+
+            # when
+            node.reorganize(1)
+            node.mine()
+            node.mine(self.token1.address)
+            event_engine.poll()
+
+        # then
+        removed_handler.assert_called_once_with(dict(orphaned_log, removed=True))
+        assert [call[0][0]['blockNumber'] for call in handler.call_args_list] == [1, 2, 3]
+        assert [call[0][0]['blockNumber'] for call in confirmed_handler.call_args_list] == [1]
+        assert handler.call_args_list[2][0][0]['blockHash'] == node.blocks[3]['hash']
+
+    def test_should_survive_failing_handler(self):
+        # given
+        event_engine = EventEngine(self.web3)
+        handler = Mock()
+        event_engine.subscribe(self.token1.address, TRANSFER_TOPIC, Mock(side_effect=Exception("Failed")))
+        event_engine.subscribe(self.token1.address, TRANSFER_TOPIC, handler)
+        event_engine.stop_watching()
+
+        # when
+        self.token1.transfer(Address(self.web3.eth.accounts[1]), Wad(500)).transact()
+        event_engine.poll()
+
+        # then
+        assert handler.call_count == 1
+
+
+class TestGetLogs:
+    def setup_method(self):
+        self.web3 = Web3(EthereumTesterProvider())
+        self.web3.eth.defaultAccount = self.web3.eth.accounts[0]
+        self.token = DSToken.deploy(self.web3, 'AAA')
+        self.token.mint(Wad(1000000)).transact()
+        for amount in range(1, 6):
+            self.token.transfer(Address(self.web3.eth.accounts[1]), Wad(amount)).transact()
+
+    def test_should_retrieve_the_same_logs_regardless_of_chunk_size(self):
+        # given
+        block_number = self.web3.eth.blockNumber
+
+        # when
+        logs = get_logs(self.web3, self.token.address, TRANSFER_TOPIC, 0, block_number, chunk_size=block_number + 1)
+        chunked_logs = get_logs(self.web3, self.token.address, TRANSFER_TOPIC, 0, block_number, chunk_size=2)
+
+        # then
+        assert len(logs) == 5
+        assert chunked_logs == logs
+
+    def test_should_only_retrieve_logs_of_the_given_event(self):
+        # expect
+        assert get_logs(self.web3, self.token.address, '0x' + '00' * 32, 0, self.web3.eth.blockNumber) == []
+
+    def test_should_format_logs_retrieved_with_eth_get_logs(self):
+        # given
+        web3 = Web3(HTTPProvider("http://localhost:8545"))
+        node = FakeNode()
+        node.mine(self.token.address, self.token.address)
+        node.mine(self.token.address)
+
+        # when
+        with node.install(web3):
+            logs = get_logs(web3, self.token.address, TRANSFER_TOPIC, 0, 2, chunk_size=1)
+
+        # then
+        assert [(log['blockNumber'], log['logIndex'], log['transactionIndex']) for log in logs] == \
+               [(1, 0, 0), (1, 1, 1), (2, 0, 0)]
+
+        # and
+        with node.install(web3):
+            log_cache = LogCache(web3, confirmations=0)
+            assert log_cache.get_logs(self.token.address, TRANSFER_TOPIC, 0, 2) == logs
+            assert log_cache.get_logs(self.token.address, TRANSFER_TOPIC, 2, 2) == logs[2:]
+
+
+class TestLogCache:
+    def setup_method(self):
+        self.web3 = Web3(EthereumTesterProvider())
+        self.web3.eth.defaultAccount = self.web3.eth.accounts[0]
+        self.token = DSToken.deploy(self.web3, 'AAA')
+        self.token.mint(Wad(1000000)).transact()
+        for amount in range(1, 6):
+            self.token.transfer(Address(self.web3.eth.accounts[1]), Wad(amount)).transact()
+
+    def test_should_return_the_same_logs_as_the_node(self):
+        # given
+        log_cache = LogCache(self.web3, confirmations=0)
+        block_number = self.web3.eth.blockNumber
+
+        # expect
+        assert log_cache.get_logs(self.token.address, TRANSFER_TOPIC, 0, block_number) == \
+               get_logs(self.web3, self.token.address, TRANSFER_TOPIC, 0, block_number)
+
+    def test_should_only_retrieve_blocks_not_seen_before(self):
+        # given
+        log_cache = LogCache(self.web3, confirmations=0)
+        block_number = self.web3.eth.blockNumber
+        log_cache.get_logs(self.token.address, TRANSFER_TOPIC, 0, block_number - 2)
+
+        # when
+        with patch('pymaker.events.get_logs', wraps=get_logs) as get_logs_mock:
+            logs = log_cache.get_logs(self.token.address, TRANSFER_TOPIC, 0, block_number)
+
+        # then
+        assert len(logs) == 5
+        get_logs_mock.assert_called_once_with(self.web3, self.token.address, TRANSFER_TOPIC,
+                                              block_number - 1, block_number)
+
+    def test_should_not_cache_recent_blocks(self):
+        # given
+        log_cache = LogCache(self.web3, confirmations=3)
+        block_number = self.web3.eth.blockNumber
+
+        # when
+        log_cache.get_logs(self.token.address, TRANSFER_TOPIC, 0, block_number)
+        with patch('pymaker.events.get_logs', wraps=get_logs) as get_logs_mock:
+            log_cache.get_logs(self.token.address, TRANSFER_TOPIC, 0, block_number)
+
+        # then
+        get_logs_mock.assert_called_once_with(self.web3, self.token.address, TRANSFER_TOPIC,
+                                              block_number - 2, block_number)
+
+    def test_should_persist_logs(self, tmpdir):
+        # given
+        path = str(tmpdir.join('logs.db'))
+        block_number = self.web3.eth.blockNumber
+        logs = LogCache(self.web3, path, confirmations=0).get_logs(self.token.address, TRANSFER_TOPIC, 0, block_number)
+
+        # when
+        with patch('pymaker.events.get_logs', wraps=get_logs) as get_logs_mock:
+            cached_logs = LogCache(self.web3, path, confirmations=0).get_logs(self.token.address, TRANSFER_TOPIC,
+                                                                              0, block_number)
+
+        # then
+        assert cached_logs == logs
+        assert not get_logs_mock.called
+
+    def test_should_be_used_by_past_events(self):
+        # given
+        log_cache = LogCache(self.web3, confirmations=0)
+        LogCache.register(self.web3, log_cache)
+
+        # when
+        with patch.object(log_cache, 'get_logs', wraps=log_cache.get_logs) as get_logs_mock:
+            past_events = self.token._past_events(self.token._contract, 'Transfer', dict, 100)
+
+        # then
+        assert len(past_events) == 5
+        assert get_logs_mock.called
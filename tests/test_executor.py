@@ -0,0 +1,75 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2017 reverendus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest.mock import patch
+
+from web3 import EthereumTesterProvider
+from web3 import Web3
+
+from pymaker import Address, Receipt
+from pymaker.executor import TransactExecutor
+from pymaker.numeric import Wad
+from pymaker.token import DSToken
+from pymaker.util import batch_requests
+
+
+class TestTransactExecutor:
+    def setup_method(self):
+        self.web3 = Web3(EthereumTesterProvider())
+        self.web3.eth.defaultAccount = self.web3.eth.accounts[0]
+        self.our_address = Address(self.web3.eth.defaultAccount)
+        self.second_address = Address(self.web3.eth.accounts[1])
+        self.token = DSToken.deploy(self.web3, 'ABC')
+        self.token.mint(Wad(1000000)).transact()
+        self.executor = TransactExecutor()
+
+    def teardown_method(self):
+        self.executor.stop()
+
+    def test_should_execute_transaction(self):
+        # when
+        receipt = self.executor.submit(self.token.transfer(self.second_address, Wad(500))).result(timeout=30)
+
+        # then
+        assert isinstance(receipt, Receipt)
+        assert self.token.balance_of(self.second_address) == Wad(500)
+
+    def test_should_return_none_for_failed_transaction(self):
+        # when
+        receipt = self.executor.submit(self.token.transfer(self.second_address, Wad(5000000))).result(timeout=30)
+
+        # then
+        assert receipt is None
+        assert self.token.balance_of(self.second_address) == Wad(0)
+
+    def test_should_execute_many_transactions_and_poll_receipts_together(self):
+        # given
+        transacts = [self.token.transfer(self.second_address, Wad(10)) for _ in range(10)]
+
+        # when
+        with patch('pymaker.batch_requests', wraps=batch_requests) as batch_requests_mock:
+            futures = self.executor.submit_all(transacts)
+            receipts = [future.result(timeout=30) for future in futures]
+
+        # then
+        assert all(isinstance(receipt, Receipt) for receipt in receipts)
+        assert self.token.balance_of(self.second_address) == Wad(100)
+
+        # and
+        assert batch_requests_mock.call_count < len(transacts)
+        assert sum(len(call[0][1]) for call in batch_requests_mock.call_args_list) == len(transacts)
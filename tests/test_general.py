@@ -15,10 +15,23 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import copy
+import pickle
+import time
+from unittest.mock import Mock, patch
+
+import eth_utils
 import pytest
+from web3 import Web3, HTTPProvider, EthereumTesterProvider
+from web3.utils.events import get_event_data
 
-from pymaker import Address, Calldata, Receipt, Transfer
+from pymaker import Address, Calldata, Contract, ContractArtifact, EventDecoder, FunctionEncoder, ReadCache, Receipt, ReceiptPoller, \
+    Transact, Transfer
+from pymaker.deployment import Deployment
+from pymaker.feed import DSValue
 from pymaker.numeric import Wad
+from pymaker.token import DSToken
+from pymaker.util import synchronize
 from tests.helpers import is_hashable
 
 
@@ -64,6 +77,44 @@ class TestAddress:
     def test_should_be_hashable(self):
         assert is_hashable(Address('0x0000011111000001111100000111110000011111'))
 
+    def test_should_not_have_instance_dict(self):
+        assert not hasattr(Address('0x0000011111000001111100000111110000011111'), '__dict__')
+
+    def test_should_intern_instances(self):
+        # given
+        address = Address('0x0000011111000001111100000111110000033333')
+
+        # expect
+        assert Address('0x0000011111000001111100000111110000033333') is address
+        assert Address('0000011111000001111100000111110000033333') is address
+        assert Address(address.as_bytes()) is address
+        assert Address(address) is address
+
+    def test_should_stay_interned_when_copied_or_pickled(self):
+        # given
+        address = Address('0x0000011111000001111100000111110000033333')
+
+        # expect
+        assert copy.copy(address) is address
+        assert copy.deepcopy(address) is address
+        assert pickle.loads(pickle.dumps(address)) is address
+
+    def test_should_be_immutable(self):
+        # given
+        address = Address('0x0000011111000001111100000111110000033333')
+
+        # expect
+        with pytest.raises(AttributeError):
+            address.address = '0x0000011111000001111100000111110000044444'
+        with pytest.raises(AttributeError):
+            address._bytes = bytes(20)
+        with pytest.raises(AttributeError):
+            del address.address
+
+        # and
+        assert address.address == '0x0000011111000001111100000111110000033333'
+        assert Address('0x0000011111000001111100000111110000033333') is address
+
     def test_equality(self):
         # given
         address1a = Address('0x0000011111000001111100000111110000011111')
@@ -133,6 +184,79 @@ class TestCalldata:
         assert calldata1b != calldata2
 
 
+class TestContractArtifact:
+    def test_should_load_abi_and_bin(self):
+        # expect
+        assert isinstance(DSToken.abi, list)
+        assert isinstance(DSToken.bin, bytes)
+        assert any(abi.get('name') == 'transfer' for abi in DSToken.abi)
+
+    def test_should_parse_artifacts_only_once(self):
+        # expect
+        assert DSToken.abi is DSToken.abi
+        assert DSToken.abi is ContractArtifact.load('pymaker.token', 'abi/DSToken.abi', lambda data: [])
+
+    def test_should_not_read_artifacts_until_first_use(self):
+        # given
+        class SomeContract(Contract):
+            abi = Contract._load_abi(__name__, 'abi/Nonexistent.abi')
+
+        # expect
+        with pytest.raises(FileNotFoundError):
+            SomeContract.abi
+
+
+class TestFunctionEncoder:
+    def setup_method(self):
+        self.web3 = Web3(EthereumTesterProvider())
+        self.args = ['0x0000011111000001111100000111110000011111', 500]
+
+    def test_should_encode_the_same_way_as_web3(self):
+        # when
+        calldata = FunctionEncoder.for_function(self.web3, DSToken.abi, 'transfer', self.args).encode(self.args)
+
+        # then
+        assert calldata == self.web3.eth.contract(abi=DSToken.abi).encodeABI('transfer', self.args)
+
+    def test_should_choose_overload_based_on_arguments(self):
+        # when
+        mint_wad = FunctionEncoder.for_function(self.web3, DSToken.abi, 'mint', [500])
+        mint_guy_wad = FunctionEncoder.for_function(self.web3, DSToken.abi, 'mint', self.args)
+
+        # then
+        assert [input['type'] for input in mint_wad.function_abi['inputs']] == ['uint256']
+        assert [input['type'] for input in mint_guy_wad.function_abi['inputs']] == ['address', 'uint256']
+
+    def test_should_reuse_encoders(self):
+        # expect
+        assert FunctionEncoder.for_function(self.web3, DSToken.abi, 'transfer', self.args) is \
+               FunctionEncoder.for_function(Web3(EthereumTesterProvider()), DSToken.abi, 'transfer', [self.args[0], 1])
+
+    def test_should_reuse_encoders_for_equal_abis(self):
+        # given
+        abi = copy.deepcopy(DSToken.abi)
+
+        # expect
+        assert FunctionEncoder.for_function(self.web3, DSToken.abi, 'transfer', self.args) is \
+               FunctionEncoder.for_function(self.web3, abi, 'transfer', self.args)
+
+    def test_should_fail_for_unknown_function(self):
+        with pytest.raises(ValueError):
+            FunctionEncoder.for_function(self.web3, DSToken.abi, 'transfer', [])
+
+    def test_transact_invocation_should_use_encoded_calldata(self):
+        # given
+        address = Address('0x0000011111000001111100000111110000022222')
+        transact = Transact(None, self.web3, DSToken.abi, address, None, 'transfer', self.args)
+
+        # when
+        invocation = transact.invocation()
+
+        # then
+        assert invocation.address == address
+        assert invocation.calldata == Calldata(self.web3.eth.contract(abi=DSToken.abi).encodeABI('transfer', self.args))
+
+
 class TestReceipt:
     @pytest.fixture()
     def receipt_success(self) -> dict:
@@ -207,11 +331,266 @@ class TestReceipt:
                                                 to_address=Address('0x0046f01ad360270605e0e5d693484ec3bfe43ba8'),
                                                 value=Wad.from_number(1))
 
+    def test_should_decode_transfers_only_when_accessed(self, receipt_success):
+        with patch.object(EventDecoder, 'for_event', wraps=EventDecoder.for_event) as for_event:
+            # when
+            receipt = Receipt(receipt_success)
+
+            # then
+            assert receipt.successful is True
+            assert for_event.call_count == 0
+
+            # when
+            transfers = receipt.transfers
+
+            # then
+            assert len(transfers) == 1
+            assert receipt.transfers is transfers
+            assert for_event.call_count == 1
+
+    def test_should_not_have_instance_dict(self, receipt_success):
+        # given
+        receipt = Receipt(receipt_success)
+
+        # expect
+        assert not hasattr(receipt, '__dict__')
+        assert not hasattr(receipt.transfers[0], '__dict__')
+
     def test_should_recognize_successful_and_failed_transactions(self, receipt_success, receipt_failed):
         # expect
         assert Receipt(receipt_success).successful is True
         assert Receipt(receipt_failed).successful is False
 
+    def test_should_decode_all_known_events(self, receipt_success, receipt_failed):
+        # given
+        receipt = Receipt(receipt_success)
+
+        # expect
+        assert [event['event'] for event in receipt.events] == ['Transfer', 'LogItemUpdate', 'LogMake']
+        assert receipt.events[1]['args'] == {'id': 0xa2}
+        assert receipt.events[2]['args']['maker'].lower() == '0x0046f01ad360270605e0e5d693484ec3bfe43ba8'
+        assert receipt.events[2]['args']['pay_amt'] == 10**18
+        assert receipt.events is receipt.events
+
+        # and
+        assert Receipt(receipt_failed).events == []
+
+    def test_should_decode_events_the_same_way_as_web3(self, receipt_success):
+        for receipt_log in receipt_success['logs']:
+            # when
+            decoder = EventDecoder.for_log(receipt_log)
+
+            # then
+            assert decoder.decode(receipt_log) == get_event_data(decoder.event_abi, receipt_log)
+
+
+class TestEventDecoder:
+    def test_should_decode_negative_numbers_and_dynamic_data(self):
+        # given
+        event_abi = {'anonymous': False, 'name': 'Test', 'type': 'event',
+                     'inputs': [{'indexed': True, 'name': 'who', 'type': 'int256'},
+                                {'indexed': False, 'name': 'flag', 'type': 'bool'},
+                                {'indexed': False, 'name': 'amount', 'type': 'int128'},
+                                {'indexed': False, 'name': 'data', 'type': 'bytes'}]}
+        log = {'address': '0x0000011111000001111100000111110000011111',
+               'blockHash': '0x01', 'blockNumber': 1, 'logIndex': 0, 'transactionHash': '0x02', 'transactionIndex': 0,
+               'topics': [eth_utils.event_abi_to_log_topic(event_abi), '0x' + 'f' * 64],
+               'data': '0x' + '0' * 63 + '1' + 'f' * 63 + 'e' + '0' * 62 + '60' + '0' * 63 + '2' + 'abcd' + '0' * 60}
+
+        # when
+        event = EventDecoder(event_abi).decode(log)
+
+        # then
+        assert event['args'] == {'who': -1, 'flag': True, 'amount': -2, 'data': bytes.fromhex('abcd')}
+
+    def test_should_reuse_decoders(self):
+        # expect
+        assert EventDecoder.for_event(DSToken.abi, 'Transfer') is EventDecoder.for_event(DSToken.abi, 'Transfer')
+        assert EventDecoder.for_event(DSToken.abi, 'Transfer') is not EventDecoder.for_event(DSToken.abi, 'Approval')
+
+    def test_should_not_find_decoders_for_unknown_logs(self):
+        # expect
+        assert EventDecoder.for_log({'topics': []}) is None
+        assert EventDecoder.for_log({'topics': ['0x' + '1' * 64]}) is None
+
+
+class TestReadCache:
+    def test_should_cache_immutable_values_forever(self):
+        # given
+        read_cache = ReadCache()
+        function = Mock(return_value=5)
+
+        # when
+        read_cache.new_block(10)
+        assert read_cache.get(('key',), False, function) == 5
+        read_cache.new_block(11)
+        assert read_cache.get(('key',), False, function) == 5
+
+        # then
+        assert function.call_count == 1
+        assert read_cache.hits == 1
+        assert read_cache.misses == 1
+
+    def test_should_cache_mutable_values_until_new_block(self):
+        # given
+        read_cache = ReadCache()
+        function = Mock(side_effect=[1, 2])
+
+        # when
+        read_cache.new_block(10)
+
+        # then
+        assert read_cache.get(('key',), True, function) == 1
+        assert read_cache.get(('key',), True, function) == 1
+        assert read_cache.block_number == 10
+
+        # when
+        read_cache.new_block(11)
+
+        # then
+        assert read_cache.get(('key',), True, function) == 2
+        assert read_cache.hits == 1
+        assert read_cache.misses == 2
+
+    def test_should_cache_mutable_values_for_the_given_block(self):
+        # given
+        read_cache = ReadCache()
+        function = Mock(side_effect=[1, 2])
+
+        # expect
+        assert read_cache.get(('key',), True, function, 10) == 1
+        assert read_cache.get(('key',), True, function, 10) == 1
+        assert read_cache.get(('key',), True, function, 11) == 2
+        assert read_cache.block_number == 11
+        assert read_cache.hits == 1
+        assert read_cache.misses == 2
+
+    def test_should_not_cache_mutable_values_if_block_not_known(self):
+        # given
+        read_cache = ReadCache()
+        function = Mock(side_effect=[1, 2])
+
+        # expect
+        assert read_cache.get(('key',), True, function) == 1
+        assert read_cache.get(('key',), True, function) == 2
+        assert read_cache.hits == 0
+        assert read_cache.misses == 0
+
+    def test_clear(self):
+        # given
+        read_cache = ReadCache()
+        function = Mock(return_value=5)
+        read_cache.new_block(10)
+        read_cache.get(('key',), False, function)
+
+        # when
+        read_cache.clear()
+
+        # then
+        assert read_cache.block_number is None
+        assert read_cache.get(('key',), False, function) == 5
+        assert function.call_count == 2
+
+    def test_should_be_shared_per_web3(self):
+        # given
+        web3 = Web3(EthereumTesterProvider())
+
+        # expect
+        assert ReadCache.for_web3(web3) is ReadCache.for_web3(web3)
+        assert ReadCache.for_web3(web3) is not ReadCache.for_web3(Web3(EthereumTesterProvider()))
+
+    def test_should_cache_contract_getters(self, deployment: Deployment):
+        # given
+        read_cache = ReadCache.for_web3(deployment.web3)
+        hits = read_cache.hits
+
+        # when
+        sai = deployment.tub.sai()
+
+        # then
+        assert deployment.tub.sai() == sai
+        assert read_cache.hits == hits + 1
+
+    def test_should_cache_per_block_getters_within_one_block(self, deployment: Deployment):
+        # given
+        DSValue(web3=deployment.web3, address=deployment.tub.pip()).poke_with_int(Wad.from_number(250).value).transact()
+        read_cache = ReadCache.for_web3(deployment.web3)
+        tag = deployment.tub.tag()
+        hits = read_cache.hits
+
+        # expect
+        assert deployment.tub.tag() == tag
+        assert read_cache.hits == hits + 1
+        assert read_cache.block_number == deployment.web3.eth.blockNumber
+
+    def test_should_refresh_per_block_getters_on_new_block(self, deployment: Deployment):
+        # given
+        DSValue(web3=deployment.web3, address=deployment.tub.pip()).poke_with_int(Wad.from_number(250).value).transact()
+        tag = deployment.tub.tag()
+
+        # when
+        DSValue(web3=deployment.web3, address=deployment.tub.pip()).poke_with_int(Wad.from_number(300).value).transact()
+
+        # then
+        assert deployment.tub.tag() != tag
+
+
+class TestReceiptPoller:
+    @staticmethod
+    def raw_receipt(tx_hash: str) -> dict:
+        return {'blockNumber': 1, 'gasUsed': 21000, 'logs': [], 'transactionHash': tx_hash}
+
+    def test_interval_should_decrease_towards_expected_inclusion_time(self):
+        # given
+        web3 = Web3(HTTPProvider("http://localhost:8545"))
+        receipt_poller = ReceiptPoller(min_interval=0.5, max_interval=2.5, expected_inclusion_time=10)
+
+        # expect
+        assert receipt_poller.interval(web3, 0) == 2.5
+        assert receipt_poller.interval(web3, 5) == 1.5
+        assert receipt_poller.interval(web3, 10) == 0.5
+        assert receipt_poller.interval(web3, 60) == 0.5
+
+    def test_interval_should_always_be_minimal_for_tester(self):
+        # given
+        web3 = Web3(EthereumTesterProvider())
+        receipt_poller = ReceiptPoller(min_interval=0.5, max_interval=2.5, expected_inclusion_time=10)
+
+        # expect
+        assert receipt_poller.interval(web3, 0) == 0.5
+
+    def test_should_check_all_pending_transactions_in_one_batch(self):
+        # given
+        web3 = Web3(HTTPProvider("http://localhost:8545"))
+        receipt_poller = ReceiptPoller(min_interval=0.1, max_interval=0.1)
+
+        # when
+        with patch('pymaker.batch_requests', return_value=[None, self.raw_receipt('0x02')]) as batch_requests:
+            results = synchronize([receipt_poller.wait(web3, ['0x01'], time.time()),
+                                   receipt_poller.wait(web3, ['0x01', '0x02'], time.time())])
+
+        # then
+        assert batch_requests.call_count == 1
+        assert batch_requests.call_args[0][1] == [('eth_getTransactionReceipt', ['0x01']),
+                                                  ('eth_getTransactionReceipt', ['0x02'])]
+        assert results[0] == [None]
+        assert results[1][0] is None
+        assert results[1][1].transaction_hash == '0x02'
+
+    def test_should_wake_up_waiters_not_due_yet_if_their_transaction_got_mined(self):
+        # given
+        web3 = Web3(HTTPProvider("http://localhost:8545"))
+        receipt_poller = ReceiptPoller(min_interval=0.1, max_interval=60, expected_inclusion_time=60)
+
+        # when
+        with patch('pymaker.batch_requests', return_value=[self.raw_receipt('0x01'), self.raw_receipt('0x02')]):
+            results = synchronize([receipt_poller.wait(web3, ['0x01'], time.time() - 60),
+                                   receipt_poller.wait(web3, ['0x02'], time.time())])
+
+        # then
+        assert results[0][0].transaction_hash == '0x01'
+        assert results[1][0].transaction_hash == '0x02'
+
 
 class TestTransfer:
     def test_equality(self):
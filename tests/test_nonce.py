@@ -0,0 +1,179 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2017 reverendus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import gc
+import threading
+import weakref
+from unittest.mock import Mock, patch
+
+from web3 import Web3, HTTPProvider
+
+from pymaker.nonce import NonceManager
+
+
+class TestNonceManager:
+    def setup_method(self):
+        self.web3 = Web3(HTTPProvider("http://localhost:8545"))
+        self.web3.eth.getTransactionCount = Mock(return_value=7)
+        self.account = '0x0000011111000001111100000111110000011111'
+
+    def test_should_seed_from_pending_transaction_count(self):
+        # given
+        nonce_manager = NonceManager(self.web3, self.account)
+
+        # expect
+        assert nonce_manager.next_nonce() == 7
+        assert nonce_manager.next_nonce() == 8
+        assert nonce_manager.next_nonce() == 9
+
+        # and
+        self.web3.eth.getTransactionCount.assert_called_once_with(self.account, 'pending')
+
+    def test_should_hand_out_unique_nonces_to_concurrent_callers(self):
+        # given
+        nonce_manager = NonceManager(self.web3, self.account)
+        nonces = []
+
+        # when
+        threads = [threading.Thread(target=lambda: nonces.extend(nonce_manager.next_nonce() for _ in range(100)))
+                   for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # then
+        assert sorted(nonces) == list(range(7, 1007))
+
+    def test_should_skip_nonces_used_elsewhere_on_resync(self):
+        # given
+        nonce_manager = NonceManager(self.web3, self.account)
+        nonce_manager.next_nonce()
+        nonce_manager.next_nonce()
+
+        # when
+        self.web3.eth.getTransactionCount.return_value = 12
+        nonce_manager.resync()
+
+        # then
+        assert nonce_manager.next_nonce() == 12
+
+    def test_should_never_go_back_below_nonces_handed_out_on_resync(self):
+        # given
+        nonce_manager = NonceManager(self.web3, self.account)
+        nonce_manager.next_nonce()
+        nonce_manager.next_nonce()
+
+        # when
+        self.web3.eth.getTransactionCount.return_value = 8
+        nonce_manager.resync()
+
+        # then
+        assert nonce_manager.next_nonce() == 9
+
+    def test_should_periodically_compare_with_the_node(self):
+        # given
+        nonce_manager = NonceManager(self.web3, self.account, sync_interval=0)
+        assert nonce_manager.next_nonce() == 7
+
+        # when
+        self.web3.eth.getTransactionCount.return_value = 20
+
+        # then
+        assert nonce_manager.next_nonce() == 20
+        assert self.web3.eth.getTransactionCount.call_count == 2
+
+    def test_should_reuse_nonces_of_transactions_which_could_not_be_sent(self):
+        # given
+        nonce_manager = NonceManager(self.web3, self.account)
+        assert [nonce_manager.next_nonce() for _ in range(4)] == [7, 8, 9, 10]
+
+        # when
+        nonce_manager.failed(8, ValueError("insufficient funds for gas * price + value"))
+        nonce_manager.failed(10, ValueError("insufficient funds for gas * price + value"))
+
+        # then
+        assert [nonce_manager.next_nonce() for _ in range(3)] == [8, 10, 11]
+
+    def test_should_resync_if_nonce_has_already_been_used(self):
+        # given
+        nonce_manager = NonceManager(self.web3, self.account)
+        assert nonce_manager.next_nonce() == 7
+
+        # when
+        self.web3.eth.getTransactionCount.return_value = 9
+        nonce_manager.failed(7, ValueError({'code': -32000, 'message': 'nonce too low'}))
+
+        # then
+        assert nonce_manager.next_nonce() == 9
+
+    def test_should_resync_if_replacement_transaction_is_underpriced(self):
+        # given
+        nonce_manager = NonceManager(self.web3, self.account)
+        assert nonce_manager.next_nonce() == 7
+
+        # when
+        self.web3.eth.getTransactionCount.return_value = 8
+        nonce_manager.failed(7, ValueError({'code': -32000, 'message': 'replacement transaction underpriced'}))
+
+        # then
+        assert nonce_manager.next_nonce() == 8
+
+    def test_should_reuse_nonce_of_dropped_transaction(self):
+        # given
+        nonce_manager = NonceManager(self.web3, self.account, sync_interval=60)
+        with patch('pymaker.nonce.time.time', return_value=1000):
+            assert [nonce_manager.next_nonce() for _ in range(3)] == [7, 8, 9]
+
+        # when
+        self.web3.eth.getTransactionCount.return_value = 8
+        with patch('pymaker.nonce.time.time', return_value=1030):
+            nonce_manager.resync()
+
+        # then
+        with patch('pymaker.nonce.time.time', return_value=1031):
+            assert nonce_manager.next_nonce() == 10
+
+        # when
+        with patch('pymaker.nonce.time.time', return_value=1100):
+            nonce_manager.resync()
+
+        # then
+        with patch('pymaker.nonce.time.time', return_value=1101):
+            assert nonce_manager.next_nonce() == 8
+            assert nonce_manager.next_nonce() == 11
+
+    def test_should_not_keep_web3_instances_alive(self):
+        # given
+        web3 = Web3(HTTPProvider("http://localhost:8545"))
+        NonceManager.for_account(web3, self.account)
+        web3_reference = weakref.ref(web3)
+
+        # when
+        del web3
+        gc.collect()
+
+        # then
+        assert web3_reference() is None
+
+    def test_should_share_instances_per_account(self):
+        # expect
+        assert NonceManager.for_account(self.web3, self.account) is \
+               NonceManager.for_account(self.web3, self.account.upper().replace('0X', '0x'))
+        assert NonceManager.for_account(self.web3, self.account) is not \
+               NonceManager.for_account(self.web3, '0x0000011111000001111100000111110000022222')
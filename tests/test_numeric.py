@@ -15,9 +15,13 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from decimal import Decimal, ROUND_DOWN, localcontext
+
 import pytest
+from hypothesis import given
+from hypothesis.strategies import integers
 
-from pymaker.numeric import Wad, Ray
+from pymaker.numeric import Wad, Ray, WadArray, RayArray
 from tests.helpers import is_hashable
 
 
@@ -419,3 +423,203 @@ class TestRay:
         assert round(Ray.from_number(123.4567), 2) == Ray.from_number(123.46)
         assert round(Ray.from_number(123.4567), 0) == Ray.from_number(123.0)
         assert round(Ray.from_number(123.4567), -2) == Ray.from_number(100.0)
+
+
+def reference_mul(x: int, y: int, decimals: int) -> int:
+    with localcontext() as ctx:
+        ctx.prec = 1000
+        return int((Decimal(x) * Decimal(y) / (Decimal(10) ** decimals)).quantize(1, rounding=ROUND_DOWN))
+
+
+def reference_div(x: int, y: int, decimals: int) -> int:
+    with localcontext() as ctx:
+        ctx.prec = 1000
+        return int((Decimal(x) * (Decimal(10) ** decimals) / Decimal(y)).quantize(1, rounding=ROUND_DOWN))
+
+
+values = integers(min_value=-2**256, max_value=2**256)
+non_zero_values = values.filter(lambda value: value != 0)
+
+
+class TestAgainstDecimalReference:
+    @given(values, values)
+    def test_wad_multiply(self, x, y):
+        assert (Wad(x) * Wad(y)).value == reference_mul(x, y, 18)
+
+    @given(values, values)
+    def test_wad_multiply_by_ray(self, x, y):
+        assert (Wad(x) * Ray(y)).value == reference_mul(x, y, 27)
+
+    @given(values, values)
+    def test_wad_multiply_by_int(self, x, y):
+        assert (Wad(x) * y).value == reference_mul(x, y, 0)
+
+    @given(values, non_zero_values)
+    def test_wad_divide(self, x, y):
+        assert (Wad(x) / Wad(y)).value == reference_div(x, y, 18)
+
+    @given(values, values)
+    def test_ray_multiply(self, x, y):
+        assert (Ray(x) * Ray(y)).value == reference_mul(x, y, 27)
+
+    @given(values, values)
+    def test_ray_multiply_by_wad(self, x, y):
+        assert (Ray(x) * Wad(y)).value == reference_mul(x, y, 18)
+
+    @given(values, values)
+    def test_ray_multiply_by_int(self, x, y):
+        assert (Ray(x) * y).value == reference_mul(x, y, 0)
+
+    @given(values, non_zero_values)
+    def test_ray_divide(self, x, y):
+        assert (Ray(x) / Ray(y)).value == reference_div(x, y, 27)
+
+    @given(values)
+    def test_wad_from_ray(self, x):
+        assert Wad(Ray(x)).value == reference_mul(x, 1, 9)
+
+    @given(values)
+    def test_ray_from_wad(self, x):
+        assert Ray(Wad(x)).value == reference_div(x, 1, 9)
+
+    def test_should_not_allow_arbitrary_attributes(self):
+        with pytest.raises(AttributeError):
+            Wad(1).something = 1
+        with pytest.raises(AttributeError):
+            Ray(1).something = 1
+
+
+class TestWadArray:
+    def test_should_convert_to_and_from_list_of_wads(self):
+        # given
+        wads = [Wad(1), Wad.from_number(2.5), Wad.from_number(-3)]
+
+        # when
+        array = WadArray(wads)
+
+        # then
+        assert len(array) == 3
+        assert array.to_list() == wads
+        assert list(array) == wads
+        assert array[1] == Wad.from_number(2.5)
+        assert array[1:] == WadArray(wads[1:])
+
+    def test_should_convert_from_ray_array(self):
+        assert WadArray(RayArray([Ray(1999999999), Ray(-1999999999)])) == WadArray([1, -1])
+
+    def test_add_and_subtract(self):
+        # given
+        a = WadArray([Wad.from_number(1), Wad.from_number(2)])
+        b = WadArray([Wad.from_number(0.5), Wad.from_number(4)])
+
+        # expect
+        assert a + b == WadArray([Wad.from_number(1.5), Wad.from_number(6)])
+        assert a - b == WadArray([Wad.from_number(0.5), Wad.from_number(-2)])
+        assert a + Wad.from_number(1) == WadArray([Wad.from_number(2), Wad.from_number(3)])
+
+    def test_should_match_wad_rounding(self):
+        # given
+        xs = [Wad(1234567890123456789), Wad(-987654321987654321), Wad(3)]
+        ys = [Wad(3), Wad(7), Wad(-1234567890123456789)]
+        ray = Ray(333333333333333333333333333)
+
+        # expect
+        assert (WadArray(xs) * WadArray(ys)).to_list() == [x * y for x, y in zip(xs, ys)]
+        assert (WadArray(xs) / WadArray(ys)).to_list() == [x / y for x, y in zip(xs, ys)]
+        assert (WadArray(xs) * ray).to_list() == [x * ray for x in xs]
+        assert (WadArray(xs) * RayArray([ray] * 3)).to_list() == [x * ray for x in xs]
+        assert (WadArray(xs) / Wad(7)).to_list() == [x / Wad(7) for x in xs]
+        assert (WadArray(xs) * 3).to_list() == [x * 3 for x in xs]
+
+    def test_compare(self):
+        # given
+        a = WadArray([Wad(1), Wad(2), Wad(3)])
+        b = WadArray([Wad(3), Wad(2), Wad(1)])
+
+        # expect
+        assert a.lt(b) == [True, False, False]
+        assert a.le(b) == [True, True, False]
+        assert a.gt(b) == [False, False, True]
+        assert a.ge(Wad(2)) == [False, True, True]
+        assert a == WadArray([1, 2, 3])
+        assert a != b
+        assert a != [Wad(1), Wad(2), Wad(3)]
+
+    def test_should_not_support_ordering_operators(self):
+        # given
+        a = WadArray([Wad(1), Wad(2), Wad(3)])
+
+        # expect
+        with pytest.raises(TypeError):
+            a < a
+        with pytest.raises(TypeError):
+            a >= a
+
+    def test_min_max_sum(self):
+        # given
+        a = WadArray([Wad(1), Wad(5), Wad(3)])
+        b = WadArray([Wad(4), Wad(2), Wad(3)])
+
+        # expect
+        assert a.sum() == Wad(9)
+        assert WadArray([]).sum() == Wad(0)
+        assert a.min() == Wad(1)
+        assert a.max() == Wad(5)
+        assert a.minimum(b) == WadArray([1, 2, 3])
+        assert a.maximum(b) == WadArray([4, 5, 3])
+        assert a.minimum(Wad(2)) == WadArray([1, 2, 2])
+
+    def test_should_fail_on_length_mismatch(self):
+        with pytest.raises(ArithmeticError):
+            WadArray([1, 2]) + WadArray([1])
+
+    def test_should_fail_on_unsupported_operands(self):
+        with pytest.raises(ArithmeticError):
+            WadArray([1]) + RayArray([1])
+        with pytest.raises(ArithmeticError):
+            WadArray([1]) / Ray(1)
+        with pytest.raises(ArithmeticError):
+            WadArray([1]) == Wad(1)
+
+    def test_should_be_hashable(self):
+        assert is_hashable(WadArray([1, 2]))
+
+
+class TestRayArray:
+    def test_should_convert_to_and_from_list_of_rays(self):
+        # given
+        rays = [Ray(1), Ray.from_number(2.5), Ray.from_number(-3)]
+
+        # when
+        array = RayArray(rays)
+
+        # then
+        assert array.to_list() == rays
+        assert array[2] == Ray.from_number(-3)
+
+    def test_should_convert_from_wad_array(self):
+        assert RayArray(WadArray([1, -2])) == RayArray([10**9, -2 * 10**9])
+
+    def test_should_match_ray_rounding(self):
+        # given
+        xs = [Ray(1234567890123456789012345678), Ray(-987654321987654321987654321), Ray(3)]
+        ys = [Ray(3), Ray(7), Ray(-1234567890123456789012345678)]
+        wad = Wad(333333333333333333)
+
+        # expect
+        assert (RayArray(xs) * RayArray(ys)).to_list() == [x * y for x, y in zip(xs, ys)]
+        assert (RayArray(xs) / RayArray(ys)).to_list() == [x / y for x, y in zip(xs, ys)]
+        assert (RayArray(xs) * wad).to_list() == [x * wad for x in xs]
+        assert (RayArray(xs) * WadArray([wad] * 3)).to_list() == [x * wad for x in xs]
+        assert (RayArray(xs) - Ray(1)).to_list() == [x - Ray(1) for x in xs]
+
+    def test_min_max_sum(self):
+        # given
+        a = RayArray([Ray(1), Ray(5), Ray(3)])
+
+        # expect
+        assert a.sum() == Ray(9)
+        assert a.min() == Ray(1)
+        assert a.max() == Ray(5)
+        assert a.gt(Ray(2)) == [False, True, True]
+        assert a.maximum(Ray(4)) == RayArray([4, 5, 4])
@@ -15,6 +15,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import time
 from unittest.mock import Mock
 
 import pytest
@@ -23,7 +24,7 @@ from web3 import Web3
 
 from pymaker import Address, Wad
 from pymaker.approval import directly
-from pymaker.oasis import SimpleMarket, ExpiringMarket, MatchingMarket
+from pymaker.oasis import SimpleMarket, ExpiringMarket, MatchingMarket, OrderBook
 from pymaker.token import DSToken
 from tests.helpers import wait_until_mock_called, is_hashable
 
@@ -65,6 +66,30 @@ class GeneralMarketTest:
         # and
         assert self.otc.get_orders() == [self.otc.get_order(1)]
 
+    def test_get_orders_in_batches(self):
+        # given
+        self.otc.approve([self.token1], directly())
+        for amount in [2, 3, 4, 5, 6]:
+            self.otc.make(pay_token=self.token1.address, pay_amount=Wad.from_number(1),
+                          buy_token=self.token2.address, buy_amount=Wad.from_number(amount)).transact()
+
+        # when
+        self.otc.kill(2).transact(gas=4000000)
+
+        # then
+        assert self.otc.get_orders(batch_size=2) == [self.otc.get_order(1), self.otc.get_order(3),
+                                                     self.otc.get_order(4), self.otc.get_order(5)]
+        assert self.otc.get_orders(batch_size=2) == self.otc.get_orders(batch_size=100)
+
+        # and
+        for order in self.otc.get_orders(batch_size=3):
+            assert order.pay_token == self.otc.get_order(order.order_id).pay_token
+            assert order.pay_amount == self.otc.get_order(order.order_id).pay_amount
+            assert order.buy_token == self.otc.get_order(order.order_id).buy_token
+            assert order.buy_amount == self.otc.get_order(order.order_id).buy_amount
+            assert order.maker == self.otc.get_order(order.order_id).maker
+            assert order.timestamp == self.otc.get_order(order.order_id).timestamp
+
     def test_order_comparison(self):
         # when
         self.otc.approve([self.token1], directly())
@@ -476,6 +501,28 @@ class TestMatchingMarketPosition:
         assert self.otc.position(pay_token=self.token1.address, pay_amount=Wad.from_number(1),
                                  buy_token=self.token2.address, buy_amount=Wad.from_number(35)) == 4
 
+    def test_should_retrieve_orders_for_position_calculation_only_once(self):
+        # given
+        get_orders = Mock(wraps=self.otc.get_orders)
+        self.otc.get_orders = get_orders
+
+        # when
+        for amount in [12, 35, 50]:
+            self.otc.position(pay_token=self.token1.address, pay_amount=Wad.from_number(1),
+                              buy_token=self.token2.address, buy_amount=Wad.from_number(amount))
+
+        # then
+        assert get_orders.call_count == 1
+
+        # when
+        self.otc.make(pay_token=self.token1.address, pay_amount=Wad.from_number(1),
+                      buy_token=self.token2.address, buy_amount=Wad.from_number(35)).transact()
+
+        # then
+        assert self.otc.position(pay_token=self.token1.address, pay_amount=Wad.from_number(1),
+                                 buy_token=self.token2.address, buy_amount=Wad.from_number(35)) == 10
+        assert get_orders.call_count == 1
+
     def test_should_use_correct_order_position_by_default(self):
         # when
         explicit_position = self.otc.position(pay_token=self.token1.address, pay_amount=Wad.from_number(1),
@@ -518,3 +565,167 @@ class TestMatchingMarketPosition:
         # then
         assert gas_used_optimal < gas_used_minus_1
         assert gas_used_optimal < gas_used_plus_1
+
+
+class TestOrderBook:
+    def setup_method(self):
+        self.web3 = Web3(EthereumTesterProvider())
+        self.web3.eth.defaultAccount = self.web3.eth.accounts[0]
+        self.our_address = Address(self.web3.eth.defaultAccount)
+        self.token1 = DSToken.deploy(self.web3, 'AAA')
+        self.token1.mint(Wad.from_number(10000)).transact()
+        self.token2 = DSToken.deploy(self.web3, 'BBB')
+        self.token2.mint(Wad.from_number(10000)).transact()
+        self.otc = SimpleMarket.deploy(self.web3)
+        self.otc.approve([self.token1, self.token2], directly())
+
+    def make(self, pay_token, pay_amount: int, buy_token, buy_amount: int):
+        self.otc.make(pay_token=pay_token.address, pay_amount=Wad.from_number(pay_amount),
+                      buy_token=buy_token.address, buy_amount=Wad.from_number(buy_amount)).transact()
+
+    def replay_past_events(self, order_book: OrderBook):
+        events = self.otc.past_make(PAST_BLOCKS) + self.otc.past_bump(PAST_BLOCKS) + \
+                 self.otc.past_take(PAST_BLOCKS) + self.otc.past_kill(PAST_BLOCKS)
+
+        for event in sorted(events, key=lambda event: (event.raw['blockNumber'], event.raw['logIndex'])):
+            order_book.apply(event)
+
+    def test_should_be_seeded_with_orders_from_the_market(self):
+        # given
+        self.make(self.token1, 1, self.token2, 2)
+        self.make(self.token2, 3, self.token1, 1)
+
+        # when
+        order_book = OrderBook(self.otc)
+        order_book.reconcile()
+
+        # then
+        assert order_book.orders() == self.otc.get_orders()
+        assert order_book.order(1) == self.otc.get_order(1)
+        assert order_book.order(2) == self.otc.get_order(2)
+        assert order_book.order(3) is None
+
+    def test_should_apply_events(self):
+        # given
+        order_book = OrderBook(self.otc)
+        order_book.reconcile()
+
+        # when
+        self.make(self.token1, 1, self.token2, 2)
+        self.make(self.token1, 1, self.token2, 4)
+        self.make(self.token1, 1, self.token2, 3)
+        self.otc.bump(1).transact()
+        self.otc.take(1, Wad.from_number(0.25)).transact()
+        self.otc.take(2, Wad.from_number(1)).transact()
+        self.otc.kill(3).transact()
+        self.make(self.token2, 5, self.token1, 1)
+
+        # and
+        self.replay_past_events(order_book)
+
+        # then
+        assert order_book.orders() == self.otc.get_orders()
+        for order in order_book.orders():
+            assert order.pay_amount == self.otc.get_order(order.order_id).pay_amount
+            assert order.buy_amount == self.otc.get_order(order.order_id).buy_amount
+            assert order.maker == self.otc.get_order(order.order_id).maker
+            assert order.timestamp == self.otc.get_order(order.order_id).timestamp
+
+    def test_should_ignore_events_already_reflected_by_reconciliation(self):
+        # given
+        self.make(self.token1, 1, self.token2, 2)
+        self.otc.take(1, Wad.from_number(0.25)).transact()
+
+        # when
+        order_book = OrderBook(self.otc)
+        order_book.reconcile()
+
+        # and
+        self.replay_past_events(order_book)
+
+        # then
+        assert order_book.order(1).pay_amount == Wad.from_number(0.75)
+        assert order_book.order(1).buy_amount == Wad.from_number(1.5)
+
+    def test_should_not_apply_events_twice_if_block_gets_mined_during_reconciliation(self):
+        # given
+        self.make(self.token1, 1, self.token2, 2)
+        get_orders = self.otc.get_orders
+
+        def take_and_get_orders():
+            self.otc.take(1, Wad.from_number(0.25)).transact()
+            return get_orders()
+
+        self.otc.get_orders = take_and_get_orders
+
+        # when
+        order_book = OrderBook(self.otc)
+        order_book.reconcile()
+
+        # and
+        self.replay_past_events(order_book)
+
+        # then
+        assert order_book.order(1).pay_amount == Wad.from_number(0.75)
+        assert order_book.order(1).buy_amount == Wad.from_number(1.5)
+
+    def test_should_sort_orders_by_pair_and_price(self):
+        # given
+        for amount in [11, 55, 44, 34, 36]:
+            self.make(self.token1, 1, self.token2, amount)
+        self.make(self.token2, 10, self.token1, 1)
+
+        # when
+        order_book = OrderBook(self.otc)
+        order_book.reconcile()
+
+        # and
+        self.otc.kill(4).transact()
+        self.make(self.token1, 1, self.token2, 21)
+        self.replay_past_events(order_book)
+
+        # then
+        assert [order.order_id for order in order_book.orders_by_pair(self.token1.address,
+                                                                      self.token2.address)] == [2, 3, 5, 7, 1]
+        assert [order.order_id for order in order_book.orders_by_pair(self.token2.address,
+                                                                      self.token1.address)] == [6]
+
+    def test_should_reconcile_only_when_due(self):
+        # given
+        order_book = OrderBook(self.otc, reconcile_every=3)
+        order_book.reconcile_if_due()
+
+        # when
+        self.make(self.token1, 1, self.token2, 2)
+        order_book.reconcile_if_due()
+
+        # then
+        assert order_book.orders() == []
+
+        # when
+        self.make(self.token1, 1, self.token2, 3)
+        self.make(self.token1, 1, self.token2, 4)
+        order_book.reconcile_if_due()
+
+        # then
+        assert order_book.orders() == self.otc.get_orders()
+
+    @pytest.mark.timeout(10)
+    def test_should_follow_the_market_once_started(self):
+        # given
+        order_book = OrderBook(self.otc)
+        order_book.start()
+
+        # when
+        self.make(self.token1, 1, self.token2, 2)
+
+        # then
+        while order_book.order(1) is None:
+            time.sleep(0.1)
+
+        # when
+        self.otc.kill(1).transact()
+
+        # then
+        while order_book.order(1) is not None:
+            time.sleep(0.1)
@@ -15,13 +15,15 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from unittest.mock import Mock, patch
+
 import pytest
 
 from pymaker import Address
 from pymaker.deployment import Deployment
 from pymaker.feed import DSValue
 from pymaker.numeric import Wad, Ray
-from pymaker.sai import Tub, Tap, Top, Vox
+from pymaker.sai import Tub, Tap, Top, Vox, CupTracker
 
 
 class TestTub:
@@ -305,6 +307,52 @@ class TestTub:
         # then
         assert deployment.tub.safe(1)
 
+    def test_cup_states(self, deployment: Deployment):
+        # given
+        deployment.tub.join(Wad.from_number(10)).transact()
+        deployment.tub.mold_cap(Wad.from_number(100000)).transact()
+        deployment.tub.mold_mat(Ray.from_number(1.5)).transact()
+        DSValue(web3=deployment.web3, address=deployment.tub.pip()).poke_with_int(Wad.from_number(250).value).transact()
+
+        # and
+        for cup_id, ink, debt in [(1, 4, 400), (2, 3, 450), (3, 2, 0), (4, 1, 10)]:
+            deployment.tub.open().transact()
+            deployment.tub.lock(cup_id, Wad.from_number(ink)).transact()
+            if debt > 0:
+                deployment.tub.draw(cup_id, Wad.from_number(debt)).transact()
+        deployment.tub.shut(4).transact()
+
+        # and
+        DSValue(web3=deployment.web3, address=deployment.tub.pip()).poke_with_int(Wad.from_number(200).value).transact()
+
+        # when
+        cup_states = deployment.tub.cup_states(batch_size=2)
+
+        # then
+        assert [cup_state.cup_id for cup_state in cup_states] == [1, 2, 3]
+        for cup_state in cup_states:
+            assert cup_state.lad == deployment.tub.lad(cup_state.cup_id)
+            assert cup_state.ink == deployment.tub.ink(cup_state.cup_id)
+            assert cup_state.art == deployment.tub.cups(cup_state.cup_id).art
+            assert cup_state.tab == deployment.tub.tab(cup_state.cup_id)
+            assert cup_state.safe == deployment.tub.safe(cup_state.cup_id)
+
+        # and
+        assert cup_states[0].safe
+        assert cup_states[0].collateralization == Wad.from_number(2)
+        assert not cup_states[1].safe
+        assert cup_states[2].collateralization is None
+
+    def test_cup_states_of_selected_cups(self, deployment: Deployment):
+        # given
+        DSValue(web3=deployment.web3, address=deployment.tub.pip()).poke_with_int(Wad.from_number(250).value).transact()
+        for _ in range(3):
+            deployment.tub.open().transact()
+
+        # expect
+        assert [cup_state.cup_id for cup_state in deployment.tub.cup_states([3, 1])] == [3, 1]
+        assert [cup_state.cup_id for cup_state in deployment.tub.cup_states(range(2, 10))] == [2, 3]
+
     def test_mold_gap_and_gap(self, deployment: Deployment):
         # given
         assert deployment.tub.gap() == Wad.from_number(1)
@@ -329,6 +377,113 @@ class TestTub:
         assert deployment.tub == Tub(web3=deployment.web3, address=deployment.tub.address)
 
 
+class TestCupTracker:
+    def setup_cups(self, deployment: Deployment, cups: list):
+        deployment.tub.join(Wad.from_number(20)).transact()
+        deployment.tub.mold_cap(Wad.from_number(100000)).transact()
+        deployment.tub.mold_mat(Ray.from_number(1.5)).transact()
+        DSValue(web3=deployment.web3, address=deployment.tub.pip()).poke_with_int(Wad.from_number(250).value).transact()
+
+        for ink, debt in cups:
+            deployment.tub.open().transact()
+            cup_id = deployment.tub.cupi()
+            deployment.tub.lock(cup_id, Wad.from_number(ink)).transact()
+            if debt > 0:
+                deployment.tub.draw(cup_id, Wad.from_number(debt)).transact()
+
+    def test_should_seed_with_existing_cups(self, deployment: Deployment):
+        # given
+        self.setup_cups(deployment, [(4, 400), (3, 450), (2, 0)])
+
+        # when
+        cup_tracker = CupTracker(deployment.tub)
+        cup_tracker.update()
+
+        # then
+        assert [cup.cup_id for cup in cup_tracker.cups()] == [1, 2, 3]
+        assert cup_tracker.cup(2).ink == Wad.from_number(3)
+        assert cup_tracker.cup(2).art == deployment.tub.cups(2).art
+        assert cup_tracker.cup(4) is None
+        assert cup_tracker.unsafe_cups() == []
+
+    def test_should_follow_tub_events(self, deployment: Deployment):
+        # given
+        self.setup_cups(deployment, [(4, 400)])
+        cup_tracker = CupTracker(deployment.tub)
+        cup_tracker.update()
+
+        # when
+        deployment.tub.open().transact()
+        deployment.tub.lock(2, Wad.from_number(3)).transact()
+        deployment.tub.draw(2, Wad.from_number(100)).transact()
+        deployment.tub.wipe(1, Wad.from_number(50)).transact()
+        deployment.tub.free(1, Wad.from_number(1)).transact()
+        deployment.tub.give(1, Address('0x0101010101010101010101010101010101010101')).transact()
+        # and
+        cup_tracker.update()
+
+        # then
+        assert [cup.cup_id for cup in cup_tracker.cups()] == [1, 2]
+        for cup in cup_tracker.cups():
+            assert cup.lad == deployment.tub.lad(cup.cup_id)
+            assert cup.ink == deployment.tub.ink(cup.cup_id)
+            assert cup.art == deployment.tub.cups(cup.cup_id).art
+
+        # when
+        deployment.tub.wipe(2, Wad.from_number(100)).transact()
+        deployment.tub.shut(2).transact()
+        # and
+        cup_tracker.update()
+
+        # then
+        assert [cup.cup_id for cup in cup_tracker.cups()] == [1]
+
+    def test_should_find_unsafe_cups_after_price_change(self, deployment: Deployment):
+        # given
+        self.setup_cups(deployment, [(4, 400), (3, 450), (2, 0), (1, 150), (2, 200)])
+        cup_tracker = CupTracker(deployment.tub)
+        cup_tracker.update()
+
+        # when
+        DSValue(web3=deployment.web3, address=deployment.tub.pip()).poke_with_int(Wad.from_number(200).value).transact()
+        cup_tracker.update()
+
+        # then
+        assert [cup.cup_id for cup in cup_tracker.unsafe_cups()] == [2, 4]
+        for cup in cup_tracker.cups():
+            assert (cup in cup_tracker.unsafe_cups()) == (not deployment.tub.safe(cup.cup_id))
+
+        # when
+        deployment.tub.bite(2).transact()
+        cup_tracker.update()
+
+        # then
+        assert [cup.cup_id for cup in cup_tracker.unsafe_cups()] == [4]
+
+    def test_should_find_unsafe_dust_cups(self):
+        # given
+        tub = Mock(Tub)
+        tub.abi = Tub.abi
+        tub.web3 = Mock()
+        cup_tracker = CupTracker(tub)
+
+        # and
+        lad = '0x0101010101010101010101010101010101010101'
+        tub._call_many = Mock(return_value=[(lad, 2, 205, 0), (lad, 3, 205, 0), (lad, 2 * 10**18, 205 * 10**18, 0)])
+        cup_tracker.refresh([1, 2, 3])
+
+        # when
+        tub._call_many = Mock(return_value=[200 * 10**27, 15 * 10**26, 13 * 10**26,
+                                            '0x0202020202020202020202020202020202020202'])
+        with patch('pymaker.sai.Vox') as vox:
+            vox.return_value.par.return_value = Ray(10**27)
+            cup_tracker.update_prices()
+
+        # then
+        # `ink` to `art` ratio of all these cups is above the threshold, but rounding makes the first one unsafe
+        assert [cup.cup_id for cup in cup_tracker.unsafe_cups()] == [1]
+
+
 class TestTap:
     def test_fail_when_no_contract_under_that_address(self, deployment: Deployment):
         # expect
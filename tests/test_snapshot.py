@@ -0,0 +1,103 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2017 reverendus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+
+import pytest
+
+from pymaker.deployment import Deployment
+from pymaker.feed import DSValue
+from pymaker.numeric import Wad, Ray
+from pymaker.snapshot import Snapshot, web3_snapshot
+
+
+class TestSnapshot:
+    def test_should_pin_reads_to_block(self, deployment: Deployment):
+        # given
+        block_number = deployment.web3.eth.blockNumber
+
+        # when
+        with web3_snapshot(deployment.web3) as snapshot:
+            # then
+            assert snapshot.block_number == block_number
+            assert Snapshot.active(deployment.web3) is snapshot
+
+        # and
+        assert Snapshot.active(deployment.web3) is None
+
+    def test_should_not_affect_other_threads(self, deployment: Deployment):
+        # given
+        DSValue(web3=deployment.web3, address=deployment.tub.pip()).poke_with_int(Wad.from_number(250).value).transact()
+        results = []
+
+        def read_in_other_thread():
+            results.append(Snapshot.active(deployment.web3))
+            results.append(deployment.tub.tag())
+
+        # when
+        with web3_snapshot(deployment.web3):
+            tag = deployment.tub.tag()
+            DSValue(web3=deployment.web3, address=deployment.tub.pip()).poke_with_int(Wad.from_number(300).value).transact()
+
+            thread = threading.Thread(target=read_in_other_thread)
+            thread.start()
+            thread.join()
+
+            # then
+            assert deployment.tub.tag() == tag
+            assert deployment.web3.eth.defaultBlock == 'latest'
+
+        # and
+        assert results[0] is None
+        assert results[1] != tag
+
+    def test_should_cache_reads(self, deployment: Deployment):
+        # given
+        DSValue(web3=deployment.web3, address=deployment.tub.pip()).poke_with_int(Wad.from_number(250).value).transact()
+
+        # when
+        with web3_snapshot(deployment.web3) as snapshot:
+            tag = deployment.tub.tag()
+            DSValue(web3=deployment.web3, address=deployment.tub.pip()).poke_with_int(Wad.from_number(300).value).transact()
+
+            # then
+            assert deployment.tub.tag() == tag
+            assert snapshot.hits == 1
+
+        # and
+        assert deployment.tub.tag() != tag
+
+    def test_should_answer_reads_from_prefetched_values(self, deployment: Deployment):
+        # given
+        DSValue(web3=deployment.web3, address=deployment.tub.pip()).poke_with_int(Wad.from_number(250).value).transact()
+
+        # when
+        with web3_snapshot(deployment.web3) as snapshot:
+            tag, chi = snapshot.prefetch(deployment.tub, [('tag', []), ('chi', [])])
+            misses = snapshot.misses
+
+            # then
+            assert deployment.tub.tag() == Ray(tag)
+            assert deployment.tub.chi() == Ray(chi)
+            assert snapshot.misses == misses
+
+    def test_should_not_allow_nested_snapshots(self, deployment: Deployment):
+        # expect
+        with web3_snapshot(deployment.web3):
+            with pytest.raises(Exception):
+                with web3_snapshot(deployment.web3):
+                    pass
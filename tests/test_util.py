@@ -17,14 +17,14 @@
 
 import asyncio
 import time
-from unittest.mock import Mock, call
+from unittest.mock import Mock, call, patch
 
 import pytest
-from web3 import Web3
+from web3 import Web3, HTTPProvider, EthereumTesterProvider
 
 from pymaker import Address
 from pymaker.util import synchronize, int_to_bytes32, bytes_to_int, bytes_to_hexstring, hexstring_to_bytes, \
-    AsyncCallback, chain
+    AsyncCallback, chain, batch_requests
 
 
 async def async_return(result):
@@ -89,6 +89,48 @@ def test_chain_should_report_unknown_chains_as_unknown():
     assert chain(web3) == "unknown"
 
 
+def test_batch_requests_should_return_empty_list_for_no_calls():
+    assert batch_requests(Web3(HTTPProvider("http://localhost:8545")), []) == []
+
+
+def test_batch_requests_should_execute_calls_one_by_one_if_not_connected_over_http():
+    # given
+    web3 = Web3(EthereumTesterProvider())
+
+    # expect
+    assert batch_requests(web3, [('eth_blockNumber', []), ('eth_accounts', [])]) == \
+           [web3.eth.blockNumber, web3.eth.accounts]
+
+
+def test_batch_requests_should_send_one_batch_over_http():
+    # given
+    web3 = Web3(HTTPProvider("http://localhost:8545"))
+    response = Mock()
+    response.json = Mock(return_value=[{'jsonrpc': '2.0', 'id': 1, 'result': '0x2'},
+                                       {'jsonrpc': '2.0', 'id': 0, 'result': '0x10'}])
+
+    # when
+    with patch('pymaker.util.requests.post', return_value=response) as post:
+        results = batch_requests(web3, [('eth_blockNumber', []), ('eth_getBalance', ['0x' + '11'*20, 'latest'])])
+
+    # then
+    assert results == [16, 2]
+    assert post.call_count == 1
+    assert [item['method'] for item in post.call_args[1]['json']] == ['eth_blockNumber', 'eth_getBalance']
+
+
+def test_batch_requests_should_raise_errors_returned_by_the_node():
+    # given
+    web3 = Web3(HTTPProvider("http://localhost:8545"))
+    response = Mock()
+    response.json = Mock(return_value=[{'jsonrpc': '2.0', 'id': 0, 'error': {'code': -32000, 'message': 'Failed'}}])
+
+    # expect
+    with patch('pymaker.util.requests.post', return_value=response):
+        with pytest.raises(ValueError):
+            batch_requests(web3, [('eth_blockNumber', [])])
+
+
 def mocked_web3_transaction_count(address: Address, latest: int, pending: int) -> Web3:
     def side_effect(param_address, param_mode):
         assert param_address == address.address
@@ -0,0 +1,90 @@
+# This file is part of Maker Keeper Framework.
+#
+# Copyright (C) 2017 reverendus
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import pytest
+
+from pymaker.websocket import OPCODE_PING, OPCODE_TEXT, SocketIO, decode_frame, encode_frame
+from tests.helpers import FakeEtherDeltaServer
+
+
+class TestFrames:
+    @pytest.mark.parametrize("length", [0, 1, 125, 126, 65535, 65536, 100000])
+    def test_should_decode_encoded_frames(self, length):
+        # given
+        payload = bytes(index % 256 for index in range(length))
+
+        for mask in [True, False]:
+            # when
+            frame = encode_frame(OPCODE_TEXT, payload, mask=mask)
+
+            # then
+            assert decode_frame(frame) == (True, OPCODE_TEXT, payload, len(frame))
+            assert decode_frame(frame + encode_frame(OPCODE_PING, b'', mask=mask)) == \
+                   (True, OPCODE_TEXT, payload, len(frame))
+
+    def test_should_mask_frames(self):
+        # when
+        frame = encode_frame(OPCODE_TEXT, b'order' * 10, mask=True)
+
+        # then
+        assert frame[1] & 0x80
+        assert b'order' not in frame
+
+    def test_should_not_decode_incomplete_frames(self):
+        # given
+        frame = encode_frame(OPCODE_TEXT, b'x' * 1000, mask=True)
+
+        # expect
+        for length in [0, 1, 3, 7, len(frame) - 1]:
+            assert decode_frame(frame[:length]) is None
+
+
+class TestSocketIO:
+    def setup_method(self):
+        self.server = FakeEtherDeltaServer(ping_interval=100)
+
+    def teardown_method(self):
+        self.server.stop()
+
+    def test_should_connect_and_exchange_events(self):
+        # given
+        socket_io = SocketIO(self.server.url, timeout=5)
+
+        # when
+        socket_io.emit('message', {'nonce': 1})
+
+        # then
+        assert socket_io.ping_interval == 0.1
+        assert socket_io.receive(5) == ('orders', [{'buys': [], 'sells': []}])
+        assert socket_io.receive(5) == ('messageResult', [['Added/updated order.', {'nonce': 1}]])
+        assert socket_io.receive(0.3) is None
+        assert self.server.pings >= 2
+
+        # cleanup
+        socket_io.close()
+
+    def test_should_fail_when_disconnected(self):
+        # given
+        socket_io = SocketIO(self.server.url, timeout=5)
+
+        # when
+        self.server.drop_connections()
+
+        # then
+        with pytest.raises(OSError):
+            socket_io.receive(5)
@@ -16,17 +16,21 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import json
+from unittest.mock import patch
 
 import pytest
+from ethereum.tester import k0, k1
 from web3 import EthereumTesterProvider, Web3
 
+import pymaker
 from pymaker import Address
 from pymaker.approval import directly
 from pymaker.deployment import deploy_contract
 from pymaker.numeric import Wad
 from pymaker.token import DSToken, ERC20Token
-from pymaker.zrx import ZrxExchange, Order
-from tests.helpers import is_hashable
+from pymaker.util import hexstring_to_bytes
+from pymaker.zrx import ZrxExchange, ZrxRelayerApi, Order
+from tests.helpers import is_hashable, StubRelayer
 
 
 class TestZrx:
@@ -104,6 +108,12 @@ class TestZrx:
         assert order_hash.startswith('0x')
         assert len(order_hash) == 66
 
+        # and
+        # [the hash calculated locally should match the one calculated by the contract]
+        contract_hash = self.exchange._contract.call().getOrderHash(ZrxExchange._order_addresses(order),
+                                                                     ZrxExchange._order_values(order))
+        assert hexstring_to_bytes(order_hash) == bytes(map(ord, contract_hash))
+
     def test_sign_order(self):
         # given
         order = self.exchange.create_order(pay_token=Address("0x0202020202020202020202020202020202020202"),
@@ -121,6 +131,37 @@ class TestZrx:
         assert len(signed_order.ec_signature_s) == 66
         assert signed_order.ec_signature_v in [27, 28]
 
+        # and
+        assert self.is_valid_signature(signed_order)
+
+    def test_sign_order_with_local_key(self):
+        # given
+        exchange = ZrxExchange(web3=self.web3, address=self.exchange.address, private_key=k1)
+        order = exchange.create_order(pay_token=Address("0x0202020202020202020202020202020202020202"),
+                                      pay_amount=Wad.from_number(100),
+                                      buy_token=Address("0x0101010101010101010101010101010101010101"),
+                                      buy_amount=Wad.from_number(2.5), expiration=1763920792)
+
+        # when
+        with patch.object(self.web3.manager, 'request_blocking', side_effect=Exception("no RPC calls expected")):
+            signed_order = exchange.sign_order(order)
+
+        # then
+        assert order.maker == Address(self.web3.eth.accounts[1])
+        assert signed_order.ec_signature_v in [27, 28]
+        assert self.is_valid_signature(signed_order)
+
+    def test_local_key_signature_should_match_node_signature(self):
+        # given
+        exchange = ZrxExchange(web3=self.web3, address=self.exchange.address, private_key=k0)
+        order = exchange.create_order(pay_token=Address("0x0202020202020202020202020202020202020202"),
+                                      pay_amount=Wad.from_number(100),
+                                      buy_token=Address("0x0101010101010101010101010101010101010101"),
+                                      buy_amount=Wad.from_number(2.5), expiration=1763920792)
+
+        # expect
+        assert exchange.sign_order(order) == self.exchange.sign_order(order)
+
     def test_cancel_order(self):
         # given
         token1 = DSToken.deploy(self.web3, 'AAA')
@@ -149,9 +190,68 @@ class TestZrx:
         # then
         assert self.exchange.get_unavailable_buy_amount(signed_order) == Wad.from_number(4)
 
+    def test_cancel_order_signed_with_local_key_of_other_account(self):
+        # given
+        exchange = ZrxExchange(web3=self.web3, address=self.exchange.address, private_key=k1)
+        order = exchange.create_order(pay_token=Address("0x0202020202020202020202020202020202020202"),
+                                      pay_amount=Wad.from_number(10),
+                                      buy_token=Address("0x0101010101010101010101010101010101010101"),
+                                      buy_amount=Wad.from_number(4), expiration=4102444800)
+        signed_order = exchange.sign_order(order)
+
+        # and
+        assert signed_order.maker != self.our_address
+
+        # when
+        receipt = exchange.cancel_order(signed_order).transact()
+
+        # then
+        assert receipt is not None
+        assert exchange.get_unavailable_buy_amount(signed_order) == Wad.from_number(4)
+
+    def test_get_unavailable_buy_amounts(self):
+        # given
+        token1 = DSToken.deploy(self.web3, 'AAA')
+        token1.mint(Wad.from_number(100)).transact()
+
+        # and
+        token2 = DSToken.deploy(self.web3, 'BBB')
+        token2.mint(Wad.from_number(100)).transact()
+
+        # and
+        self.exchange.approve([token1, token2], directly())
+
+        # and
+        orders = [self.exchange.sign_order(self.exchange.create_order(pay_token=token1.address,
+                                                                      pay_amount=Wad.from_number(10),
+                                                                      buy_token=token2.address,
+                                                                      buy_amount=Wad.from_number(amount),
+                                                                      expiration=1763920792))
+                  for amount in [3, 4, 5]]
+
+        # when
+        self.exchange.cancel_order(orders[1]).transact()
+
+        # then
+        with patch('pymaker.batch_requests', wraps=pymaker.batch_requests) as batch_requests:
+            assert self.exchange.get_unavailable_buy_amounts(orders) == [Wad(0), Wad.from_number(4), Wad(0)]
+            assert batch_requests.call_count == 1
+
+        # and
+        assert self.exchange.get_unavailable_buy_amounts(orders) == \
+               [self.exchange.get_unavailable_buy_amount(order) for order in orders]
+        assert self.exchange.get_unavailable_buy_amounts([]) == []
+
     def test_should_have_printable_representation(self):
         assert repr(self.exchange) == f"ZrxExchange('{self.exchange.address}')"
 
+    def is_valid_signature(self, order: Order) -> bool:
+        return self.exchange._contract.call().isValidSignature(order.maker.address,
+                                                               hexstring_to_bytes(self.exchange.get_order_hash(order)),
+                                                               order.ec_signature_v,
+                                                               hexstring_to_bytes(order.ec_signature_r),
+                                                               hexstring_to_bytes(order.ec_signature_s))
+
 
 class TestOrder:
     def test_should_be_comparable(self):
@@ -227,6 +327,29 @@ class TestOrder:
         # expect
         assert is_hashable(order)
 
+    def test_should_be_slotted_and_printable(self):
+        # given
+        order = Order(exchange=None,
+                      maker=Address("0x9e56625509c2f60af937f23b7b532600390e8c8b"),
+                      taker=Address("0x0000000000000000000000000000000000000000"),
+                      maker_fee=Wad.from_number(123),
+                      taker_fee=Wad.from_number(456),
+                      pay_token=Address("0x323b5d4c32345ced77393b3530b1eed0f346429d"),
+                      pay_amount=Wad(10000000000000000),
+                      buy_token=Address("0xef7fff64389b814a946f3e92105513705ca6b990"),
+                      buy_amount=Wad(20000000000000000),
+                      salt=67006738228878699843088602623665307406148487219438534730168799356281242528500,
+                      fee_recipient=Address('0x6666666666666666666666666666666666666666'),
+                      expiration=42,
+                      exchange_contract_address=Address("0x12459c951127e0c374ff9105dda097662a027093"),
+                      ec_signature_r="0xf9f6a3b67b52d40c16387df2cd6283bbdbfc174577743645dd6f4bd828c7dbc3",
+                      ec_signature_s="0x15baf69f6c3cc8ac0f62c89264d73accf1ae165cce5d6e2a0b6325c6e4bab964",
+                      ec_signature_v=28)
+
+        # expect
+        assert not hasattr(order, '__dict__')
+        assert "'ec_signature_v': 28" in repr(order)
+
     def test_parse_signed_json_order(self):
         # given
         json_order = json.loads("""{
@@ -385,3 +508,134 @@ class TestOrder:
                 "v": 28
             }
         }""")
+
+
+class TestZrxRelayerApi:
+    def setup_method(self):
+        self.web3 = Web3(EthereumTesterProvider())
+        self.web3.eth.defaultAccount = self.web3.eth.accounts[0]
+        self.exchange = ZrxExchange.deploy(self.web3, deploy_contract(self.web3, 'ZRXToken'),
+                                           deploy_contract(self.web3, 'TokenTransferProxy'))
+        self.relayer = StubRelayer(rejected_salts=[13])
+        self.relayer_api = ZrxRelayerApi(exchange=self.exchange, api_server=self.relayer.url, max_workers=4)
+
+    def teardown_method(self):
+        self.relayer.stop()
+
+    def order(self, salt: int) -> Order:
+        order = self.exchange.create_order(pay_token=Address("0x0202020202020202020202020202020202020202"),
+                                           pay_amount=Wad.from_number(100),
+                                           buy_token=Address("0x0101010101010101010101010101010101010101"),
+                                           buy_amount=Wad.from_number(2.5), expiration=1763920792)
+        order.salt = salt
+        return self.exchange.sign_order(order)
+
+    def test_submit_order(self):
+        # expect
+        assert self.relayer_api.submit_order(self.order(1)) is True
+        assert self.relayer_api.submit_order(self.order(13)) is False
+
+        # and
+        assert [order['salt'] for order in self.relayer.orders] == ['1']
+
+    def test_should_reuse_connections(self):
+        # when
+        for salt in range(5):
+            self.relayer_api.submit_order(self.order(salt))
+
+        # then
+        assert len(self.relayer.orders) == 5
+        assert len(self.relayer.client_ports) == 1
+
+    def test_submit_orders(self):
+        # given
+        orders = [self.order(salt) for salt in range(20)]
+
+        # when
+        results = self.relayer_api.submit_orders(orders)
+
+        # then
+        assert results == [salt != 13 for salt in range(20)]
+        assert sorted(int(order['salt']) for order in self.relayer.orders) == [salt for salt in range(20) if salt != 13]
+        assert len(self.relayer.client_ports) <= 4
+
+        # and
+        assert self.relayer_api.submit_orders([]) == []
+
+    def test_should_fail_to_submit_order_on_timeout(self):
+        # given
+        self.relayer.delay = 0.5
+        relayer_api = ZrxRelayerApi(exchange=self.exchange, api_server=self.relayer.url, timeout=0.1)
+
+        # expect
+        assert relayer_api.submit_order(self.order(1)) is False
+
+    def test_get_orders_by_maker(self):
+        # given
+        orders = [self.order(salt) for salt in range(3)]
+        self.relayer_api.submit_orders(orders)
+
+        # expect
+        assert sorted(self.relayer_api.get_orders_by_maker(Address(self.web3.eth.defaultAccount)),
+                      key=lambda order: order.salt) == orders
+
+    def test_iter_orders_by_maker_should_fetch_pages_lazily(self):
+        # given
+        for salt in range(25):
+            self.relayer_api.submit_order(self.order(salt))
+
+        # when
+        orders = self.relayer_api.iter_orders_by_maker(Address(self.web3.eth.defaultAccount), per_page=10,
+                                                       prefetch=False)
+
+        # then
+        assert next(orders).salt == 0
+        assert self.relayer.pages == [1]
+
+        # when
+        remaining_orders = list(orders)
+
+        # then
+        assert [order.salt for order in remaining_orders] == list(range(1, 25))
+        assert self.relayer.pages == [1, 2, 3, 4]
+
+    def test_iter_orders_by_maker_should_prefetch_next_page(self):
+        # given
+        for salt in range(20):
+            self.relayer_api.submit_order(self.order(salt))
+
+        # when
+        orders = list(self.relayer_api.iter_orders_by_maker(Address(self.web3.eth.defaultAccount), per_page=10))
+
+        # then
+        assert [order.salt for order in orders] == list(range(20))
+        assert self.relayer.pages == [1, 2, 3]
+
+    def test_iter_orders_by_maker_should_not_stop_on_pages_shortened_by_the_relayer(self):
+        # given
+        self.relayer.max_per_page = 5
+        for salt in range(12):
+            self.relayer_api.submit_order(self.order(salt))
+
+        # when
+        orders = list(self.relayer_api.iter_orders_by_maker(Address(self.web3.eth.defaultAccount), per_page=10))
+
+        # then
+        assert [order.salt for order in orders] == list(range(12))
+        assert self.relayer.pages == [1, 2, 3, 4]
+
+    def test_iter_orders_by_maker_should_only_return_orders_of_this_maker(self):
+        # given
+        self.relayer_api.submit_order(self.order(1))
+
+        # expect
+        assert list(self.relayer_api.iter_orders_by_maker(Address(self.web3.eth.accounts[1]))) == []
+
+    def test_calculate_fees(self):
+        # when
+        order = self.relayer_api.calculate_fees(self.order(1))
+
+        # then
+        assert order.maker_fee == Wad(1)
+        assert order.taker_fee == Wad(2)
+        assert order.fee_recipient == Address('0x6666666666666666666666666666666666666666')